@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+
+"""
+Offline throughput benchmark for the Open Library fetch pipelines,
+run against ol_stub_server instead of openlibrary.org.
+
+    bench_enrichment.py --synthetic 2000 --latency-ms 250 --jitter-ms 100
+    bench_enrichment.py --corpus bench/corpus --isbns isbns.csv --json out.json
+    bench_enrichment.py --synthetic 2000 --baseline out.json   # regression gate
+
+Scenarios:
+
+    single        fetch_openlibrary, one ISBN per request (legacy loop)
+    batch         fetch_openlibrary_batch, serial bibkey groups
+    async         run_groups (asyncio engine), --concurrency / --rps
+    import_books  Command.import_rich_book against a throwaway test DB
+    import_books_pipelined
+                  Command.import_pipelined, --concurrency / --rps
+    lookup        scrape_amazon_best.openlibrary_lookup (needs curl_cffi)
+
+No pacing sleeps are applied unless --polite is given; the stub's
+latency settings stand in for the network. DB writes to book_metadata
+are not part of the enrich scenarios (fetch + normalize only).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+
+# =========================
+# CONFIG
+# =========================
+
+SCENARIOS = ["single", "batch", "async", "import_books", "import_books_pipelined", "lookup"]
+
+# One or more requests per ISBN; run on the first --limit-slow ISBNs only
+SLOW_SCENARIOS = {"single", "import_books", "import_books_pipelined", "lookup"}
+
+# Throughput drop (fraction) tolerated against --baseline
+TOLERANCE = 0.15
+
+
+# =========================
+# ISBN INPUT
+# =========================
+
+def synthetic_isbns(count, seed=42):
+    rng = random.Random(seed)
+    isbns = []
+    for _ in range(count):
+        body = "978" + "".join(str(rng.randint(0, 9)) for _ in range(9))
+        total = sum(int(d) * (1 if i % 2 == 0 else 3) for i, d in enumerate(body))
+        isbns.append(body + str((10 - total % 10) % 10))
+    return isbns
+
+
+# =========================
+# SCENARIOS
+# =========================
+
+def bench_single(isbns, args):
+    import enrich_openlibrary as eo
+
+    hits = 0
+    for isbn in isbns:
+        if eo.fetch_openlibrary(isbn):
+            hits += 1
+        if args.polite:
+            time.sleep(eo.SLEEP_BETWEEN_REQUESTS)
+    return hits
+
+
+def bench_batch(isbns, args):
+    import enrich_openlibrary as eo
+
+    hits = 0
+    for group in eo.chunked(isbns, args.bibkeys):
+        try:
+            results = eo.fetch_openlibrary_batch(group)
+        except eo.TransientFetchError:
+            continue
+        hits += sum(1 for data in results.values() if data)
+        if args.polite:
+            time.sleep(eo.SLEEP_BETWEEN_REQUESTS)
+    return hits
+
+
+def bench_async(isbns, args):
+    import enrich_openlibrary as eo
+
+    hits = 0
+
+    def on_results(group, results):
+        nonlocal hits
+        hits += sum(1 for data in results.values() if data)
+
+    def on_error(group, error):
+        pass
+
+    rate = args.rps if args.polite else 0
+    asyncio.run(eo.run_groups(
+        list(eo.chunked(isbns, args.bibkeys)),
+        on_results,
+        on_error,
+        args.concurrency,
+        rate,
+    ))
+    return hits
+
+
+def bench_import_books(isbns, args, pipelined=False):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings_dev")
+
+    import django
+    django.setup()
+
+    from django.conf import settings
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    from catalog.management.commands.import_books import Command
+    from catalog.models import Book
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, serialize=False)
+    settings.MEDIA_ROOT = tempfile.mkdtemp(prefix="eob_bench_media_")
+
+    try:
+        command = Command()
+        command.stdout = open(os.devnull, "w")
+        command.stderr = command.stdout
+        if pipelined:
+            command.import_pipelined(isbns, args.concurrency, args.rps if args.polite else 0)
+        else:
+            command.work_descriptions = {}
+            for isbn in isbns:
+                command.import_rich_book(isbn)
+                if args.polite:
+                    time.sleep(2.0)
+        return Book.objects.filter(last_enriched__isnull=False).count()
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def bench_lookup(isbns, args):
+    try:
+        from catalog.management.commands.scrape_amazon_best import openlibrary_lookup
+    except ImportError as e:
+        raise SkipScenario(f"needs curl_cffi / bs4 ({e})")
+
+    hits = 0
+    for isbn in isbns:
+        if openlibrary_lookup(f"Synthetic Book {isbn}", ""):
+            hits += 1
+    return hits
+
+
+class SkipScenario(Exception):
+    pass
+
+
+RUNNERS = {
+    "single": bench_single,
+    "batch": bench_batch,
+    "async": bench_async,
+    "import_books": bench_import_books,
+    "import_books_pipelined": lambda isbns, args: bench_import_books(isbns, args, pipelined=True),
+    "lookup": bench_lookup,
+}
+
+
+# =========================
+# HARNESS
+# =========================
+
+def run(args):
+    from ol_stub_server import Corpus, read_isbns, start_stub_server
+
+    if args.isbns:
+        isbns = read_isbns(args.isbns)
+    else:
+        isbns = synthetic_isbns(args.synthetic)
+
+    corpus = Corpus(args.corpus or tempfile.mkdtemp(), args.synthetic_hit_rate)
+    server = start_stub_server(
+        corpus,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        html_error_rate=args.html_error_rate,
+    )
+
+    # Must be set before the pipeline modules are imported
+    os.environ["EOB_OPENLIBRARY_URL"] = server.base_url
+    os.environ["EOB_HTTP_CACHE"] = "off"
+    os.environ["EOB_METRICS_DIR"] = ""
+
+    print(f"Stub at {server.base_url}: {len(isbns)} ISBNs, "
+          f"{args.latency_ms:g}±{args.jitter_ms:g} ms, "
+          f"{args.error_rate:.0%} 503, {args.html_error_rate:.0%} HTML errors")
+
+    results = []
+    try:
+        for name in args.scenarios:
+            sample = isbns[:args.limit_slow] if name in SLOW_SCENARIOS else isbns
+            before = server.requests_served
+            started = time.perf_counter()
+
+            try:
+                hits = RUNNERS[name](sample, args)
+            except SkipScenario as e:
+                print(f"{name:<24} skipped: {e}")
+                continue
+
+            seconds = time.perf_counter() - started
+            results.append({
+                "scenario": name,
+                "isbns": len(sample),
+                "hits": hits,
+                "requests": server.requests_served - before,
+                "seconds": round(seconds, 3),
+                "isbns_per_s": round(len(sample) / seconds, 2) if seconds else None,
+            })
+    finally:
+        server.shutdown()
+
+    print()
+    print(f"{'scenario':<24}{'isbns':>8}{'hits':>8}{'requests':>10}{'seconds':>10}{'isbn/s':>10}")
+    for r in results:
+        print(f"{r['scenario']:<24}{r['isbns']:>8}{r['hits']:>8}{r['requests']:>10}"
+              f"{r['seconds']:>10.2f}{r['isbns_per_s']:>10.1f}")
+
+    return results
+
+
+def check_baseline(results, baseline_path, tolerance):
+    with open(baseline_path) as f:
+        baseline = {r["scenario"]: r for r in json.load(f)["results"]}
+
+    failed = False
+    for r in results:
+        base = baseline.get(r["scenario"])
+        if not base or not base.get("isbns_per_s"):
+            continue
+        floor = base["isbns_per_s"] * (1 - tolerance)
+        if r["isbns_per_s"] < floor:
+            failed = True
+            print(f"REGRESSION {r['scenario']}: {r['isbns_per_s']} isbn/s "
+                  f"< {floor:.1f} (baseline {base['isbns_per_s']})")
+    return not failed
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark OL fetch pipelines offline")
+
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--isbns", help="CSV with ISBNs in the first column")
+    source.add_argument("--synthetic", type=int, default=1000,
+                        help="Generate this many ISBNs (default)")
+
+    parser.add_argument("--corpus", help="Recorded corpus directory")
+    parser.add_argument("--synthetic-hit-rate", type=float, default=0.8)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS,
+                        default=["single", "batch", "async"])
+    parser.add_argument("--limit-slow", type=int, default=200,
+                        help="ISBNs used by the one-request-per-ISBN scenarios")
+
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--jitter-ms", type=float, default=100)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--html-error-rate", type=float, default=0.0)
+
+    parser.add_argument("--bibkeys", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rps", type=float, default=1.0)
+    parser.add_argument("--polite", action="store_true",
+                        help="Apply production sleeps / rate limits")
+
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--baseline", help="Fail if slower than this results file")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = run(args)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+    if args.baseline and not check_baseline(results, args.baseline, args.tolerance):
+        sys.exit(1)
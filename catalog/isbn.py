@@ -0,0 +1,307 @@
+"""
+ISBN canonicalization shared by every ingest path.
+
+Scalar helpers for single values, and NumPy-batched equivalents
+(clean_many / canonicalize_many) for CSV feeds and spine tables.
+
+Canonical form: digits only, uppercase X as the ISBN-10 check
+character. An ISBN is "valid" when its checksum is; 978-prefixed
+ISBN-13s convert to ISBN-10 and back, 979-prefixed ones have no
+ISBN-10.
+
+No Django imports: the standalone scripts at the repo root use this
+module too.
+"""
+
+import re
+from collections import namedtuple
+
+import numpy as np
+
+
+ISBN = namedtuple("ISBN", ["isbn10", "isbn13"])
+
+ISBN13_PREFIXES = ("978", "979")
+
+# Normalized (normalize_identifier) non-ISBN identifier shapes
+ASIN_RE = re.compile(r"B0[0-9A-Z]{8}")
+OLID_RE = re.compile(r"OL\d+M")
+
+# ISBN-13 weights 1,3,1,3,...; ISBN-10 weights 10..1
+_W13 = np.array([1, 3] * 6 + [1], dtype=np.int16)
+_W10 = np.arange(10, 0, -1, dtype=np.int16)
+
+_ZERO = ord("0")
+_X = ord("X")
+
+
+# =========================
+# SCALAR
+# =========================
+
+def clean(value):
+    """'0-306-40615-x ' -> '030640615X'. None -> ''."""
+    if not value:
+        return ""
+    return "".join(c for c in str(value).upper() if c.isdigit() or c == "X")
+
+
+def isbn10_check_digit(body):
+    """Check character for the first 9 digits of an ISBN-10."""
+    total = sum(int(d) * w for d, w in zip(body, range(10, 1, -1)))
+    check = (11 - total % 11) % 11
+    return "X" if check == 10 else str(check)
+
+
+def isbn13_check_digit(body):
+    """Check digit for the first 12 digits of an ISBN-13."""
+    total = sum(int(d) * (1 if i % 2 == 0 else 3) for i, d in enumerate(body))
+    return str((10 - total % 10) % 10)
+
+
+def is_valid_isbn10(value):
+    isbn = clean(value)
+    return (
+        len(isbn) == 10
+        and isbn[:9].isdigit()
+        and isbn[9] == isbn10_check_digit(isbn[:9])
+    )
+
+
+def is_valid_isbn13(value):
+    isbn = clean(value)
+    return (
+        len(isbn) == 13
+        and isbn.isdigit()
+        and isbn[:3] in ISBN13_PREFIXES
+        and isbn[12] == isbn13_check_digit(isbn[:12])
+    )
+
+
+def to_isbn13(isbn10):
+    """ISBN-10 -> ISBN-13, or None if isbn10 is not a valid ISBN-10."""
+    if not is_valid_isbn10(isbn10):
+        return None
+    body = "978" + clean(isbn10)[:9]
+    return body + isbn13_check_digit(body)
+
+
+def to_isbn10(isbn13):
+    """ISBN-13 -> ISBN-10, or None if invalid or 979-prefixed."""
+    if not is_valid_isbn13(isbn13):
+        return None
+    isbn = clean(isbn13)
+    if not isbn.startswith("978"):
+        return None
+    body = isbn[3:12]
+    return body + isbn10_check_digit(body)
+
+
+def has_isbn10(isbn13):
+    """False for 979-prefixed ISBN-13s, which have no ISBN-10 form."""
+    return clean(isbn13).startswith("978")
+
+
+def normalize_identifier(value):
+    """
+    Lookup key for any pasted book identifier: ISBN-10 / ISBN-13 with
+    or without hyphens and spaces, ASIN, or Open Library edition key
+    ("/books/OL7353617M"). Matches BookIdentifier.value.
+    """
+    value = "".join(str(value or "").split()).replace("-", "").upper()
+    if value.startswith("/BOOKS/"):
+        value = value[len("/BOOKS/"):]
+    return value
+
+
+def identifier_query(value):
+    """
+    The BookIdentifier lookup key if a search query is shaped like a
+    book identifier -- checksum-valid ISBN-10 / ISBN-13 (optionally
+    prefixed "ISBN"), ASIN or Open Library edition key -- else None.
+
+    identifier_query("ISBN 978-0-393-09939-3") == "9780393099393"
+    identifier_query("war and peace") is None
+    """
+    key = normalize_identifier(value)
+    if key.startswith("ISBN"):
+        key = key[len("ISBN"):].lstrip(":")
+
+    if is_valid_isbn10(key) or is_valid_isbn13(key):
+        return key if key == clean(key) else None
+    if ASIN_RE.fullmatch(key) or OLID_RE.fullmatch(key):
+        return key
+    return None
+
+
+def canonicalize(value):
+    """
+    Any ISBN-10 / ISBN-13 spelling -> ISBN(isbn10, isbn13).
+
+    Either field is None when that form doesn't exist (979 prefix) or
+    the input isn't a valid ISBN: canonicalize("junk") == ISBN(None, None).
+    """
+    isbn = clean(value)
+    if len(isbn) == 10 and is_valid_isbn10(isbn):
+        return ISBN(isbn, to_isbn13(isbn))
+    if len(isbn) == 13 and is_valid_isbn13(isbn):
+        return ISBN(to_isbn10(isbn), isbn)
+    return ISBN(None, None)
+
+
+def identifier_rows(isbn10, isbn13, amazon_asin):
+    """
+    (kind, value) BookIdentifier pairs for a book's identifier fields:
+    every normalized form, including the ISBN-10/13 counterpart of a
+    valid ISBN that only has one form stored.
+    """
+    rows = {}
+    for kind, raw in (("asin", amazon_asin), ("isbn13", isbn13), ("isbn10", isbn10)):
+        if raw:
+            rows[normalize_identifier(raw)] = kind
+
+    for raw in (isbn10, isbn13):
+        ids = canonicalize(raw)
+        if ids.isbn10:
+            rows[ids.isbn10] = "isbn10"
+        if ids.isbn13:
+            rows[ids.isbn13] = "isbn13"
+
+    return [(kind, value) for value, kind in rows.items()]
+
+
+# =========================
+# BATCHED (NUMPY)
+# =========================
+
+ISBNBatch = namedtuple("ISBNBatch", ["isbn10", "isbn13", "valid", "no_isbn10"])
+
+
+def _codepoints(values):
+    """(N, W) uint32 code points of the strings, zero padded."""
+    arr = np.asarray(values, dtype=str)
+    if arr.ndim != 1:
+        arr = arr.reshape(-1)
+    width = max(arr.dtype.itemsize // 4, 1)
+    arr = arr.astype(f"U{width}")
+    return arr.view(np.uint32).reshape(len(arr), width)
+
+
+def _clean_codepoints(values, width=None):
+    """
+    Vectorized clean(): returns (chars, lengths), where chars is an
+    (N, width) uint8 array with the kept characters packed to the left
+    and zero padded. Characters past `width` are dropped (lengths still
+    counts them).
+    """
+    # Non-Latin-1 code points can only be junk; clamp them to a byte
+    raw = np.minimum(_codepoints(values), 255).astype(np.uint8)
+    if width is None:
+        width = raw.shape[1]
+
+    raw[raw == ord("x")] = _X
+    keep = ((raw >= _ZERO) & (raw <= ord("9"))) | (raw == _X)
+    lengths = keep.sum(axis=1)
+
+    chars = np.zeros((len(raw), width), dtype=np.uint8)
+    n = min(width, raw.shape[1])
+    chars[:, :n] = np.where(keep[:, :n], raw[:, :n], 0)
+
+    # Rows with separators / junk need their kept characters packed
+    # left; already-clean rows (the bulk of any spine) skip this.
+    dirty = ((raw != 0) & ~keep).any(axis=1)
+    if dirty.any():
+        raw, keep = raw[dirty], keep[dirty]
+        # Target column of each kept character = kept characters before it
+        pos = np.cumsum(keep, axis=1, dtype=np.int16) - 1
+        rows, cols = np.nonzero(keep & (pos < width))
+
+        packed = np.zeros((len(raw), width), dtype=np.uint8)
+        packed[rows, pos[rows, cols]] = raw[rows, cols]
+        chars[dirty] = packed
+
+    return chars, lengths
+
+
+def _to_strings(chars, width):
+    chars = np.ascontiguousarray(chars[:, :width], dtype=np.uint32)
+    return chars.view(f"U{width}").reshape(len(chars))
+
+
+def clean_many(values):
+    """clean() over a sequence; returns an array of str."""
+    chars, _ = _clean_codepoints(values)
+    return _to_strings(chars, chars.shape[1])
+
+
+def canonicalize_many(values):
+    """
+    canonicalize() over a sequence of raw ISBN strings.
+
+    Returns ISBNBatch of equal-length arrays:
+        isbn10, isbn13  canonical strings, "" where absent / invalid
+        valid           checksum-valid ISBN-10 or ISBN-13 input
+        no_isbn10       valid 979-prefixed ISBN-13 (no ISBN-10 exists)
+    """
+    n = len(values)
+    if n == 0:
+        empty = np.array([], dtype=str)
+        flags = np.array([], dtype=bool)
+        return ISBNBatch(empty, empty, flags, flags)
+
+    chars, lengths = _clean_codepoints(values, width=13)
+
+    digits = chars.astype(np.int16) - _ZERO
+    is_digit = (digits >= 0) & (digits <= 9)
+    is_x = chars == _X
+    digits[~is_digit] = 0
+
+    prefix = digits[:, 0] * 100 + digits[:, 1] * 10 + digits[:, 2]
+
+    # ---- ISBN-13 ----
+    valid13 = (
+        (lengths == 13)
+        & is_digit.all(axis=1)
+        & ((prefix == 978) | (prefix == 979))
+        & (digits @ _W13 % 10 == 0)
+    )
+
+    # ---- ISBN-10 ----
+    d10 = digits[:, :10].copy()
+    d10[is_x[:, 9], 9] = 10
+    valid10 = (
+        (lengths == 10)
+        & is_digit[:, :9].all(axis=1)
+        & (is_digit[:, 9] | is_x[:, 9])
+        & (d10 @ _W10 % 11 == 0)
+    )
+
+    # ---- 10 -> 13 ----
+    out13 = digits.copy()
+    out13[valid10, 3:12] = digits[valid10, :9]
+    out13[valid10, :3] = (9, 7, 8)
+    out13[valid10, 12] = (10 - out13[valid10, :12] @ _W13[:12] % 10) % 10
+
+    # ---- 13 -> 10 (978 only) ----
+    from978 = valid13 & (prefix == 978)
+    out10 = d10
+    out10[from978, :9] = digits[from978, 3:12]
+    out10[from978, 9] = (11 - out10[from978, :9] @ _W10[:9] % 11) % 11
+
+    # ---- back to strings ----
+    has13 = valid10 | valid13
+    has10 = valid10 | from978
+
+    chars13 = (out13 + _ZERO).astype(np.uint32)
+    chars13[~has13] = 0
+
+    chars10 = (out10 + _ZERO).astype(np.uint32)
+    chars10[out10[:, 9] == 10, 9] = _X
+    chars10[~has10] = 0
+
+    return ISBNBatch(
+        isbn10=_to_strings(chars10, 10),
+        isbn13=_to_strings(chars13, 13),
+        valid=has13,
+        no_isbn10=valid13 & (prefix == 979),
+    )
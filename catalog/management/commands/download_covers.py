@@ -0,0 +1,254 @@
+import hashlib
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import groupby, islice
+from operator import attrgetter
+
+import requests
+from PIL import Image, UnidentifiedImageError
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from catalog.models import Book, get_catalog_upload_path
+from enrichment_metrics import Metrics
+from search.ranking import update_search_ranks
+from ratelimit import TokenBucket
+
+
+METRICS = Metrics("download_covers")
+
+COVERS_URL = os.environ.get("EOB_COVERS_URL", "https://covers.openlibrary.org")
+
+# Anything smaller is a placeholder / thumbnail, not a usable cover.
+MIN_WIDTH = 50
+MIN_HEIGHT = 75
+
+# Cover ids submitted to the pool at a time, per worker.
+WINDOW_PER_WORKER = 4
+
+EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "GIF": "gif", "WEBP": "webp"}
+
+
+class CoverRejected(Exception):
+    """The id resolved to an image, but one too small to be a cover."""
+
+
+class CoverUnreadable(Exception):
+    """
+    The response didn't decode as an image (an HTML error page served
+    with 200, a truncated body). Not proof the cover is missing.
+    """
+
+
+def fetch_cover(cover_id, bucket):
+    """
+    Large cover for an Open Library cover id.
+
+    ?default=false makes covers.openlibrary.org answer 404 instead of
+    its 1x1 placeholder GIF; the size check below catches placeholders
+    that slip through anyway. Returns (content, extension), None for a
+    missing cover; raises CoverRejected for images too small to use,
+    CoverUnreadable for bodies that aren't images and requests
+    exceptions for other transient failures.
+    """
+    bucket.acquire()
+    with METRICS.timer("http_request_seconds", endpoint="cover"):
+        r = requests.get(
+            f"{COVERS_URL}/b/id/{cover_id}-L.jpg",
+            params={"default": "false"},
+            timeout=30,
+        )
+    METRICS.inc("http_requests_total", endpoint="cover", cache="miss", status=str(r.status_code))
+
+    if r.status_code == 404:
+        return None
+    r.raise_for_status()
+
+    try:
+        image = Image.open(io.BytesIO(r.content))
+        width, height = image.size
+        image_format = image.format
+    except (UnidentifiedImageError, OSError):
+        raise CoverUnreadable(r.headers.get("Content-Type") or "not an image")
+
+    if width < MIN_WIDTH or height < MIN_HEIGHT:
+        raise CoverRejected(f"{width}x{height}")
+
+    return r.content, EXTENSIONS.get(image_format, "jpg")
+
+
+def stored_covers(cover_ids):
+    """cover id -> (stored file, digest) for covers some book already has."""
+    stored = {}
+    rows = (
+        Book.objects.filter(cover_openlibrary_id__in=cover_ids)
+        .exclude(Q(cover_image="") | Q(cover_image__isnull=True))
+        .values_list("cover_openlibrary_id", "cover_image", "cover_digest")
+    )
+    for cover_id, name, digest in rows:
+        stored.setdefault(cover_id, (name, digest))
+    return stored
+
+
+def stored_digest(digest):
+    """Stored file with this content hash, from any earlier run, or None."""
+    return (
+        Book.objects.filter(cover_digest=digest)
+        .exclude(Q(cover_image="") | Q(cover_image__isnull=True))
+        .values_list("cover_image", flat=True)
+        .first()
+    )
+
+
+def assign_cover(group, name, digest, updated):
+    for book in group:
+        book.cover_image = name
+        book.cover_digest = digest
+        book.cover_thumb_widths = ""  # regenerated by generate_thumbnails
+        updated.append(book)
+
+
+class Command(BaseCommand):
+    help = "Download Open Library covers for books that have a cover id but no image"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=8)
+        parser.add_argument(
+            "--rps",
+            type=float,
+            default=5.0,
+            help="Global cover requests per second (0 = unlimited)",
+        )
+        parser.add_argument("--limit", type=int, default=None)
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--refresh",
+            action="store_true",
+            help="Also re-download books that already have a cover image",
+        )
+
+    def handle(self, *args, **options):
+        books = Book.objects.exclude(cover_openlibrary_id__isnull=True).exclude(
+            cover_openlibrary_id=""
+        )
+        if not options["refresh"]:
+            books = books.filter(Q(cover_image="") | Q(cover_image__isnull=True))
+        # Grouped by cover id as they stream in: one download per cover
+        # id, however many editions share it, without loading them all
+        books = books.only("id", "isbn10", "isbn13", "cover_openlibrary_id").order_by(
+            "cover_openlibrary_id", "id"
+        )
+        if options["limit"]:
+            books = books[: options["limit"]]
+        groups = (
+            (cover_id, list(group))
+            for cover_id, group in groupby(books.iterator(), key=attrgetter("cover_openlibrary_id"))
+        )
+
+        bucket = TokenBucket(options["rps"])
+        window = max(1, options["workers"]) * WINDOW_PER_WORKER
+        stored_by_hash = {}
+        updated = []
+        cleared = []
+
+        try:
+            with ThreadPoolExecutor(options["workers"]) as pool:
+                while True:
+                    batch = list(islice(groups, window))
+                    if not batch:
+                        break
+
+                    # Covers stored by an earlier run (or another edition)
+                    # are reused, not downloaded again
+                    stored = {} if options["refresh"] else stored_covers([c for c, _ in batch])
+
+                    futures = {}
+                    for cover_id, group in batch:
+                        if cover_id in stored:
+                            METRICS.inc("covers_total", result="reused")
+                            assign_cover(group, *stored[cover_id], updated)
+                        else:
+                            futures[pool.submit(fetch_cover, cover_id, bucket)] = (cover_id, group)
+
+                    for future in as_completed(futures):
+                        cover_id, group = futures[future]
+                        try:
+                            self.store(future, cover_id, group, stored_by_hash, updated, cleared)
+                        except Exception as e:
+                            # Storage / unexpected failure for this cover
+                            # only; retried on the next run
+                            METRICS.inc("covers_total", result="error")
+                            self.stderr.write(f"Cover {cover_id} failed: {e!r}")
+
+                        if len(updated) >= options["batch_size"]:
+                            self.flush(updated, cleared)
+                            METRICS.maybe_report()
+        finally:
+            # Whatever stops the run, covers already stored get recorded
+            self.flush(updated, cleared)
+            METRICS.report()
+
+    def store(self, future, cover_id, group, stored_by_hash, updated, cleared):
+        try:
+            result = future.result()
+        except CoverRejected as e:
+            METRICS.inc("covers_total", result="rejected")
+            self.stderr.write(f"Cover {cover_id} rejected: {e}")
+            cleared.extend(group)
+            return
+        except CoverUnreadable as e:
+            # Left as is; picked up again on the next run
+            METRICS.inc("covers_total", result="unreadable")
+            self.stderr.write(f"Cover {cover_id} unreadable: {e}")
+            return
+        except requests.RequestException as e:
+            # Left as is; picked up again on the next run
+            METRICS.inc("covers_total", result="error")
+            self.stderr.write(f"Cover {cover_id} failed: {e}")
+            return
+
+        if result is None:
+            METRICS.inc("covers_total", result="missing")
+            cleared.extend(group)
+            return
+
+        content, extension = result
+        digest = hashlib.sha256(content).hexdigest()
+
+        name = stored_by_hash.get(digest) or stored_digest(digest)
+        if name is None:
+            first = group[0]
+            filename = f"{first.isbn10 or first.isbn13 or cover_id}.{extension}"
+            with METRICS.timer("storage_write_seconds"):
+                name = default_storage.save(
+                    get_catalog_upload_path(first, filename),
+                    ContentFile(content),
+                )
+            METRICS.inc("covers_total", result="stored")
+        else:
+            METRICS.inc("covers_total", result="duplicate")
+        stored_by_hash[digest] = name
+
+        assign_cover(group, name, digest, updated)
+
+    def flush(self, updated, cleared):
+        """bulk_update the collected rows and empty the lists."""
+        with METRICS.timer("db_write_seconds"):
+            if updated:
+                Book.objects.bulk_update(updated, ["cover_image", "cover_digest", "cover_thumb_widths"])
+                update_search_ranks([b.pk for b in updated])
+            if cleared:
+                # No usable cover behind this id; stop asking for it
+                Book.objects.filter(pk__in=[b.pk for b in cleared]).update(
+                    cover_openlibrary_id=None
+                )
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Saved {len(updated)} covers, cleared {len(cleared)} ids")
+        )
+        updated.clear()
+        cleared.clear()
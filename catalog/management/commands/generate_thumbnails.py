@@ -0,0 +1,76 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from catalog.models import Book
+from catalog.thumbnails import generate_thumbnails
+from enrichment_metrics import Metrics
+
+
+METRICS = Metrics("generate_thumbnails")
+
+
+class Command(BaseCommand):
+    help = "Generate responsive cover thumbnails (JPEG + WebP) for books with a cover image"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Regenerate for every cover, not just covers without thumbnails",
+        )
+
+    def handle(self, *args, **options):
+        books = Book.objects.exclude(Q(cover_image="") | Q(cover_image__isnull=True))
+        if not options["all"]:
+            books = books.filter(cover_thumb_widths="")
+        books = books.only("id", "cover_image").order_by("id")
+
+        # Editions sharing a deduplicated cover file share its thumbnails
+        by_cover = {}
+        for book in books.iterator():
+            by_cover.setdefault(book.cover_image.name, []).append(book)
+
+        self.stdout.write(f"{len(by_cover)} covers to process")
+
+        updated = []
+
+        with ThreadPoolExecutor(options["workers"]) as pool:
+            futures = {
+                pool.submit(self.generate, name, options["all"]): name
+                for name in by_cover
+            }
+
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    widths = future.result()
+                except Exception as e:
+                    METRICS.inc("covers_total", result="error")
+                    self.stderr.write(f"Failed {name}: {e}")
+                    continue
+
+                METRICS.inc("covers_total", result="done")
+                for book in by_cover[name]:
+                    book.cover_thumb_widths = ",".join(str(w) for w in widths)
+                    updated.append(book)
+
+                if len(updated) >= options["batch_size"]:
+                    self.flush(updated)
+                    METRICS.maybe_report()
+
+        self.flush(updated)
+        METRICS.report()
+
+    def generate(self, name, force):
+        with METRICS.timer("thumbnail_seconds"):
+            return generate_thumbnails(name, force=force)
+
+    def flush(self, updated):
+        with METRICS.timer("db_write_seconds"):
+            Book.objects.bulk_update(updated, ["cover_thumb_widths"])
+        self.stdout.write(self.style.SUCCESS(f"Updated {len(updated)} books"))
+        updated.clear()
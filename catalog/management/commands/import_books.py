@@ -1,12 +1,176 @@
 import csv
+import os
+import re
+import threading
 import time
-import requests
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 from django.core.management.base import BaseCommand
-from django.core.files.base import ContentFile
 from django.utils import timezone
 
-from catalog.models import Book
+from catalog.isbn import canonicalize, canonicalize_many, normalize_identifier
+from catalog.models import Book, BookIdentifier
+from enrichment_metrics import Metrics
+from http_cache import cached_get, looks_like_json
+from ratelimit import TokenBucket
+
+
+METRICS = Metrics("import_books")
+
+OPENLIBRARY_URL = os.environ.get("EOB_OPENLIBRARY_URL", "https://openlibrary.org")
+
+
+def timed_get(endpoint, url, **kwargs):
+    """cached_get with per-endpoint latency and request counts."""
+    try:
+        with METRICS.timer("http_request_seconds", endpoint=endpoint):
+            r = cached_get(url, **kwargs)
+    except Exception:
+        METRICS.inc("http_requests_total", endpoint=endpoint, cache="miss", status="error")
+        raise
+
+    METRICS.inc(
+        "http_requests_total",
+        endpoint=endpoint,
+        cache="hit" if getattr(r, "from_cache", False) else "miss",
+        status=str(r.status_code),
+    )
+    return r
+
+
+def fetch_edition(isbn, get=timed_get):
+    """Books API record for one ISBN ({} if unknown)."""
+    url = (
+        f"{OPENLIBRARY_URL}/api/books"
+        f"?bibkeys=ISBN:{isbn}&format=json&jscmd=data"
+    )
+    return get(
+        "books", url, source="openlibrary", timeout=15, cacheable=looks_like_json,
+    ).json().get(f"ISBN:{isbn}", {})
+
+
+def fetch_search_doc(isbn, get=timed_get):
+    """Social stats + work key from search.json ({} if no match)."""
+    search_url = (
+        f"{OPENLIBRARY_URL}/search.json"
+        f"?q=isbn:{isbn}"
+        "&fields=key,want_to_read_count,already_read_count,"
+        "currently_reading_count,ratings_average"
+    )
+
+    search_resp = get(
+        "search",
+        search_url,
+        source="openlibrary_search",
+        timeout=15,
+        cacheable=looks_like_json,
+    ).json()
+    return (
+        search_resp.get("docs", [{}])[0]
+        if search_resp.get("docs")
+        else {}
+    )
+
+
+def fetch_work_description(work_key, get=timed_get):
+    """Description of a work (/works/OLxxxxW), "" if it has none."""
+    work_data = get(
+        "works",
+        f"{OPENLIBRARY_URL}{work_key}.json",
+        source="openlibrary",
+        timeout=15,
+        cacheable=looks_like_json,
+    ).json()
+
+    raw_desc = work_data.get("description", "")
+    if isinstance(raw_desc, dict):
+        return raw_desc.get("value", "")
+    return raw_desc or ""
+
+
+COVER_ID_RE = re.compile(r"/b/id/(\d+)-")
+
+
+def cover_id_of(data_resp):
+    """
+    Open Library cover id from the Books API cover URLs. The image
+    itself is fetched later by the download_covers command.
+    """
+    cover_data = data_resp.get("cover", {})
+    for size in ("large", "medium", "small"):
+        match = COVER_ID_RE.search(cover_data.get(size) or "")
+        if match:
+            return match.group(1)
+    return None
+
+
+def _failed(future):
+    return future.done() and (future.cancelled() or future.exception() is not None)
+
+
+class BookFetcher:
+    """
+    Pipelined network side of import_rich_book for --pipelined.
+
+    Per ISBN, the Books API and search.json requests go out together;
+    the Works request starts as soon as search.json has returned the
+    work key. Works descriptions are memoized by work key (one shared
+    future per work, so editions of the same work in flight at the
+    same time wait on a single request); a failed request is dropped
+    from the memo so later editions retry it. Every request, from any
+    thread, first takes a token from one TokenBucket.
+
+    Only HTTP happens here; ORM writes stay on the calling thread.
+    """
+
+    def __init__(self, concurrency, rps):
+        self.bucket = TokenBucket(rps)
+        # Each ISBN task blocks on up to three requests of its own
+        self.isbn_pool = ThreadPoolExecutor(concurrency, thread_name_prefix="isbn")
+        self.http_pool = ThreadPoolExecutor(concurrency * 3, thread_name_prefix="http")
+        self.works = {}
+        self._works_lock = threading.Lock()
+
+    def get(self, endpoint, url, **kwargs):
+        started = time.monotonic()
+        self.bucket.acquire()
+        METRICS.inc("sleep_seconds_total", time.monotonic() - started)
+        return timed_get(endpoint, url, **kwargs)
+
+    def work_description(self, work_key):
+        with self._works_lock:
+            future = self.works.get(work_key)
+            if future is None or _failed(future):
+                future = self.works[work_key] = self.http_pool.submit(
+                    fetch_work_description, work_key, self.get,
+                )
+        return future
+
+    def fetch(self, isbn):
+        edition = self.http_pool.submit(fetch_edition, isbn, self.get)
+        search = self.http_pool.submit(fetch_search_doc, isbn, self.get)
+
+        search_doc = search.result()
+        work_key = search_doc.get("key")  # /works/OLxxxxW
+        description = self.work_description(work_key) if work_key else None
+
+        data_resp = edition.result()
+        if not data_resp:
+            # Shared work future is left to whoever else needs it
+            return data_resp, search_doc, ""
+
+        return (
+            data_resp,
+            search_doc,
+            description.result() if description else "",
+        )
+
+    def submit(self, isbn):
+        return self.isbn_pool.submit(self.fetch, isbn)
+
+    def shutdown(self):
+        self.isbn_pool.shutdown(wait=False, cancel_futures=True)
+        self.http_pool.shutdown(wait=False, cancel_futures=True)
 
 
 class Command(BaseCommand):
@@ -15,6 +179,18 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument("csv_file", type=str)
         parser.add_argument("--sleep", type=float, default=2.0)
+        parser.add_argument(
+            "--pipelined",
+            action="store_true",
+            help="Fetch several ISBNs concurrently under --rps instead of sleeping",
+        )
+        parser.add_argument("--concurrency", type=int, default=4)
+        parser.add_argument(
+            "--rps",
+            type=float,
+            default=1.0,
+            help="Global request cap for --pipelined (0 = unlimited)",
+        )
 
     def handle(self, *args, **options):
         csv_file = options["csv_file"]
@@ -22,15 +198,60 @@ class Command(BaseCommand):
 
         with open(csv_file, newline="", encoding="utf-8") as f:
             reader = csv.DictReader(f)
-            for row in reader:
-                isbn = row.get("isbn10", "").strip()
-                if not isbn:
-                    continue
+            raw = [row.get("isbn10") or row.get("isbn13") or "" for row in reader]
 
+        # ISBN-10 stays the enrichment anchor when one exists (see Book)
+        batch = canonicalize_many(raw)
+        isbns = []
+        for value, isbn10, isbn13, valid in zip(raw, batch.isbn10, batch.isbn13, batch.valid):
+            if valid:
+                isbns.append(str(isbn10 or isbn13))
+            elif value.strip():
+                self.stderr.write(f"Skipping invalid ISBN: {value}")
+
+        if options["pipelined"]:
+            self.import_pipelined(isbns, options["concurrency"], options["rps"])
+        else:
+            self.work_descriptions = {}
+            for isbn in isbns:
                 self.stdout.write(f"Processing ISBN: {isbn}...")
                 self.import_rich_book(isbn)
 
-                time.sleep(sleep_time)  # respectful throttling
+                METRICS.sleep(sleep_time)  # respectful throttling
+                METRICS.maybe_report()
+
+        METRICS.report()
+
+    def import_pipelined(self, isbns, concurrency, rps):
+        fetcher = BookFetcher(concurrency, rps)
+        queue = iter(isbns)
+        pending = {}
+
+        try:
+            while True:
+                # Keep a couple of ISBNs queued behind the ones in flight
+                while len(pending) < concurrency * 2:
+                    isbn = next(queue, None)
+                    if isbn is None:
+                        break
+                    pending[fetcher.submit(isbn)] = isbn
+
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    isbn = pending.pop(future)
+                    self.stdout.write(f"Processing ISBN: {isbn}...")
+                    try:
+                        self.save_rich_book(isbn, *future.result())
+                    except Exception as e:
+                        METRICS.inc("isbns_total", result="error")
+                        self.stderr.write(f"Failed {isbn}: {str(e)}")
+
+                METRICS.maybe_report()
+        finally:
+            fetcher.shutdown()
 
     def import_rich_book(self, isbn):
         """
@@ -41,118 +262,131 @@ class Command(BaseCommand):
             # --------------------------------------------------
             # 1. Fetch core metadata (Books API)
             # --------------------------------------------------
-            url = (
-                f"https://openlibrary.org/api/books"
-                f"?bibkeys=ISBN:{isbn}&format=json&jscmd=data"
-            )
-
-            data_resp = requests.get(url, timeout=15).json().get(f"ISBN:{isbn}", {})
+            data_resp = fetch_edition(isbn)
             if not data_resp:
+                METRICS.inc("isbns_total", result="miss")
                 self.stderr.write(f"No data found for {isbn}")
                 return
 
             # --------------------------------------------------
             # 2. Fetch social stats (Search API)
             # --------------------------------------------------
-            search_url = (
-                "https://openlibrary.org/search.json"
-                f"?q=isbn:{isbn}"
-                "&fields=key,want_to_read_count,already_read_count,"
-                "currently_reading_count,ratings_average"
-            )
-
-            search_resp = requests.get(search_url, timeout=15).json()
-            search_doc = (
-                search_resp.get("docs", [{}])[0]
-                if search_resp.get("docs")
-                else {}
-            )
+            search_doc = fetch_search_doc(isbn)
 
             # --------------------------------------------------
-            # 3. Fetch description (Works API)
+            # 3. Fetch description (Works API, memoized per work)
             # --------------------------------------------------
             description = ""
             work_key = search_doc.get("key")  # /works/OLxxxxW
             if work_key:
-                work_data = requests.get(
-                    f"https://openlibrary.org{work_key}.json",
-                    timeout=15,
-                ).json()
+                memo = getattr(self, "work_descriptions", {})
+                if work_key not in memo:
+                    memo[work_key] = fetch_work_description(work_key)
+                description = memo[work_key]
 
-                raw_desc = work_data.get("description", "")
-                if isinstance(raw_desc, dict):
-                    description = raw_desc.get("value", "")
-                else:
-                    description = raw_desc or ""
+            self.save_rich_book(isbn, data_resp, search_doc, description)
 
-            # --------------------------------------------------
-            # 4. Extract normalized fields
-            # --------------------------------------------------
-            title = data_resp.get("title", "Unknown")
+        except Exception as e:
+            METRICS.inc("isbns_total", result="error")
+            self.stderr.write(f"Failed {isbn}: {str(e)}")
 
-            author_names = ", ".join(
-                a.get("name") for a in data_resp.get("authors", []) if a.get("name")
-            )
+    def save_rich_book(self, isbn, data_resp, search_doc, description):
+        """
+        ORM side of the import: upsert the Book and stamp
+        last_enriched. Runs on the main thread in both modes.
 
-            publisher = data_resp.get("publishers", [{}])[0].get("name", "")
+        Only the Open Library cover id is recorded; images are
+        downloaded separately (manage.py download_covers).
+        """
+        if not data_resp:
+            METRICS.inc("isbns_total", result="miss")
+            self.stderr.write(f"No data found for {isbn}")
+            return
 
-            pub_year = None
-            if "publish_date" in data_resp:
-                digits = "".join(c for c in data_resp["publish_date"] if c.isdigit())
-                if len(digits) >= 4:
-                    pub_year = int(digits[:4])
+        # --------------------------------------------------
+        # 1. Extract normalized fields
+        # --------------------------------------------------
+        title = data_resp.get("title", "Unknown")
 
-            # --------------------------------------------------
-            # 5. Upsert book (idempotent, cron-safe)
-            # --------------------------------------------------
-            book, created = Book.objects.update_or_create(
-                isbn10=isbn,
-                defaults={
-                    "title": title,
-                    "author": author_names,
-                    "publisher": publisher,
-                    "publication_year": pub_year,
-                    "description": description,
-                    "language": data_resp.get("languages", [{}])[0].get("name", ""),
-                    "pages": data_resp.get("number_of_pages"),
-                    "amazon_asin": data_resp.get("identifiers", {}).get("amazon", [None])[0],
-                    "rating_avg": search_doc.get("ratings_average"),
-                    "want_to_read_count": search_doc.get("want_to_read_count", 0),
-                    "currently_reading_count": search_doc.get("currently_reading_count", 0),
-                    "already_read_count": search_doc.get("already_read_count", 0),
-                    "preview_url": data_resp.get("preview_url", ""),
-                },
-            )
+        author_names = ", ".join(
+            a.get("name") for a in data_resp.get("authors", []) if a.get("name")
+        )
 
-            # --------------------------------------------------
-            # 6. Handle cover image (optional)
-            # --------------------------------------------------
-            cover_data = data_resp.get("cover", {})
-            cover_url = cover_data.get("large") or cover_data.get("medium")
-            if cover_url:
-                self.download_cover(book, cover_url)
+        publisher = data_resp.get("publishers", [{}])[0].get("name", "")
 
-            # --------------------------------------------------
-            # 7. Mark successful enrichment (THIS is the key line)
-            # --------------------------------------------------
-            book.last_enriched = timezone.now()
-            book.save(update_fields=["last_enriched"])
+        pub_year = None
+        if "publish_date" in data_resp:
+            digits = "".join(c for c in data_resp["publish_date"] if c.isdigit())
+            if len(digits) >= 4:
+                pub_year = int(digits[:4])
+
+        # --------------------------------------------------
+        # 2. Upsert book (idempotent, cron-safe)
+        # --------------------------------------------------
+        ids = canonicalize(isbn)
+        if ids.isbn13 is None:
+            raise ValueError(f"invalid ISBN {isbn}")
 
-            self.stdout.write(
-                self.style.SUCCESS(f"Successfully enriched {title}")
+        fields = {
+            "title": title,
+            "author": author_names,
+            "publisher": publisher,
+            "publication_year": pub_year,
+            "description": description,
+            "language": data_resp.get("languages", [{}])[0].get("name", ""),
+            "pages": data_resp.get("number_of_pages"),
+            "amazon_asin": data_resp.get("identifiers", {}).get("amazon", [None])[0],
+            "rating_avg": search_doc.get("ratings_average"),
+            "want_to_read_count": search_doc.get("want_to_read_count", 0),
+            "currently_reading_count": search_doc.get("currently_reading_count", 0),
+            "already_read_count": search_doc.get("already_read_count", 0),
+            "preview_url": data_resp.get("preview_url", ""),
+            "cover_openlibrary_id": cover_id_of(data_resp),
+        }
+
+        with METRICS.timer("db_write_seconds"):
+            # The identifier index finds the book whichever ISBN form
+            # it was stored under (an isbn10 lookup alone would miss a
+            # book holding only the isbn13, then collide on insert)
+            book = BookIdentifier.objects.resolve(ids.isbn13)
+            if book is None and ids.isbn10:
+                book = BookIdentifier.objects.resolve(ids.isbn10)
+
+            if book is None:
+                book = Book.objects.create(isbn10=ids.isbn10, isbn13=ids.isbn13, **fields)
+            else:
+                for name, value in fields.items():
+                    setattr(book, name, value)
+                # Fill in the missing ISBN form unless another book has it
+                if not book.isbn13:
+                    book.isbn13 = ids.isbn13
+                if not book.isbn10 and ids.isbn10:
+                    owner = BookIdentifier.objects.resolve(ids.isbn10)
+                    if owner is None or owner.pk == book.pk:
+                        book.isbn10 = ids.isbn10
+                book.save()
+
+        # --------------------------------------------------
+        # 3. Register the OL edition key as a lookup identifier
+        # --------------------------------------------------
+        olid = normalize_identifier(
+            data_resp.get("key")
+            or (data_resp.get("identifiers", {}).get("openlibrary") or [""])[0]
+        )
+        if olid.startswith("OL"):
+            BookIdentifier.objects.get_or_create(
+                value=olid,
+                defaults={"book": book, "kind": BookIdentifier.OLID},
             )
 
-        except Exception as e:
-            self.stderr.write(f"Failed {isbn}: {str(e)}")
+        # --------------------------------------------------
+        # 4. Mark successful enrichment (THIS is the key line)
+        # --------------------------------------------------
+        book.last_enriched = timezone.now()
+        with METRICS.timer("db_write_seconds"):
+            book.save(update_fields=["last_enriched"])
+        METRICS.inc("isbns_total", result="hit")
 
-    def download_cover(self, book, url):
-        try:
-            r = requests.get(url, timeout=10)
-            if r.status_code == 200:
-                book.cover_image.save(
-                    f"{book.isbn10}.jpg",
-                    ContentFile(r.content),
-                    save=True,
-                )
-        except Exception:
-            pass
+        self.stdout.write(
+            self.style.SUCCESS(f"Successfully enriched {title}")
+        )
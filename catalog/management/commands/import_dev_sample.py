@@ -1,7 +1,8 @@
 import csv
 from django.core.management.base import BaseCommand
 from django.utils.dateparse import parse_datetime
-from catalog.models import Book
+from catalog.isbn import canonicalize_many
+from catalog.models import Book, BookIdentifier
 
 
 class Command(BaseCommand):
@@ -14,19 +15,45 @@ class Command(BaseCommand):
         path = options["csv_file"]
 
         with open(path, newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-
-            for row in reader:
-                Book.objects.update_or_create(
-                    isbn13=row["isbn13"],
-                    defaults={
-                        "title": row["title"],
-                        "author": row["author"],
-                        "publisher": row["publisher"],
-                        "publication_year": row["publication_year"] or None,
-                        "description": row["description"],
-                        "last_enriched": parse_datetime(row["last_enriched"]),
-                    },
-                )
+            rows = list(csv.DictReader(f))
+
+        batch = canonicalize_many([row["isbn13"] for row in rows])
+
+        for row, isbn10, isbn13, valid in zip(rows, batch.isbn10, batch.isbn13, batch.valid):
+            if not valid:
+                self.stderr.write(f"Skipping invalid ISBN: {row['isbn13']}")
+                continue
+
+            # Plain str, "" for a 979 ISBN with no ISBN-10 form
+            isbn10, isbn13 = str(isbn10), str(isbn13)
+            fields = {
+                "title": row["title"],
+                "author": row["author"],
+                "publisher": row["publisher"],
+                "publication_year": row["publication_year"] or None,
+                "description": row["description"],
+                "last_enriched": parse_datetime(row["last_enriched"]),
+            }
+
+            # Found under whichever ISBN form it was stored with, as in
+            # import_books.save_rich_book
+            book = BookIdentifier.objects.resolve(isbn13)
+            if book is None and isbn10:
+                book = BookIdentifier.objects.resolve(isbn10)
+
+            if book is None:
+                Book.objects.create(isbn10=isbn10 or None, isbn13=isbn13, **fields)
+                continue
+
+            for name, value in fields.items():
+                setattr(book, name, value)
+            if not book.isbn13:
+                book.isbn13 = isbn13
+            # Only fill in an ISBN-10 no other book already holds
+            if not book.isbn10 and isbn10:
+                owner = BookIdentifier.objects.resolve(isbn10)
+                if owner is None or owner.pk == book.pk:
+                    book.isbn10 = isbn10
+            book.save()
 
         self.stdout.write(self.style.SUCCESS("DEV sample import complete"))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from catalog.isbn import identifier_rows
+from catalog.models import Book, BookIdentifier
+
+
+class Command(BaseCommand):
+    help = "Rebuild the BookIdentifier lookup table from Book ISBN / ASIN fields"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        derived = [k for k, _ in BookIdentifier.KIND_CHOICES if k != BookIdentifier.OLID]
+
+        books = Book.objects.only("id", "isbn10", "isbn13", "amazon_asin").order_by("id")
+        last_id = 0
+        total = 0
+
+        while True:
+            chunk = list(books.filter(id__gt=last_id)[:batch_size])
+            if not chunk:
+                break
+            last_id = chunk[-1].id
+
+            rows = [
+                BookIdentifier(book_id=book.id, kind=kind, value=value)
+                for book in chunk
+                for kind, value in identifier_rows(book.isbn10, book.isbn13, book.amazon_asin)
+            ]
+
+            # OLID rows come from the importers, not Book fields; keep them
+            with transaction.atomic():
+                BookIdentifier.objects.filter(
+                    book_id__in=[book.id for book in chunk], kind__in=derived,
+                ).delete()
+                BookIdentifier.objects.bulk_create(rows, ignore_conflicts=True)
+
+            total += len(chunk)
+            self.stdout.write(f"  {total} books")
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt identifiers for {total} books"))
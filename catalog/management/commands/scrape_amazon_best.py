@@ -9,6 +9,9 @@ from typing import List, Dict
 from bs4 import BeautifulSoup
 from curl_cffi import requests
 
+from catalog.isbn import canonicalize_many
+from http_cache import cached_get, looks_like_json
+
 
 # =========================
 # CONFIG
@@ -30,6 +33,8 @@ OPENLIB_SLEEP_MAX = 3
 
 OUTPUT_FILE = "amazon_seed_books.csv"
 
+OPENLIBRARY_URL = os.environ.get("EOB_OPENLIBRARY_URL", "https://openlibrary.org")
+
 
 # =========================
 # REGEX / STRUCTURES
@@ -89,7 +94,13 @@ def append_rows(path: str, rows: List[Dict]):
 # =========================
 
 def fetch_html(session, url):
-    r = session.get(url, timeout=20)
+    r = cached_get(
+        url,
+        source="amazon",
+        timeout=20,
+        fetch=session.get,
+        cacheable=lambda resp: b"captcha" not in resp.content.lower(),
+    )
     html = r.text or ""
 
     if r.status_code in (429, 503):
@@ -146,30 +157,37 @@ def parse_items(html: str) -> List[AmazonItem]:
 def openlibrary_lookup(title, author):
     q = f"{title} {author}".strip()
 
-    r = requests.get(
-        "https://openlibrary.org/search.json",
+    r = cached_get(
+        f"{OPENLIBRARY_URL}/search.json",
         params={
             "q": q,
             "fields": "key,title,author_name,isbn",
             "limit": 5,
         },
+        source="openlibrary_search",
         timeout=15,
+        fetch=requests.get,
+        cacheable=looks_like_json,
     )
 
     if r.status_code != 200:
         return None
 
     for d in r.json().get("docs", []):
-        isbns = d.get("isbn") or []
-        isbn10 = next((x for x in isbns if len(x) == 10), "")
-        isbn13 = next((x for x in isbns if len(x) == 13), "")
-
-        if isbn10 or isbn13:
-            return {
-                "isbn10": isbn10,
-                "isbn13": isbn13,
-                "ol_key": d.get("key", ""),
-            }
+        batch = canonicalize_many(d.get("isbn") or [])
+        if not batch.valid.any():
+            continue
+
+        # Prefer an ISBN that has both forms (978) over a 979-only one;
+        # both fields then describe the same edition.
+        usable = batch.valid & ~batch.no_isbn10
+        i = int(usable.argmax()) if usable.any() else int(batch.valid.argmax())
+
+        return {
+            "isbn10": str(batch.isbn10[i]),
+            "isbn13": str(batch.isbn13[i]),
+            "ol_key": d.get("key", ""),
+        }
 
     return None
 
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.27 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0008_book_last_enriched_alter_book_isbn10_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='cover_thumb_widths',
+            field=models.CharField(blank=True, default='', help_text='Comma-separated widths of generated cover thumbnails', max_length=64),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.27 on 2026-10-18 11:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from catalog.isbn import identifier_rows
+
+
+def backfill_identifiers(apps, schema_editor):
+    Book = apps.get_model("catalog", "Book")
+    BookIdentifier = apps.get_model("catalog", "BookIdentifier")
+
+    batch = []
+    books = Book.objects.only("id", "isbn10", "isbn13", "amazon_asin").iterator(chunk_size=2000)
+    for book in books:
+        for kind, value in identifier_rows(book.isbn10, book.isbn13, book.amazon_asin):
+            batch.append(BookIdentifier(book_id=book.id, kind=kind, value=value))
+        if len(batch) >= 5000:
+            BookIdentifier.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    BookIdentifier.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0009_book_cover_thumb_widths'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookIdentifier',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.CharField(max_length=32, unique=True)),
+                ('kind', models.CharField(choices=[('isbn10', 'ISBN-10'), ('isbn13', 'ISBN-13'), ('asin', 'ASIN'), ('olid', 'Open Library edition')], max_length=8)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='identifiers', to='catalog.book')),
+            ],
+        ),
+        migrations.RunPython(backfill_identifiers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0011_book_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='search_rank',
+            field=models.FloatField(default=1.0),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['search_rank', 'id'], name='book_search_rank_id'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 import os
 from django.db import models
 
+from catalog.isbn import identifier_rows, normalize_identifier
+
 # NOTE:
 # Cover storage paths intentionally prefer ISBN-10 when available.
 # This mirrors the primary enrichment identifier choice.
@@ -111,8 +113,20 @@ class Book(models.Model):
         help_text="Cover image of the book",
     )
     cover_openlibrary_id = models.CharField(max_length=32, null=True, blank=True)
+    # sha256 of the stored cover file; download_covers dedupes on it
+    cover_digest = models.CharField(max_length=64, blank=True, default="", db_index=True)
+    cover_thumb_widths = models.CharField(
+        max_length=64, blank=True, default="",
+        help_text="Comma-separated widths of generated cover thumbnails",
+    )
+
+    # Popularity multiplier for search ordering, maintained by
+    # search.ranking (never edited by hand)
+    search_rank = models.FloatField(default=1.0)
 
     created_at = models.DateTimeField(auto_now_add=True)
+    # Incremental consumers (search autocomplete) poll on this
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ["title"]
@@ -122,4 +136,87 @@ class Book(models.Model):
         ]
 
     def __str__(self):
-        return f"{self.title} ({self.author})" if self.author else self.title
\ No newline at end of file
+        return f"{self.title} ({self.author})" if self.author else self.title
+
+    @property
+    def thumb_widths(self):
+        return [int(w) for w in self.cover_thumb_widths.split(",") if w]
+
+    # Fields BookIdentifier rows are derived from
+    IDENTIFIER_FIELDS = ("isbn10", "isbn13", "amazon_asin")
+
+    def identifier_rows(self):
+        return identifier_rows(self.isbn10, self.isbn13, self.amazon_asin)
+
+    def sync_identifiers(self):
+        """
+        Bring this book's ISBN / ASIN BookIdentifier rows in line with
+        its fields. OLID rows are registered by the importers and left
+        alone. A value already owned by another book is skipped.
+        """
+        rows = self.identifier_rows()
+        derived = [k for k, _ in BookIdentifier.KIND_CHOICES if k != BookIdentifier.OLID]
+
+        self.identifiers.filter(kind__in=derived).exclude(
+            value__in=[value for _, value in rows]
+        ).delete()
+        BookIdentifier.objects.bulk_create(
+            [BookIdentifier(book=self, kind=kind, value=value) for kind, value in rows],
+            ignore_conflicts=True,
+        )
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or set(update_fields) & set(self.IDENTIFIER_FIELDS):
+            self.sync_identifiers()
+
+
+class BookIdentifierQuerySet(models.QuerySet):
+
+    def resolve(self, raw):
+        """Book for any identifier form, in one indexed lookup (or None)."""
+        match = (
+            self.select_related("book")
+            .filter(value=normalize_identifier(raw))
+            .first()
+        )
+        return match.book if match else None
+
+
+class BookIdentifier(models.Model):
+    """
+    Every normalized identifier of a book (ISBN-10, ISBN-13, ASIN, OL
+    edition key) -> the book, so any pasted form resolves with a single
+    equality lookup on `value`.
+
+    Maintained by Book.save() and `manage.py rebuild_identifiers`.
+    Queryset .update() / bulk_update() on Book's identifier fields
+    bypass save(): rebuild afterwards.
+    """
+
+    ISBN10 = "isbn10"
+    ISBN13 = "isbn13"
+    ASIN = "asin"
+    OLID = "olid"
+
+    KIND_CHOICES = [
+        (ISBN10, "ISBN-10"),
+        (ISBN13, "ISBN-13"),
+        (ASIN, "ASIN"),
+        (OLID, "Open Library edition"),
+    ]
+
+    value = models.CharField(max_length=32, unique=True)
+    kind = models.CharField(max_length=8, choices=KIND_CHOICES)
+    book = models.ForeignKey(
+        Book,
+        on_delete=models.CASCADE,
+        related_name="identifiers",
+    )
+
+    objects = BookIdentifierQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.value}"
\ No newline at end of file
@@ -0,0 +1,43 @@
+from django import template
+from django.utils.html import format_html
+
+from catalog.thumbnails import thumbnail_name, thumbnail_srcsets
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def cover_picture(book, sizes, style="", loading="lazy"):
+    """
+    <picture> for a book cover: WebP and JPEG srcsets over the
+    generated thumbnails, falling back to the original image for
+    covers that have none yet.
+
+        {% cover_picture book "80px" style="width: 80px;" %}
+    """
+    if not book.cover_image:
+        return ""
+
+    widths = book.thumb_widths
+    if not widths:
+        return format_html(
+            '<img src="{}" alt="{}" style="{}" loading="{}" decoding="async">',
+            book.cover_image.url, book.title, style, loading,
+        )
+
+    name = book.cover_image.name
+    storage = book.cover_image.storage
+    srcsets = thumbnail_srcsets(name, widths, storage)
+
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" style="{}" '
+        'loading="{}" decoding="async">'
+        '</picture>',
+        srcsets["webp"], sizes,
+        storage.url(thumbnail_name(name, widths[-1], "jpg")),
+        srcsets["jpg"], sizes,
+        book.title, style, loading,
+    )
@@ -1,3 +1,86 @@
-from django.test import TestCase
+import io
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase
+
+from catalog.isbn import canonicalize, canonicalize_many, clean, clean_many
+from catalog.management.commands.import_books import Command as ImportBooks
+from catalog.models import Book, BookIdentifier
+
+
+class CanonicalizeManyTests(SimpleTestCase):
+
+    RAW = [
+        "9780306406157",
+        "978-0-306-40615-7",
+        " 0-306-40615-2 ",
+        "080442957x",
+        "080442957X",
+        "9791034304523",
+        "979-10-343-0452-3",
+        "9780306406158",
+        "0306406153",
+        "",
+        "junk",
+        "ISBN 0306406152",
+        "12345",
+        "97803064061570",
+    ]
+
+    def test_matches_scalar_canonicalize(self):
+        batch = canonicalize_many(self.RAW)
+
+        for i, raw in enumerate(self.RAW):
+            with self.subTest(raw=raw):
+                ids = canonicalize(raw)
+                self.assertEqual(str(batch.isbn10[i]) or None, ids.isbn10)
+                self.assertEqual(str(batch.isbn13[i]) or None, ids.isbn13)
+                self.assertEqual(bool(batch.valid[i]), ids.isbn13 is not None)
+
+    def test_lowercase_x_and_979_prefix(self):
+        batch = canonicalize_many(["080442957x", "9791034304523"])
+
+        self.assertEqual(list(batch.isbn10), ["080442957X", ""])
+        self.assertEqual(list(batch.isbn13), ["9780804429573", "9791034304523"])
+        self.assertEqual(list(batch.valid), [True, True])
+        self.assertEqual(list(batch.no_isbn10), [False, True])
+
+    def test_empty_input(self):
+        batch = canonicalize_many([])
+
+        for field in batch:
+            self.assertEqual(len(field), 0)
+
+    def test_clean_many_matches_clean(self):
+        self.assertEqual(list(clean_many(self.RAW)), [clean(raw) for raw in self.RAW])
+
+
+class SaveRichBookTests(TestCase):
+
+    def save(self, isbn, title="Enriched"):
+        command = ImportBooks(stdout=io.StringIO(), stderr=io.StringIO())
+        command.save_rich_book(
+            isbn,
+            {"title": title, "key": "/books/OL123M"},
+            {"want_to_read_count": 7},
+            "A description",
+        )
+
+    def test_isbn10_updates_book_stored_under_isbn13(self):
+        book = Book.objects.create(isbn13="9780306406157", title="Old")
+
+        self.save("0306406152")
+
+        self.assertEqual(Book.objects.count(), 1)
+        book.refresh_from_db()
+        self.assertEqual(book.title, "Enriched")
+        self.assertEqual(book.isbn10, "0306406152")
+        self.assertEqual(book.want_to_read_count, 7)
+        self.assertIsNotNone(book.last_enriched)
+        self.assertEqual(BookIdentifier.objects.resolve("0306406152"), book)
+
+    def test_unknown_isbn_creates_book(self):
+        self.save("9780306406157")
+
+        book = Book.objects.get()
+        self.assertEqual((book.isbn10, book.isbn13), ("0306406152", "9780306406157"))
+        self.assertEqual(BookIdentifier.objects.resolve("OL123M"), book)
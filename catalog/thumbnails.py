@@ -0,0 +1,87 @@
+import io
+import os
+
+from PIL import Image
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+
+# Fixed widths (px) derived from every cover. Grid cards render at
+# ~80px, shelf covers at ~180px, the detail page at 180px; 2x covers
+# high-DPI screens.
+THUMB_WIDTHS = (80, 160, 240, 320)
+
+# (file extension, Pillow format, save options)
+THUMB_FORMATS = (
+    ("webp", "WEBP", {"quality": 80, "method": 4}),
+    ("jpg", "JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+)
+
+
+def thumbnail_name(cover_name, width, extension):
+    """
+    Storage name of a derivative, next to the original:
+    catalog/covers/0/1/2/0123456789.jpg -> .../0123456789-w160.webp
+    """
+    root, _ = os.path.splitext(cover_name)
+    return f"{root}-w{width}.{extension}"
+
+
+def target_widths(original_width):
+    """THUMB_WIDTHS that don't upscale; the original width if none fit."""
+    widths = [w for w in THUMB_WIDTHS if w <= original_width]
+    return widths or [original_width]
+
+
+def generate_thumbnails(cover_name, storage=default_storage, force=False):
+    """
+    Write every width x format derivative of one stored cover and
+    return the widths now available. Existing files are kept unless
+    `force` (covers shared by several editions are processed once).
+    """
+    with storage.open(cover_name, "rb") as f:
+        image = Image.open(f)
+        image.load()
+
+    if image.mode not in ("RGB", "L"):
+        # JPEG has no alpha; flatten onto white
+        background = Image.new("RGB", image.size, "white")
+        rgba = image.convert("RGBA")
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        image = background
+    elif image.mode == "L":
+        image = image.convert("RGB")
+
+    widths = target_widths(image.width)
+
+    for width in widths:
+        height = max(1, round(image.height * width / image.width))
+        resized = None
+
+        for extension, image_format, options in THUMB_FORMATS:
+            name = thumbnail_name(cover_name, width, extension)
+            if not force and storage.exists(name):
+                continue
+
+            if resized is None:
+                resized = image.resize((width, height), Image.LANCZOS)
+
+            buf = io.BytesIO()
+            resized.save(buf, image_format, **options)
+            if storage.exists(name):
+                storage.delete(name)
+            storage.save(name, ContentFile(buf.getvalue()))
+
+    return widths
+
+
+def thumbnail_srcsets(cover_name, widths, storage=default_storage):
+    """{extension: "url 80w, url 160w, ..."} for the given widths."""
+    return {
+        extension: ", ".join(
+            f"{storage.url(thumbnail_name(cover_name, w, extension))} {w}w"
+            for w in widths
+        )
+        for extension, _, _ in THUMB_FORMATS
+    }
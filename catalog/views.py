@@ -1,13 +1,13 @@
 # catalog/views.py
-from django.shortcuts import get_object_or_404, render
-from django.db.models import Q
-from .models import Book
+from django.http import Http404
+from django.shortcuts import render
+from .models import BookIdentifier
 
 def book_detail(request, identifier):
-    book = get_object_or_404(
-        Book,
-        Q(isbn10=identifier) | Q(isbn13=identifier)
-    )
+    # Any form: ISBN-10/13 with or without hyphens, ASIN, OL edition key
+    book = BookIdentifier.objects.resolve(identifier)
+    if book is None:
+        raise Http404("No Book matches the given query.")
 
     listings_qs = (
         book.listings
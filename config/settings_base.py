@@ -65,6 +65,10 @@ USE_TZ = True
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Uploads that must never be web-served (seller inventory feeds).
+# Keep outside MEDIA_ROOT.
+PRIVATE_MEDIA_ROOT = Path(os.environ.get("EOB_PRIVATE_MEDIA_ROOT", BASE_DIR / "private"))
+
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_DIRS = [BASE_DIR / "main" / "static"]
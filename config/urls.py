@@ -10,6 +10,7 @@ urlpatterns = [
     path("", include("main.urls")),
     path("books/", include("listings.urls")),
     path("catalog/", include("catalog.urls")),
+    path("search/", include("search.urls")),
 
     # AUTH (use accounts template)
     path("login/", auth_views.LoginView.as_view(template_name="accounts/login.html"), name="login"),
@@ -5,3 +5,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings_prod')
 
 application = get_wsgi_application()
+
+# Load the autocomplete index (snapshot or DB) before the first request
+from search import autocomplete  # noqa: E402
+
+autocomplete.start()
@@ -1,10 +1,21 @@
 #!/usr/bin/env python3
 
+import argparse
+import asyncio
+import os
+import signal
+import socket
 import time
-import requests
-import psycopg2
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+import psycopg2
+from psycopg2.extras import execute_values
+
+from enrichment_metrics import Metrics
+from http_cache import cached_get, looks_like_json
+from ratelimit import TokenBucket
+
 # =========================
 # CONFIG
 # =========================
@@ -16,195 +27,964 @@ DB_CONFIG = {
     "host": "localhost",
 }
 
-OPENLIB_TIMEOUT = 15
-BATCH_SIZE = 50
-SLEEP_BETWEEN_BOOKS = 0.7
+# Point at a local stand-in (ol_stub_server.py) for tests/benchmarks.
+OPENLIBRARY_URL = os.environ.get("EOB_OPENLIBRARY_URL", "https://openlibrary.org")
+
+OPENLIB_TIMEOUT = 30
+BATCH_SIZE = 1000
+
+# ISBNs per Books API call (comma-separated bibkeys).
+# Keep URLs reasonably short; OL handles ~50-100 keys comfortably.
+BIBKEYS_PER_REQUEST = 50
+
+# Pause between Books API calls (not between books).
+SLEEP_BETWEEN_REQUESTS = 0.7
+
+# Async engine: Books API calls in flight, and global request rate.
+CONCURRENCY = 4
+REQUESTS_PER_SECOND = 1.0
+
+# Claim leases: a worker owns its batch until it writes it or the lease
+# expires, after which any worker may reclaim the unfinished ISBNs.
+LEASE_SECONDS = 900
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Failures. Transient ones (timeouts, 429/5xx, HTML error pages) are
+# retried with exponential backoff: RETRY_BASE_SECONDS * 2^attempts,
+# capped at RETRY_MAX_SECONDS. After MAX_ATTEMPTS, or on a real miss
+# (OL answered without the ISBN), the ISBN is negative-cached and
+# becomes due again after NEGATIVE_TTL_SECONDS.
+RETRY_BASE_SECONDS = 300
+RETRY_MAX_SECONDS = 2 * 24 * 3600
+MAX_ATTEMPTS = 8
+NEGATIVE_TTL_SECONDS = 90 * 24 * 3600
+
+# Buffered writes: one multi-row upsert + commit per flush.
+FLUSH_SIZE = 500
+FLUSH_INTERVAL = 30
+
+# Prometheus textfile + JSON summary lines (see enrichment_metrics.py)
+METRICS = Metrics("enrich_openlibrary")
 
 
 # =========================
 # OPEN LIBRARY FETCH
 # =========================
 
-def fetch_openlibrary(isbn13):
-    url = "https://openlibrary.org/api/books"
+class TransientFetchError(Exception):
+    """
+    The Books API call failed in a way that says nothing about the
+    ISBNs themselves (network error, rate limit, server error, HTML
+    error page). The whole group should be retried later.
+    """
+
+
+class PartialFetchError(TransientFetchError):
+    """
+    Some ISBNs of the group were looked up, the rest failed
+    transiently. `results` holds the ISBNs that were answered (record
+    or None for a real miss); `failed` the ones to retry later.
+    """
+
+    def __init__(self, message, results, failed):
+        super().__init__(message)
+        self.results = results
+        self.failed = failed
+
+
+def parse_publish_year(publish_date):
+    if not publish_date:
+        return None
+    digits = "".join(c for c in publish_date if c.isdigit())
+    if len(digits) >= 4:
+        return int(digits[:4])
+    return None
+
+
+def normalize_openlibrary(isbn13, raw):
+    """
+    Map one Books API record (jscmd=data) onto book_metadata columns.
+    """
+
+    title = raw.get("title")
+
+    authors = ", ".join(
+        a.get("name") for a in raw.get("authors", []) if a.get("name")
+    ) or None
+
+    publishers = ", ".join(
+        p.get("name") for p in raw.get("publishers", []) if p.get("name")
+    ) or None
+
+    publish_date = raw.get("publish_date")
+    publish_year = parse_publish_year(publish_date)
+
+    pages = raw.get("number_of_pages")
+
+    subjects = [
+        s.get("name") for s in raw.get("subjects", []) if s.get("name")
+    ] or None
+
+    language = None
+    if raw.get("languages"):
+        language = raw["languages"][0].get("key", "").split("/")[-1]
+
+    description = raw.get("description")
+    if isinstance(description, dict):
+        description = description.get("value")
+
+    cover_url = None
+    if raw.get("cover"):
+        cover_url = raw["cover"].get("large") or raw["cover"].get("medium")
+
+    return {
+        "isbn13": isbn13,
+        "title": title,
+        "author": authors,
+        "publisher": publishers,
+        "publish_year": publish_year,
+        "publish_date": publish_date,
+        "pages": pages,
+        "subjects": subjects,
+        "language": language,
+        "description": description,
+        "cover_url": cover_url,
+    }
+
+
+def fetch_openlibrary_batch(isbn13s, limiter=None):
+    """
+    Look up several ISBNs with a single Books API call.
+
+    Returns {isbn13: record or None}. Every requested ISBN is present in
+    the result; ISBNs Open Library did not return map to None (a real
+    miss). Raises TransientFetchError when the call itself failed.
+
+    A 4xx other than 429 may be one bad key, a URL length limit or a
+    proxy, not a verdict on every ISBN: the group is then looked up
+    one ISBN at a time (PartialFetchError if only some succeed), and a
+    single ISBN's 4xx is retried with backoff like any other failure.
+
+    `limiter` is the caller's global TokenBucket; the caller takes the
+    token for this call, the per-ISBN follow-ups take their own.
+    """
+    results = {isbn13: None for isbn13 in isbn13s}
+    if not isbn13s:
+        return results
+
+    url = f"{OPENLIBRARY_URL}/api/books"
     params = {
-        "bibkeys": f"ISBN:{isbn13}",
+        "bibkeys": ",".join(f"ISBN:{isbn13}" for isbn13 in isbn13s),
         "format": "json",
         "jscmd": "data",
     }
 
     try:
-        r = requests.get(url, params=params, timeout=OPENLIB_TIMEOUT)
-        r.raise_for_status()
+        with METRICS.timer("http_request_seconds", endpoint="books"):
+            r = cached_get(
+                url,
+                params=params,
+                source="openlibrary",
+                timeout=OPENLIB_TIMEOUT,
+                cacheable=looks_like_json,
+            )
+    except Exception as e:
+        METRICS.inc("http_requests_total", endpoint="books", cache="miss", status="error")
+        raise TransientFetchError(f"request failed: {e}") from e
+
+    METRICS.inc(
+        "http_requests_total",
+        endpoint="books",
+        cache="hit" if getattr(r, "from_cache", False) else "miss",
+        status=str(r.status_code),
+    )
+
+    if r.status_code == 429 or r.status_code >= 500:
+        raise TransientFetchError(f"HTTP {r.status_code}")
+    if r.status_code >= 400:
+        if len(isbn13s) == 1:
+            raise TransientFetchError(f"HTTP {r.status_code}")
+        return fetch_individually(isbn13s, f"HTTP {r.status_code}", limiter)
+
+    # OL sometimes returns HTML or empty body
+    if not r.text.strip().startswith("{"):
+        raise TransientFetchError("non-JSON response")
 
-        # OL sometimes returns HTML or empty body
-        if not r.text.strip().startswith("{"):
-            return None
+    try:
+        payload = r.json()
+    except ValueError as e:
+        raise TransientFetchError("truncated JSON") from e
 
-        raw = r.json().get(f"ISBN:{isbn13}")
+    for isbn13 in isbn13s:
+        raw = payload.get(f"ISBN:{isbn13}")
         if not raw:
-            return None
-
-        # ---- Normalize fields ----
-
-        title = raw.get("title")
-
-        authors = ", ".join(
-            a.get("name") for a in raw.get("authors", []) if a.get("name")
-        ) or None
-
-        publishers = ", ".join(
-            p.get("name") for p in raw.get("publishers", []) if p.get("name")
-        ) or None
-
-        publish_date = raw.get("publish_date")
-        publish_year = None
-        if publish_date:
-            digits = "".join(c for c in publish_date if c.isdigit())
-            if len(digits) >= 4:
-                publish_year = int(digits[:4])
-
-        pages = raw.get("number_of_pages")
-
-        subjects = [
-            s.get("name") for s in raw.get("subjects", []) if s.get("name")
-        ] or None
-
-        language = None
-        if raw.get("languages"):
-            language = raw["languages"][0].get("key", "").split("/")[-1]
-
-        description = raw.get("description")
-        if isinstance(description, dict):
-            description = description.get("value")
-
-        cover_url = None
-        if raw.get("cover"):
-            cover_url = raw["cover"].get("large") or raw["cover"].get("medium")
-
-        return {
-            "isbn13": isbn13,
-            "title": title,
-            "author": authors,
-            "publisher": publishers,
-            "publish_year": publish_year,
-            "publish_date": publish_date,
-            "pages": pages,
-            "subjects": subjects,
-            "language": language,
-            "description": description,
-            "cover_url": cover_url,
-        }
-
-    except Exception:
+            continue
+        try:
+            results[isbn13] = normalize_openlibrary(isbn13, raw)
+        except Exception:
+            results[isbn13] = None
+
+    return results
+
+
+def fetch_individually(isbn13s, reason, limiter=None):
+    """
+    fetch_openlibrary_batch for each ISBN on its own, after a group
+    failed. Every request takes a token from `limiter` (the engine's
+    global bucket); without one, requests are spaced by
+    SLEEP_BETWEEN_REQUESTS like the serial engine's groups.
+    """
+    results = {}
+    failed = []
+    for isbn13 in isbn13s:
+        if limiter is not None:
+            waited = time.monotonic()
+            limiter.acquire()
+            METRICS.inc("sleep_seconds_total", time.monotonic() - waited)
+        else:
+            METRICS.sleep(SLEEP_BETWEEN_REQUESTS)
+        try:
+            results.update(fetch_openlibrary_batch([isbn13]))
+        except TransientFetchError:
+            failed.append(isbn13)
+
+    if failed:
+        raise PartialFetchError(
+            f"{reason} for the group, {len(failed)} of {len(isbn13s)} failing alone",
+            results,
+            failed,
+        )
+    return results
+
+
+def fetch_openlibrary(isbn13):
+    try:
+        return fetch_openlibrary_batch([isbn13])[isbn13]
+    except TransientFetchError:
         return None
 
 
+def chunked(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
 # =========================
-# MAIN ENRICHMENT LOOP
+# DB WRITES
 # =========================
 
-def main():
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor()
+UPSERT_SQL = """
+    INSERT INTO book_metadata (
+        isbn13,
+        title,
+        author,
+        publisher,
+        publish_year,
+        publish_date,
+        pages,
+        subjects,
+        language,
+        description,
+        cover_url,
+        last_enriched,
+        source
+    )
+    VALUES %s
+    ON CONFLICT (isbn13) DO UPDATE SET
+        title = COALESCE(EXCLUDED.title, book_metadata.title),
+        author = COALESCE(EXCLUDED.author, book_metadata.author),
+        publisher = COALESCE(EXCLUDED.publisher, book_metadata.publisher),
+        publish_year = COALESCE(EXCLUDED.publish_year, book_metadata.publish_year),
+        publish_date = COALESCE(EXCLUDED.publish_date, book_metadata.publish_date),
+        pages = COALESCE(EXCLUDED.pages, book_metadata.pages),
+        subjects = COALESCE(EXCLUDED.subjects, book_metadata.subjects),
+        language = COALESCE(EXCLUDED.language, book_metadata.language),
+        description = COALESCE(EXCLUDED.description, book_metadata.description),
+        cover_url = COALESCE(EXCLUDED.cover_url, book_metadata.cover_url),
+        last_enriched = EXCLUDED.last_enriched,
+        source = EXCLUDED.source,
+        attempts = 0,
+        next_attempt_at = NULL,
+        claimed_by = NULL,
+        claimed_until = NULL
+"""
+
+# Same upsert, but existing non-null values always win: used by bulk
+# loaders (dump import) that must never overwrite enriched data.
+FILL_SQL = """
+    INSERT INTO book_metadata (
+        isbn13,
+        title,
+        author,
+        publisher,
+        publish_year,
+        publish_date,
+        pages,
+        subjects,
+        language,
+        description,
+        cover_url,
+        last_enriched,
+        source
+    )
+    VALUES %s
+    ON CONFLICT (isbn13) DO UPDATE SET
+        title = COALESCE(book_metadata.title, EXCLUDED.title),
+        author = COALESCE(book_metadata.author, EXCLUDED.author),
+        publisher = COALESCE(book_metadata.publisher, EXCLUDED.publisher),
+        publish_year = COALESCE(book_metadata.publish_year, EXCLUDED.publish_year),
+        publish_date = COALESCE(book_metadata.publish_date, EXCLUDED.publish_date),
+        pages = COALESCE(book_metadata.pages, EXCLUDED.pages),
+        subjects = COALESCE(book_metadata.subjects, EXCLUDED.subjects),
+        language = COALESCE(book_metadata.language, EXCLUDED.language),
+        description = COALESCE(book_metadata.description, EXCLUDED.description),
+        cover_url = COALESCE(book_metadata.cover_url, EXCLUDED.cover_url),
+        last_enriched = COALESCE(book_metadata.last_enriched, EXCLUDED.last_enriched),
+        source = CASE
+            WHEN book_metadata.title IS NULL THEN EXCLUDED.source
+            ELSE book_metadata.source
+        END
+"""
+
+UPSERT_TEMPLATE = """(
+    %(isbn13)s,
+    %(title)s,
+    %(author)s,
+    %(publisher)s,
+    %(publish_year)s,
+    %(publish_date)s,
+    %(pages)s,
+    %(subjects)s,
+    %(language)s,
+    %(description)s,
+    %(cover_url)s,
+    %(now)s,
+    %(source)s
+)"""
+
+# Real miss: OL answered without this ISBN. Negative-cache it.
+MARK_MISS_SQL = """
+    UPDATE book_metadata AS m
+    SET last_enriched = %(now)s,
+        source = %(source)s,
+        attempts = 0,
+        next_attempt_at = %(now)s + make_interval(secs => %(negative_ttl)s),
+        claimed_by = NULL,
+        claimed_until = NULL
+    FROM unnest(%(isbns)s::text[]) AS v(isbn13)
+    WHERE m.isbn13 = v.isbn13
+"""
+
+# Transient failure: back off exponentially; give up into the negative
+# cache after MAX_ATTEMPTS. last_enriched stays as it was, so a new ISBN
+# is still counted as never enriched.
+MARK_RETRY_SQL = """
+    UPDATE book_metadata AS m
+    SET attempts = CASE
+            WHEN m.attempts + 1 >= %(max_attempts)s THEN 0
+            ELSE m.attempts + 1
+        END,
+        next_attempt_at = CASE
+            WHEN m.attempts + 1 >= %(max_attempts)s
+                THEN %(now)s + make_interval(secs => %(negative_ttl)s)
+            ELSE %(now)s + make_interval(secs => least(
+                %(retry_base)s * power(2, m.attempts),
+                %(retry_max)s
+            ))
+        END,
+        last_enriched = CASE
+            WHEN m.attempts + 1 >= %(max_attempts)s
+                THEN COALESCE(m.last_enriched, %(now)s)
+            ELSE m.last_enriched
+        END,
+        claimed_by = NULL,
+        claimed_until = NULL
+    FROM unnest(%(isbns)s::text[]) AS v(isbn13)
+    WHERE m.isbn13 = v.isbn13
+"""
+
+
+COUNT_UNENRICHED_SQL = """
+    SELECT count(*)
+    FROM book_metadata
+    WHERE isbn13 = ANY(%s::text[])
+      AND last_enriched IS NULL
+"""
+
+BACKLOG_ADJUST_SQL = """
+    UPDATE enrichment_counters
+    SET value = value + %s
+    WHERE name = 'backlog'
+    RETURNING value
+"""
+
+
+class MetadataWriter:
+    """
+    Buffers enrichment results and writes them to book_metadata in
+    multi-row statements, one transaction per flush.
+
+    - records: normalized rows, upserted with the same COALESCE merge
+      as the original per-row INSERT ... ON CONFLICT
+    - misses: ISBNs Open Library doesn't know, stamped with
+      last_enriched and negative-cached for NEGATIVE_TTL_SECONDS
+    - retries: ISBNs whose request failed transiently, rescheduled
+      with exponential backoff (see MARK_RETRY_SQL)
+
+    Flushes when `flush_size` results are pending or `flush_interval`
+    seconds have passed since the last flush, and always on close().
+
+    overwrite=False switches records to FILL_SQL (existing non-null
+    values are kept).
+    """
+
+    def __init__(
+        self,
+        conn,
+        flush_size=FLUSH_SIZE,
+        flush_interval=FLUSH_INTERVAL,
+        source="openlibrary",
+        overwrite=True,
+        metrics=METRICS,
+    ):
+        self.conn = conn
+        self.metrics = metrics
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.source = source
+        self.upsert_sql = UPSERT_SQL if overwrite else FILL_SQL
+
+        self.records = {}
+        self.misses = set()
+        self.retries = set()
+        self.last_flush = time.monotonic()
+
+    def pending(self):
+        return len(self.records) + len(self.misses) + len(self.retries)
+
+    def add(self, isbn13, data):
+        self.retries.discard(isbn13)
+        if data:
+            self.records[isbn13] = data
+            self.misses.discard(isbn13)
+        elif isbn13 not in self.records:
+            self.misses.add(isbn13)
+
+        self.maybe_flush()
+
+    def retry(self, isbn13):
+        if isbn13 not in self.records and isbn13 not in self.misses:
+            self.retries.add(isbn13)
+
+        self.maybe_flush()
+
+    def maybe_flush(self):
+        if (
+            self.pending() >= self.flush_size
+            or time.monotonic() - self.last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush(self):
+        if not self.pending():
+            self.last_flush = time.monotonic()
+            return
+
+        now = datetime.utcnow()
+        isbns = list(self.records) + list(self.misses) + list(self.retries)
+        started = time.monotonic()
+
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute(COUNT_UNENRICHED_SQL, (isbns,))
+                (unenriched_before,) = cur.fetchone()
+
+                if self.records:
+                    execute_values(
+                        cur,
+                        self.upsert_sql,
+                        [
+                            {**data, "now": now, "source": self.source}
+                            for data in self.records.values()
+                        ],
+                        template=UPSERT_TEMPLATE,
+                        page_size=self.flush_size,
+                    )
+
+                if self.misses:
+                    cur.execute(MARK_MISS_SQL, {
+                        "isbns": sorted(self.misses),
+                        "now": now,
+                        "source": self.source,
+                        "negative_ttl": NEGATIVE_TTL_SECONDS,
+                    })
+
+                if self.retries:
+                    cur.execute(MARK_RETRY_SQL, {
+                        "isbns": sorted(self.retries),
+                        "now": now,
+                        "max_attempts": MAX_ATTEMPTS,
+                        "negative_ttl": NEGATIVE_TTL_SECONDS,
+                        "retry_base": RETRY_BASE_SECONDS,
+                        "retry_max": RETRY_MAX_SECONDS,
+                    })
+
+                # Keep the backlog counter current without COUNT(*) over
+                # the table: only these ISBNs can have changed state.
+                cur.execute(COUNT_UNENRICHED_SQL, (isbns,))
+                (unenriched_after,) = cur.fetchone()
+                cur.execute(BACKLOG_ADJUST_SQL, (unenriched_after - unenriched_before,))
+                row = cur.fetchone()
+
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+        self.metrics.observe("db_flush_seconds", time.monotonic() - started)
+        self.metrics.inc("rows_written_total", len(self.records), kind="record")
+        self.metrics.inc("rows_written_total", len(self.misses), kind="miss")
+        self.metrics.inc("rows_written_total", len(self.retries), kind="retry")
+        if row:
+            self.metrics.set_gauge("backlog", row[0])
+
+        print(f"  flushed {len(self.records)} records, "
+              f"{len(self.misses)} misses, {len(self.retries)} retries")
+
+        self.records.clear()
+        self.misses.clear()
+        self.retries.clear()
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+
+
+def flush_on_sigterm():
+    """
+    Turn SIGTERM into SystemExit so the callers' finally blocks flush
+    the writer before the process exits.
+    """
+    def handler(signum, frame):
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        raise SystemExit(128 + signum)
+
+    signal.signal(signal.SIGTERM, handler)
+
+
+# =========================
+# CLAIM QUEUE
+# =========================
+
+# Lease / retry columns and queue indexes on book_metadata (see
+# migrate_schema).
+SCHEMA_COLUMNS = ("claimed_by", "claimed_until", "attempts", "next_attempt_at")
+SCHEMA_INDEXES = ("book_metadata_new_idx", "book_metadata_due_idx")
 
+# How long the one-off ALTER TABLE may wait for its lock. An ALTER
+# queued behind a long query blocks every query after it, so give up
+# instead and let the next run try again.
+SCHEMA_LOCK_TIMEOUT = "5s"
+
+
+def schema_applied(cur):
+    """True if migrate_schema() has nothing left to do (catalog reads only)."""
     cur.execute("""
-        SELECT isbn13
+        SELECT count(*) FROM information_schema.columns
+        WHERE table_name = 'book_metadata' AND column_name = ANY(%s)
+    """, [list(SCHEMA_COLUMNS)])
+    (columns,) = cur.fetchone()
+    cur.execute("""
+        SELECT count(*) FROM pg_indexes
+        WHERE tablename = 'book_metadata' AND indexname = ANY(%s)
+    """, [list(SCHEMA_INDEXES)])
+    (indexes,) = cur.fetchone()
+    cur.execute("SELECT to_regclass('enrichment_counters') IS NOT NULL")
+    (counters,) = cur.fetchone()
+    return columns == len(SCHEMA_COLUMNS) and indexes == len(SCHEMA_INDEXES) and counters
+
+
+def migrate_schema(conn):
+    """
+    Add the lease / retry columns and the queue indexes. One-off
+    (`--migrate-schema`, or the first run against an old table);
+    afterwards ensure_schema() only reads the catalog.
+
+    - book_metadata_new_idx: never-attempted ISBNs, in isbn13 order
+    - book_metadata_due_idx: retries and negative-cache expiries, by
+      due time
+    """
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("SET lock_timeout = %s", [SCHEMA_LOCK_TIMEOUT])
+        cur.execute("""
+            ALTER TABLE book_metadata
+                ADD COLUMN IF NOT EXISTS claimed_by text,
+                ADD COLUMN IF NOT EXISTS claimed_until timestamptz,
+                ADD COLUMN IF NOT EXISTS attempts integer NOT NULL DEFAULT 0,
+                ADD COLUMN IF NOT EXISTS next_attempt_at timestamptz
+        """)
+        cur.execute("RESET lock_timeout")
+        cur.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS book_metadata_new_idx
+            ON book_metadata (isbn13)
+            WHERE last_enriched IS NULL AND next_attempt_at IS NULL
+        """)
+        cur.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS book_metadata_due_idx
+            ON book_metadata (next_attempt_at)
+            WHERE next_attempt_at IS NOT NULL
+        """)
+        # Superseded by book_metadata_new_idx
+        cur.execute("DROP INDEX CONCURRENTLY IF EXISTS book_metadata_pending_idx")
+
+        # Running counters maintained by MetadataWriter
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS enrichment_counters (
+                name text PRIMARY KEY,
+                value bigint NOT NULL
+            )
+        """)
+    conn.autocommit = False
+
+
+def ensure_schema(conn):
+    """
+    Run at every worker start: checks information_schema / pg_indexes
+    and only runs migrate_schema() (DDL, ACCESS EXCLUSIVE on
+    book_metadata) if something is missing. Then loads the backlog
+    gauge, seeded with one COUNT(*) the first time only.
+    """
+    with conn.cursor() as cur:
+        applied = schema_applied(cur)
+    conn.commit()
+    if not applied:
+        migrate_schema(conn)
+
+    with conn.cursor() as cur:
+        cur.execute("SELECT value FROM enrichment_counters WHERE name = 'backlog'")
+        row = cur.fetchone()
+        if row is None:
+            row = recount_backlog(cur)
+        METRICS.set_gauge("backlog", row[0])
+    conn.commit()
+
+
+def recount_backlog(cur):
+    cur.execute("""
+        INSERT INTO enrichment_counters (name, value)
+        SELECT 'backlog', count(*)
         FROM book_metadata
         WHERE last_enriched IS NULL
-        ORDER BY isbn13
-        LIMIT %s;
+        ON CONFLICT (name) DO UPDATE SET value = EXCLUDED.value
+        RETURNING value
+    """)
+    return cur.fetchone()
+
+
+CLAIM_SQL = """
+    UPDATE book_metadata AS m
+    SET claimed_by = %(worker)s,
+        claimed_until = now() + make_interval(secs => %(lease)s)
+    FROM (
+        SELECT isbn13
+        FROM book_metadata
+        WHERE {where}
+          AND (claimed_until IS NULL OR claimed_until < now())
+        ORDER BY {order}
+        LIMIT %(limit)s
+        FOR UPDATE SKIP LOCKED
+    ) AS c
+    WHERE m.isbn13 = c.isbn13
+    RETURNING m.isbn13
+"""
+
+CLAIM_DUE_SQL = CLAIM_SQL.format(
+    where="next_attempt_at IS NOT NULL AND next_attempt_at <= now()",
+    order="next_attempt_at",
+)
+
+CLAIM_NEW_SQL = CLAIM_SQL.format(
+    where="last_enriched IS NULL AND next_attempt_at IS NULL",
+    order="isbn13",
+)
+
+
+def claim_batch(conn, limit, worker_id=WORKER_ID, lease_seconds=LEASE_SECONDS):
+    """
+    Lease up to `limit` ISBNs for this worker: due retries first, then
+    never-attempted ISBNs. Both come off partial indexes, never a scan.
+
+    SKIP LOCKED lets concurrent workers claim disjoint batches without
+    waiting on each other; rows whose lease has expired (crashed or
+    killed worker) are claimable again.
+    """
+    isbns = []
+
+    with conn.cursor() as cur:
+        for sql in (CLAIM_DUE_SQL, CLAIM_NEW_SQL):
+            if len(isbns) >= limit:
+                break
+            cur.execute(sql, {
+                "worker": worker_id,
+                "lease": lease_seconds,
+                "limit": limit - len(isbns),
+            })
+            isbns += [isbn13 for (isbn13,) in cur.fetchall()]
+
+    conn.commit()
+    return sorted(isbns)
+
 
-    """, (BATCH_SIZE,))
+def release_claims(conn, worker_id=WORKER_ID):
+    """
+    Hand back whatever this worker claimed but never wrote, so other
+    workers don't have to wait for the lease to expire.
+    """
+    with conn.cursor() as cur:
+        cur.execute("""
+            UPDATE book_metadata
+            SET claimed_by = NULL,
+                claimed_until = NULL
+            WHERE claimed_by = %s
+        """, (worker_id,))
+    conn.commit()
+
+
+# =========================
+# MAIN ENRICHMENT LOOP
+# =========================
 
-    rows = cur.fetchall()
-    if not rows:
+def write_group(writer, group, results):
+    for isbn13 in group:
+        data = results[isbn13]
+        METRICS.inc("isbns_total", result="hit" if data else "miss")
+        writer.add(isbn13, data)
+    METRICS.maybe_report()
+
+
+def retry_group(writer, group, error):
+    if isinstance(error, PartialFetchError):
+        # Keep what was answered; retry only the rest
+        write_group(writer, list(error.results), error.results)
+        group = error.failed
+
+    print(f"  transient failure ({error}), retrying {len(group)} later")
+    METRICS.inc("isbns_total", len(group), result="error")
+    for isbn13 in group:
+        writer.retry(isbn13)
+    METRICS.maybe_report()
+
+
+def main(
+    batch_size=BATCH_SIZE,
+    bibkeys=BIBKEYS_PER_REQUEST,
+    flush_size=FLUSH_SIZE,
+    flush_interval=FLUSH_INTERVAL,
+    worker_id=WORKER_ID,
+    lease_seconds=LEASE_SECONDS,
+):
+    conn = psycopg2.connect(**DB_CONFIG)
+    ensure_schema(conn)
+
+    isbns = claim_batch(conn, batch_size, worker_id, lease_seconds)
+    if not isbns:
         print("No books to enrich.")
         return
 
-    print(f"Enriching {len(rows)} ISBNs")
-
-    for (isbn13,) in rows:
-        print(f"→ {isbn13}")
-
-        data = fetch_openlibrary(isbn13)
-
-        # --------------------------------------------------
-        # BAD / EMPTY RESPONSE → MARK ATTEMPTED, SKIP
-        # --------------------------------------------------
-        if not data:
-            cur.execute("""
-                UPDATE book_metadata
-                SET last_enriched = %(now)s,
-                    source = 'openlibrary'
-                WHERE isbn13 = %(isbn13)s
-            """, {
-                "isbn13": isbn13,
-                "now": datetime.utcnow()
-            })
-            conn.commit()
-            time.sleep(0.3)
-            continue
+    print(f"[{worker_id}] Enriching {len(isbns)} ISBNs "
+          f"({bibkeys} per request)")
 
-        # --------------------------------------------------
-        # UPSERT CLEAN DATA
-        # --------------------------------------------------
-        cur.execute("""
-            INSERT INTO book_metadata (
-                isbn13,
-                title,
-                author,
-                publisher,
-                publish_year,
-                publish_date,
-                pages,
-                subjects,
-                language,
-                description,
-                cover_url,
-                last_enriched,
-                source
-            )
-            VALUES (
-                %(isbn13)s,
-                %(title)s,
-                %(author)s,
-                %(publisher)s,
-                %(publish_year)s,
-                %(publish_date)s,
-                %(pages)s,
-                %(subjects)s,
-                %(language)s,
-                %(description)s,
-                %(cover_url)s,
-                %(now)s,
-                'openlibrary'
-            )
-            ON CONFLICT (isbn13) DO UPDATE SET
-                title = COALESCE(EXCLUDED.title, book_metadata.title),
-                author = COALESCE(EXCLUDED.author, book_metadata.author),
-                publisher = COALESCE(EXCLUDED.publisher, book_metadata.publisher),
-                publish_year = COALESCE(EXCLUDED.publish_year, book_metadata.publish_year),
-                publish_date = COALESCE(EXCLUDED.publish_date, book_metadata.publish_date),
-                pages = COALESCE(EXCLUDED.pages, book_metadata.pages),
-                subjects = COALESCE(EXCLUDED.subjects, book_metadata.subjects),
-                language = COALESCE(EXCLUDED.language, book_metadata.language),
-                description = COALESCE(EXCLUDED.description, book_metadata.description),
-                cover_url = COALESCE(EXCLUDED.cover_url, book_metadata.cover_url),
-                last_enriched = EXCLUDED.last_enriched,
-                source = 'openlibrary'
-        """, {
-            **data,
-            "now": datetime.utcnow()
-        })
+    writer = MetadataWriter(conn, flush_size, flush_interval)
+    flush_on_sigterm()
 
-        conn.commit()
-        time.sleep(SLEEP_BETWEEN_BOOKS)
+    try:
+        for group in chunked(isbns, bibkeys):
+            print(f"→ {group[0]} … {group[-1]} ({len(group)})")
 
-    cur.close()
-    conn.close()
+            try:
+                results = fetch_openlibrary_batch(group)
+            except TransientFetchError as e:
+                retry_group(writer, group, e)
+            else:
+                write_group(writer, group, results)
 
+            METRICS.sleep(SLEEP_BETWEEN_REQUESTS)
+    finally:
+        writer.close()
+        release_claims(conn, worker_id)
+        conn.close()
+        METRICS.report()
 
-if __name__ == "__main__":
-    main()
 
+# =========================
+# ASYNC ENRICHMENT ENGINE
+# =========================
+
+async def run_groups(groups, on_results, on_error, concurrency, rate):
+    """
+    Fetch bibkey groups with up to `concurrency` Books API calls in
+    flight, spaced by a global `rate` requests/second token bucket.
+
+    The blocking HTTP calls run on a thread pool; on_results(group,
+    results) and on_error(group, TransientFetchError) are called on the
+    event loop thread, so DB writes stay on a single connection.
+    """
+    loop = asyncio.get_running_loop()
+    bucket = TokenBucket(rate)
+    slots = asyncio.Semaphore(concurrency)
+    pool = ThreadPoolExecutor(max_workers=concurrency)
+
+    async def fetch(group):
+        async with slots:
+            waited = time.monotonic()
+            await bucket.acquire_async()
+            METRICS.inc("sleep_seconds_total", time.monotonic() - waited)
+            print(f"→ {group[0]} … {group[-1]} ({len(group)})")
+            try:
+                results = await loop.run_in_executor(
+                    pool, fetch_openlibrary_batch, group, bucket,
+                )
+            except TransientFetchError as e:
+                on_error(group, e)
+                return
+        on_results(group, results)
+
+    try:
+        await asyncio.gather(*(fetch(group) for group in groups))
+    finally:
+        # Don't wait for in-flight calls when stopping early (SIGTERM):
+        # their ISBNs were never written and will be picked up again.
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def main_async(
+    batch_size=BATCH_SIZE,
+    bibkeys=BIBKEYS_PER_REQUEST,
+    concurrency=CONCURRENCY,
+    rate=REQUESTS_PER_SECOND,
+    flush_size=FLUSH_SIZE,
+    flush_interval=FLUSH_INTERVAL,
+    worker_id=WORKER_ID,
+    lease_seconds=LEASE_SECONDS,
+):
+    """
+    Drop-in replacement for main(): same batch claim and writes, but
+    with concurrent Books API calls.
+    """
+    conn = psycopg2.connect(**DB_CONFIG)
+    ensure_schema(conn)
+
+    isbns = claim_batch(conn, batch_size, worker_id, lease_seconds)
+    if not isbns:
+        print("No books to enrich.")
+        return
+
+    print(f"[{worker_id}] Enriching {len(isbns)} ISBNs "
+          f"({bibkeys} per request, {concurrency} in flight, "
+          f"{rate:g} req/s)")
+
+    writer = MetadataWriter(conn, flush_size, flush_interval)
+    flush_on_sigterm()
+
+    def on_results(group, results):
+        write_group(writer, group, results)
+
+    def on_error(group, error):
+        retry_group(writer, group, error)
+
+    try:
+        asyncio.run(run_groups(
+            list(chunked(isbns, bibkeys)),
+            on_results,
+            on_error,
+            concurrency,
+            rate,
+        ))
+    finally:
+        writer.close()
+        release_claims(conn, worker_id)
+        conn.close()
+        METRICS.report()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Enrich book_metadata from the Open Library Books API",
+    )
+    parser.add_argument(
+        "--engine", choices=["async", "serial"], default="async",
+    )
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--bibkeys", type=int, default=BIBKEYS_PER_REQUEST)
+    parser.add_argument(
+        "--concurrency", type=int, default=CONCURRENCY,
+        help="Books API calls in flight (async engine)",
+    )
+    parser.add_argument(
+        "--rps", type=float, default=REQUESTS_PER_SECOND,
+        help="Global Books API requests per second (async engine)",
+    )
+    parser.add_argument(
+        "--flush-size", type=int, default=FLUSH_SIZE,
+        help="Write buffered results after this many ISBNs",
+    )
+    parser.add_argument(
+        "--flush-interval", type=float, default=FLUSH_INTERVAL,
+        help="...or after this many seconds",
+    )
+    parser.add_argument(
+        "--worker-id", default=WORKER_ID,
+        help="Lease owner name (default: host:pid)",
+    )
+    parser.add_argument(
+        "--lease", type=int, default=LEASE_SECONDS,
+        help="Seconds a claimed batch stays reserved for this worker",
+    )
+    parser.add_argument(
+        "--recount-backlog", action="store_true",
+        help="Re-seed the backlog counter with a full COUNT(*) and exit",
+    )
+    parser.add_argument(
+        "--migrate-schema", action="store_true",
+        help="Add the lease / retry columns and queue indexes, then exit",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if args.migrate_schema:
+        conn = psycopg2.connect(**DB_CONFIG)
+        migrate_schema(conn)
+        conn.close()
+        print("book_metadata schema is up to date")
+    elif args.recount_backlog:
+        conn = psycopg2.connect(**DB_CONFIG)
+        ensure_schema(conn)
+        with conn.cursor() as cur:
+            (backlog,) = recount_backlog(cur)
+        conn.commit()
+        conn.close()
+        print(f"Backlog: {backlog:,} ISBNs with last_enriched IS NULL")
+    elif args.engine == "serial":
+        main(
+            args.batch_size,
+            args.bibkeys,
+            args.flush_size,
+            args.flush_interval,
+            args.worker_id,
+            args.lease,
+        )
+    else:
+        main_async(
+            args.batch_size,
+            args.bibkeys,
+            args.concurrency,
+            args.rps,
+            args.flush_size,
+            args.flush_interval,
+            args.worker_id,
+            args.lease,
+        )
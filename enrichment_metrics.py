@@ -0,0 +1,219 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+# =========================
+# CONFIG
+# =========================
+
+# node_exporter --collector.textfile.directory
+TEXTFILE_DIR = os.environ.get(
+    "EOB_METRICS_DIR", "/var/lib/node_exporter/textfile_collector"
+)
+
+# Seconds between JSON summary lines / textfile rewrites.
+SUMMARY_INTERVAL = 60
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+# =========================
+# METRICS
+# =========================
+
+class Metrics:
+    """
+    In-process counters, gauges and histograms for the enrichment jobs.
+
+    Exported two ways:
+    - a Prometheus textfile (<TEXTFILE_DIR>/eob_<job>.prom), rewritten
+      atomically, for node_exporter's textfile collector
+    - a one-line JSON summary printed to stdout (cron.log) every
+      `summary_interval` seconds and at the end of the run
+
+    Thread-safe: the async engine records from its HTTP thread pool.
+    """
+
+    def __init__(self, job, textfile_dir=TEXTFILE_DIR, summary_interval=SUMMARY_INTERVAL):
+        self.job = job
+        self.textfile_dir = textfile_dir
+        self.summary_interval = summary_interval
+
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+        self.started = time.monotonic()
+        self.last_report = self.started
+        self._lock = threading.Lock()
+
+    # ---- recording ----
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.gauges[key] = value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = {
+                    "buckets": [0] * len(LATENCY_BUCKETS),
+                    "sum": 0.0,
+                    "count": 0,
+                }
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    hist["buckets"][i] += 1
+            hist["sum"] += value
+            hist["count"] += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - started, **labels)
+
+    def sleep(self, seconds):
+        """time.sleep that is accounted for in sleep_seconds_total."""
+        self.inc("sleep_seconds_total", seconds)
+        time.sleep(seconds)
+
+    # ---- reading ----
+
+    def total(self, name, **match):
+        with self._lock:
+            return sum(
+                value for (n, labels), value in self.counters.items()
+                if n == name and all(dict(labels).get(k) == v for k, v in match.items())
+            )
+
+    def summary(self):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+
+        with self._lock:
+            counters = {
+                _series(name, labels): value
+                for (name, labels), value in sorted(self.counters.items())
+            }
+            gauges = {
+                _series(name, labels): value
+                for (name, labels), value in sorted(self.gauges.items())
+            }
+            latency = {
+                _series(name, labels): {
+                    "count": h["count"],
+                    "avg": round(h["sum"] / h["count"], 4) if h["count"] else None,
+                    "p50": _quantile(h, 0.5),
+                    "p95": _quantile(h, 0.95),
+                }
+                for (name, labels), h in sorted(self.histograms.items())
+            }
+
+        return {
+            "job": self.job,
+            "elapsed_s": round(elapsed, 1),
+            # Network requests only; cache hits don't cost rate budget
+            "requests_per_s": round(
+                self.total("http_requests_total", cache="miss") / elapsed, 3
+            ),
+            "counters": counters,
+            "gauges": gauges,
+            "latency": latency,
+        }
+
+    # ---- export ----
+
+    def render_prometheus(self):
+        prefix = f"eob_{self.job}_"
+        lines = []
+
+        typed = set()
+
+        def declare(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {prefix}{name} {kind}")
+
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                declare(name, "counter")
+                lines.append(f"{prefix}{name}{_labels(labels)} {value}")
+
+            for (name, labels), value in sorted(self.gauges.items()):
+                declare(name, "gauge")
+                lines.append(f"{prefix}{name}{_labels(labels)} {value}")
+
+            for (name, labels), h in sorted(self.histograms.items()):
+                declare(name, "histogram")
+                for bound, count in zip(LATENCY_BUCKETS, h["buckets"]):
+                    le = labels + (("le", str(bound)),)
+                    lines.append(f"{prefix}{name}_bucket{_labels(le)} {count}")
+                inf = labels + (("le", "+Inf"),)
+                lines.append(f"{prefix}{name}_bucket{_labels(inf)} {h['count']}")
+                lines.append(f"{prefix}{name}_sum{_labels(labels)} {h['sum']}")
+                lines.append(f"{prefix}{name}_count{_labels(labels)} {h['count']}")
+
+        lines.append(f"{prefix}last_report_timestamp_seconds {time.time()}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self):
+        if not self.textfile_dir or not os.path.isdir(self.textfile_dir):
+            return
+
+        path = os.path.join(self.textfile_dir, f"eob_{self.job}.prom")
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp, path)
+
+    def report(self):
+        self.last_report = time.monotonic()
+        try:
+            self.write_textfile()
+        except OSError as e:
+            print(f"metrics: could not write textfile: {e}")
+        print(json.dumps(self.summary(), sort_keys=True), flush=True)
+
+    def maybe_report(self):
+        if time.monotonic() - self.last_report >= self.summary_interval:
+            self.report()
+
+
+def _series(name, labels):
+    if not labels:
+        return name
+    return name + "{" + ",".join(f"{k}={v}" for k, v in labels) + "}"
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+        for k, v in labels
+    )
+    return "{" + body + "}"
+
+
+def _quantile(hist, q):
+    """Upper bucket bound containing the q-quantile (Prometheus-style)."""
+    if not hist["count"]:
+        return None
+    target = q * hist["count"]
+    for bound, count in zip(LATENCY_BUCKETS, hist["buckets"]):
+        if count >= target:
+            return bound
+    return float("inf")
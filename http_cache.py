@@ -0,0 +1,308 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+
+# =========================
+# CONFIG
+# =========================
+
+# Set EOB_HTTP_CACHE=off to bypass the cache entirely.
+CACHE_PATH = os.environ.get(
+    "EOB_HTTP_CACHE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".http_cache", "responses.sqlite3"),
+)
+
+MAX_CACHE_BYTES = int(os.environ.get("EOB_HTTP_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+
+DAY = 24 * 3600
+
+# Seconds a cached response is served without asking the origin again.
+# After that it is revalidated (ETag / Last-Modified) when possible.
+SOURCE_TTLS = {
+    "openlibrary": 30 * DAY,          # Books API, Works API
+    "openlibrary_search": 7 * DAY,    # search.json (reading counts move)
+    "loc": 30 * DAY,                  # LoC SRU / MODS
+    "amazon": DAY // 4,               # bestseller pages
+}
+DEFAULT_TTL = DAY
+
+
+# =========================
+# RESPONSES
+# =========================
+
+class CachedResponse:
+    """
+    The subset of requests.Response the fetchers use, for both cached
+    and freshly downloaded bodies.
+    """
+
+    def __init__(self, url, status_code, headers, content, from_cache=False):
+        self.url = url
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+        self.from_cache = from_cache
+
+    @property
+    def ok(self):
+        return 200 <= self.status_code < 400
+
+    @property
+    def text(self):
+        content_type = self.headers.get("Content-Type", "")
+        encoding = "utf-8"
+        if "charset=" in content_type:
+            encoding = content_type.split("charset=")[-1].split(";")[0].strip()
+        return self.content.decode(encoding or "utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(
+                f"{self.status_code} Error for url: {self.url}",
+                response=self,
+            )
+
+
+def looks_like_json(response):
+    return response.content.lstrip()[:1] in (b"{", b"[")
+
+
+def normalize_url(url, params=None):
+    """
+    Canonical form of url + params: lowercase scheme/host, no fragment,
+    query parameters merged and sorted.
+    """
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if params:
+        query += [(k, str(v)) for k, v in params.items()]
+    return urlunsplit((
+        parts.scheme.lower(),
+        parts.netloc.lower(),
+        parts.path or "/",
+        urlencode(sorted(query)),
+        "",
+    ))
+
+
+# =========================
+# CACHE
+# =========================
+
+class ResponseCache:
+    """
+    On-disk (SQLite) HTTP response cache shared by the enrichment
+    scripts and management commands.
+
+    - keyed by normalized URL + params
+    - per-source TTLs (SOURCE_TTLS)
+    - expired entries are revalidated with If-None-Match /
+      If-Modified-Since; a 304 refreshes the entry without a body
+    - total size bounded by max_bytes, least recently used evicted first
+    - only 2xx responses accepted by `cacheable` are stored
+    """
+
+    def __init__(self, path=CACHE_PATH, max_bytes=MAX_CACHE_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT,
+                status INTEGER,
+                headers TEXT,
+                body BLOB,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL,
+                accessed_at REAL,
+                size INTEGER
+            )
+        """)
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed "
+            "ON responses (accessed_at)"
+        )
+        conn.commit()
+
+        # Running total of cached bytes. Recomputed at startup only, so
+        # concurrent processes sharing the file keep it approximate.
+        (self._total,) = conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(
+        self,
+        url,
+        params=None,
+        source="default",
+        headers=None,
+        timeout=15,
+        fetch=requests.get,
+        cacheable=None,
+    ):
+        canonical = normalize_url(url, params)
+        key = hashlib.sha256(canonical.encode()).hexdigest()
+        ttl = SOURCE_TTLS.get(source, DEFAULT_TTL)
+        now = time.time()
+
+        row = self._conn().execute(
+            "SELECT status, headers, body, etag, last_modified, fetched_at "
+            "FROM responses WHERE key = ?",
+            (key,),
+        ).fetchone()
+
+        if row and now - row[5] < ttl:
+            self._touch(key, now)
+            return self._from_row(canonical, row)
+
+        request_headers = dict(headers or {})
+        if row:
+            if row[3]:
+                request_headers["If-None-Match"] = row[3]
+            if row[4]:
+                request_headers["If-Modified-Since"] = row[4]
+
+        r = fetch(url, params=params, headers=request_headers, timeout=timeout)
+
+        if r.status_code == 304 and row:
+            with self._write_lock:
+                conn = self._conn()
+                conn.execute(
+                    "UPDATE responses SET fetched_at = ?, accessed_at = ? "
+                    "WHERE key = ?",
+                    (now, now, key),
+                )
+                conn.commit()
+            return self._from_row(canonical, row)
+
+        response = CachedResponse(
+            getattr(r, "url", canonical),
+            r.status_code,
+            dict(r.headers),
+            r.content,
+        )
+
+        if 200 <= r.status_code < 300 and (cacheable is None or cacheable(response)):
+            self._store(key, canonical, response, now)
+
+        return response
+
+    def _from_row(self, canonical, row):
+        status, headers, body, *_ = row
+        return CachedResponse(
+            canonical, status, json.loads(headers), body, from_cache=True,
+        )
+
+    def _touch(self, key, now):
+        with self._write_lock:
+            conn = self._conn()
+            conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                (now, key),
+            )
+            conn.commit()
+
+    def _store(self, key, canonical, response, now):
+        headers = {
+            k: v for k, v in response.headers.items()
+            if k.lower() in ("content-type", "etag", "last-modified")
+        }
+        lower = {k.lower(): v for k, v in headers.items()}
+
+        with self._write_lock:
+            conn = self._conn()
+            old = conn.execute(
+                "SELECT size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    canonical,
+                    response.status_code,
+                    json.dumps(headers),
+                    response.content,
+                    lower.get("etag"),
+                    lower.get("last-modified"),
+                    now,
+                    now,
+                    len(response.content),
+                ),
+            )
+            self._total += len(response.content) - (old[0] if old else 0)
+            self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn):
+        while self._total > self.max_bytes:
+            victims = conn.execute(
+                "SELECT key, size FROM responses ORDER BY accessed_at LIMIT 100"
+            ).fetchall()
+            if not victims:
+                break
+            conn.executemany(
+                "DELETE FROM responses WHERE key = ?",
+                [(k,) for k, _ in victims],
+            )
+            self._total -= sum(size for _, size in victims)
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_cache():
+    global _default_cache
+    if CACHE_PATH == "off":
+        return None
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache()
+    return _default_cache
+
+
+def cached_get(url, params=None, source="default", headers=None, timeout=15,
+               fetch=requests.get, cacheable=None):
+    """
+    Drop-in for requests.get(url, params=..., headers=..., timeout=...)
+    that goes through the shared on-disk cache.
+    """
+    cache = default_cache()
+    if cache is None:
+        return fetch(url, params=params, headers=headers, timeout=timeout)
+    return cache.get(
+        url,
+        params=params,
+        source=source,
+        headers=headers,
+        timeout=timeout,
+        fetch=fetch,
+        cacheable=cacheable,
+    )
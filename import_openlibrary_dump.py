@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+
+"""
+Offline enrichment of book_metadata from Open Library bulk dumps.
+
+Step 1 — build the on-disk join index (authors + works), once per dump:
+
+    import_openlibrary_dump.py index \
+        --authors ol_dump_authors_latest.txt.gz \
+        --works ol_dump_works_latest.txt.gz
+
+Step 2 — stream editions and bulk-load book_metadata:
+
+    import_openlibrary_dump.py load \
+        --editions ol_dump_editions_latest.txt.gz
+
+Existing non-null values are never overwritten, so this is safe to run
+over an already partially enriched table. Rows filled here get
+last_enriched set; the API enrichment cron is then only needed for
+ISBNs missing from the dump and for refreshes.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sqlite3
+import time
+from collections import deque
+from functools import lru_cache
+from multiprocessing import Pool
+
+import psycopg2
+
+from catalog.isbn import canonicalize_many
+from enrich_openlibrary import (
+    DB_CONFIG,
+    MetadataWriter,
+    ensure_schema,
+    flush_on_sigterm,
+    parse_publish_year,
+)
+
+
+# =========================
+# CONFIG
+# =========================
+
+INDEX_PATH = "/data/openlibrary/dumps/ol_join_index.sqlite3"
+
+WORKERS = os.cpu_count() or 2
+
+# Dump lines handed to a worker process at a time.
+CHUNK_LINES = 5000
+
+# Chunks read ahead of the workers. Bounds memory regardless of dump
+# size: at most WORKERS * 2 chunks of lines/records exist at once.
+MAX_INFLIGHT_CHUNKS = WORKERS * 2
+
+# Rows per multi-row upsert + commit.
+FLUSH_SIZE = 5000
+
+COVER_URL = "https://covers.openlibrary.org/b/id/{}-L.jpg"
+
+
+# =========================
+# DUMP READING
+# =========================
+
+def read_chunks(path, record_type, size=CHUNK_LINES):
+    """
+    Yield lists of raw dump lines of one record type.
+
+    Dump format: type <TAB> key <TAB> revision <TAB> last_modified <TAB> json
+    """
+    prefix = record_type + "\t"
+    chunk = []
+
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if not line.startswith(prefix):
+                continue
+            chunk.append(line)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+
+    if chunk:
+        yield chunk
+
+
+def parse_line(line):
+    parts = line.rstrip("\n").split("\t", 4)
+    if len(parts) < 5:
+        return None, None
+    try:
+        return parts[1], json.loads(parts[4])
+    except ValueError:
+        return parts[1], None
+
+
+def bounded_imap(pool, func, chunks, max_inflight=MAX_INFLIGHT_CHUNKS):
+    """
+    Like pool.imap, but the reader never gets more than `max_inflight`
+    chunks ahead of the consumer.
+
+    Throttles here, in the consuming thread, rather than inside the
+    iterator the pool's task-handler thread reads: a handler blocked
+    there can't be joined, so an exception or SIGTERM in the consumer
+    (which makes `with Pool()` call terminate()) would hang the process.
+    """
+    pending = deque()
+    for chunk in chunks:
+        if len(pending) >= max_inflight:
+            yield pending.popleft().get()
+        pending.append(pool.apply_async(func, (chunk,)))
+
+    while pending:
+        yield pending.popleft().get()
+
+
+def text_value(value):
+    if isinstance(value, dict):
+        value = value.get("value")
+    return value or None
+
+
+# =========================
+# JOIN INDEX (AUTHORS / WORKS)
+# =========================
+
+def open_index(path, readonly=False):
+    if readonly:
+        return sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS authors (
+            key TEXT PRIMARY KEY,
+            name TEXT
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS works (
+            key TEXT PRIMARY KEY,
+            author_keys TEXT,
+            description TEXT,
+            subjects TEXT
+        ) WITHOUT ROWID
+    """)
+    return conn
+
+
+def parse_author_chunk(lines):
+    rows = []
+    for line in lines:
+        key, doc = parse_line(line)
+        if doc and doc.get("name"):
+            rows.append((key, doc["name"]))
+    return rows
+
+
+def parse_work_chunk(lines):
+    rows = []
+    for line in lines:
+        key, doc = parse_line(line)
+        if not doc:
+            continue
+
+        author_keys = [
+            a["author"]["key"]
+            for a in doc.get("authors", [])
+            if isinstance(a.get("author"), dict) and a["author"].get("key")
+        ]
+        subjects = [s for s in doc.get("subjects", []) if isinstance(s, str)]
+
+        rows.append((
+            key,
+            json.dumps(author_keys) if author_keys else None,
+            text_value(doc.get("description")),
+            json.dumps(subjects) if subjects else None,
+        ))
+    return rows
+
+
+def build_index(authors_path, works_path, index_path, workers=WORKERS):
+    conn = open_index(index_path)
+
+    steps = [
+        ("authors", authors_path, "/type/author", parse_author_chunk,
+         "INSERT OR REPLACE INTO authors VALUES (?, ?)"),
+        ("works", works_path, "/type/work", parse_work_chunk,
+         "INSERT OR REPLACE INTO works VALUES (?, ?, ?, ?)"),
+    ]
+
+    with Pool(workers) as pool:
+        for label, path, record_type, parser, sql in steps:
+            started = time.monotonic()
+            total = 0
+
+            for rows in bounded_imap(pool, parser, read_chunks(path, record_type)):
+                conn.executemany(sql, rows)
+                total += len(rows)
+                if total % 1_000_000 < len(rows):
+                    conn.commit()
+                    print(f"  {label}: {total:,}")
+
+            conn.commit()
+            print(f"Indexed {total:,} {label} "
+                  f"in {time.monotonic() - started:.0f}s")
+
+    conn.close()
+
+
+# =========================
+# EDITION NORMALIZATION (WORKER PROCESSES)
+# =========================
+
+_index = None
+
+
+def init_worker(index_path):
+    global _index
+    _index = open_index(index_path, readonly=True)
+
+
+@lru_cache(maxsize=200_000)
+def author_name(key):
+    row = _index.execute(
+        "SELECT name FROM authors WHERE key = ?", (key,)
+    ).fetchone()
+    return row[0] if row else None
+
+
+@lru_cache(maxsize=50_000)
+def work_info(key):
+    row = _index.execute(
+        "SELECT author_keys, description, subjects FROM works WHERE key = ?",
+        (key,),
+    ).fetchone()
+    if not row:
+        return [], None, None
+    author_keys, description, subjects = row
+    return (
+        json.loads(author_keys) if author_keys else [],
+        description,
+        json.loads(subjects) if subjects else None,
+    )
+
+
+def edition_isbns(doc):
+    """Raw isbn_13 + isbn_10 values of an edition record."""
+    return [
+        str(raw)
+        for field in ("isbn_13", "isbn_10")
+        for raw in doc.get(field, [])
+    ]
+
+
+def normalize_edition(doc):
+    """
+    Same fields fetch_openlibrary produces, from an edition record with
+    author and work keys resolved through the join index.
+    """
+    work_authors, work_description, work_subjects = [], None, None
+    works = doc.get("works") or []
+    if works and works[0].get("key"):
+        work_authors, work_description, work_subjects = work_info(works[0]["key"])
+
+    author_keys = [
+        a["key"] for a in doc.get("authors", [])
+        if isinstance(a, dict) and a.get("key")
+    ] or work_authors
+
+    authors = ", ".join(
+        name for name in (author_name(k) for k in author_keys) if name
+    ) or None
+
+    publishers = ", ".join(
+        p for p in doc.get("publishers", []) if isinstance(p, str) and p
+    ) or None
+
+    publish_date = doc.get("publish_date")
+
+    subjects = [
+        s for s in doc.get("subjects", []) if isinstance(s, str) and s
+    ] or work_subjects or None
+
+    language = None
+    if doc.get("languages"):
+        language = doc["languages"][0].get("key", "").split("/")[-1] or None
+
+    covers = [c for c in doc.get("covers", []) if isinstance(c, int) and c > 0]
+
+    return {
+        "title": doc.get("title"),
+        "author": authors,
+        "publisher": publishers,
+        "publish_year": parse_publish_year(publish_date),
+        "publish_date": publish_date,
+        "pages": doc.get("number_of_pages"),
+        "subjects": subjects,
+        "language": language,
+        "description": text_value(doc.get("description")) or work_description,
+        "cover_url": COVER_URL.format(covers[0]) if covers else None,
+    }
+
+
+def parse_edition_chunk(lines):
+    docs = []
+    raw = []
+    for line in lines:
+        _, doc = parse_line(line)
+        if doc:
+            isbns = edition_isbns(doc)
+            if isbns:
+                docs.append((doc, len(isbns)))
+                raw.extend(isbns)
+
+    # One vectorized pass over every ISBN in the chunk: checksums
+    # validated, ISBN-10s converted to their canonical ISBN-13
+    batch = canonicalize_many(raw)
+
+    records = []
+    start = 0
+    for doc, count in docs:
+        end = start + count
+        isbn13s = list(dict.fromkeys(
+            str(isbn) for isbn in batch.isbn13[start:end][batch.valid[start:end]]
+        ))
+        start = end
+
+        if not isbn13s:
+            continue
+
+        try:
+            fields = normalize_edition(doc)
+        except Exception:
+            continue
+
+        for isbn13 in isbn13s:
+            records.append({"isbn13": isbn13, **fields})
+    return records
+
+
+# =========================
+# LOAD
+# =========================
+
+def load_editions(editions_path, index_path, workers=WORKERS, flush_size=FLUSH_SIZE):
+    conn = psycopg2.connect(**DB_CONFIG)
+    ensure_schema(conn)
+
+    writer = MetadataWriter(
+        conn,
+        flush_size=flush_size,
+        flush_interval=float("inf"),
+        source="openlibrary_dump",
+        overwrite=False,
+    )
+    flush_on_sigterm()
+
+    started = time.monotonic()
+    total = 0
+
+    try:
+        with Pool(workers, initializer=init_worker, initargs=(index_path,)) as pool:
+            chunks = read_chunks(editions_path, "/type/edition")
+            for records in bounded_imap(pool, parse_edition_chunk, chunks):
+                for record in records:
+                    writer.add(record["isbn13"], record)
+                total += len(records)
+    finally:
+        writer.close()
+        conn.close()
+
+    print(f"Loaded {total:,} ISBN records "
+          f"in {time.monotonic() - started:.0f}s")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Bulk-load book_metadata from Open Library dumps",
+    )
+    parser.add_argument("--index", default=INDEX_PATH)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    index = sub.add_parser("index", help="Build the authors/works join index")
+    index.add_argument("--authors", required=True)
+    index.add_argument("--works", required=True)
+
+    load = sub.add_parser("load", help="Load editions into book_metadata")
+    load.add_argument("--editions", required=True)
+    load.add_argument("--flush-size", type=int, default=FLUSH_SIZE)
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if args.command == "index":
+        build_index(args.authors, args.works, args.index, args.workers)
+    else:
+        load_editions(args.editions, args.index, args.workers, args.flush_size)
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Listing
+from .models import InventoryUpload, Listing
+from search.ranking import update_search_ranks
 
 
 @admin.register(Listing)
@@ -16,5 +17,22 @@ class ListingAdmin(admin.ModelAdmin):
     actions = ["make_active"]
 
     def make_active(self, request, queryset):
+        book_ids = set(queryset.values_list("book_id", flat=True))
         queryset.update(status="active")
+        update_search_ranks(book_ids)
     make_active.short_description = "Publish selected listings"
+
+
+@admin.register(InventoryUpload)
+class InventoryUploadAdmin(admin.ModelAdmin):
+    list_display = (
+        "original_name",
+        "seller",
+        "status",
+        "created_count",
+        "error_count",
+        "created_at",
+    )
+    list_filter = ("status",)
+    search_fields = ("original_name", "seller__display_name")
+    exclude = ("preview",)
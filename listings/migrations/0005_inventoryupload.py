@@ -0,0 +1,30 @@
+# Generated by Django 4.2.27 on 2026-10-18 15:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('listings', '0004_listing_created_from_listing_seller_sku_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryUpload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(upload_to='inventory_uploads/%Y/%m/')),
+                ('original_name', models.CharField(blank=True, max_length=255)),
+                ('preview', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('imported', 'Imported')], default='pending', max_length=20)),
+                ('created_count', models.PositiveIntegerField(default=0)),
+                ('error_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('imported_at', models.DateTimeField(blank=True, null=True)),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_uploads', to='accounts.seller')),
+            ],
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.27 on 2026-10-18 15:59
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def archive_duplicate_skus(apps, schema_editor):
+    """
+    Repeated CSV imports left several live listings per (seller, sku);
+    keep the newest of each and archive the rest so the constraint
+    can be created.
+    """
+    Listing = apps.get_model("listings", "Listing")
+
+    duplicates = (
+        Listing.objects.exclude(seller_sku="")
+        .exclude(status="archived")
+        .values("seller_id", "seller_sku")
+        .annotate(n=Count("id"), keep=Max("id"))
+        .filter(n__gt=1)
+    )
+    for dup in duplicates.iterator():
+        (
+            Listing.objects.filter(seller_id=dup["seller_id"], seller_sku=dup["seller_sku"])
+            .exclude(status="archived")
+            .exclude(id=dup["keep"])
+            .update(status="archived")
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0005_inventoryupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventoryupload',
+            name='mode',
+            field=models.CharField(choices=[('append', 'Add as new listings'), ('sync', 'Sync by SKU (update, add, archive missing)')], default='append', max_length=10),
+        ),
+        migrations.RunPython(archive_duplicate_skus, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.27 on 2026-10-18 16:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0006_inventoryupload_mode_archive_duplicate_skus'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='listing',
+            constraint=models.UniqueConstraint(condition=models.Q(models.Q(('seller_sku', ''), _negated=True), models.Q(('status', 'archived'), _negated=True)), fields=('seller', 'seller_sku'), name='listing_unique_live_seller_sku'),
+        ),
+    ]
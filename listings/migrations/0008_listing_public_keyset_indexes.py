@@ -0,0 +1,21 @@
+# Generated by Django 4.2.27 on 2026-10-18 16:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0007_listing_unique_live_seller_sku'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('quantity__gt', 0), ('status', 'active')), fields=['price', 'id'], name='listing_public_price_id'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('quantity__gt', 0), ('status', 'active')), fields=['created_at', 'id'], name='listing_public_created_id'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.27 on 2026-10-18 16:25
+
+from django.db import migrations, models
+import listings.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0008_listing_public_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='inventoryupload',
+            name='file',
+            field=models.FileField(storage=listings.models.private_storage, upload_to='inventory_uploads/%Y/%m/'),
+        ),
+    ]
@@ -1,8 +1,22 @@
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
 from django.db import models
 from catalog.models import Book
 from accounts.models import Seller
 
 
+def private_storage():
+    """Storage under PRIVATE_MEDIA_ROOT, which has no URL and isn't served."""
+    return FileSystemStorage(location=settings.PRIVATE_MEDIA_ROOT, base_url=None)
+
+
+class ListingQuerySet(models.QuerySet):
+
+    def live(self):
+        """Everything but archived rows (the scope of the SKU constraint)."""
+        return self.exclude(status="archived")
+
+
 class Listing(models.Model):
     CONDITION_CHOICES = [
         ("new", "New"),
@@ -76,13 +90,89 @@ class Listing(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = ListingQuerySet.as_manager()
+
     class Meta:
         ordering = ["price"]
         indexes = [
             models.Index(fields=["price"]),
             models.Index(fields=["condition"]),
             models.Index(fields=["status"]),
+            # Keyset pagination of the public listing (see
+            # services/pagination.SORTS): one range scan per page.
+            # Descending sorts scan these backwards.
+            models.Index(
+                fields=["price", "id"],
+                condition=models.Q(status="active", quantity__gt=0),
+                name="listing_public_price_id",
+            ),
+            models.Index(
+                fields=["created_at", "id"],
+                condition=models.Q(status="active", quantity__gt=0),
+                name="listing_public_created_id",
+            ),
+        ]
+        constraints = [
+            # Feed sync key. Archived rows are history and may repeat.
+            models.UniqueConstraint(
+                fields=["seller", "seller_sku"],
+                condition=~models.Q(seller_sku="") & ~models.Q(status="archived"),
+                name="listing_unique_live_seller_sku",
+            ),
         ]
 
     def __str__(self):
         return f"{self.book.title} — {self.seller.display_name}"
+
+
+class InventoryUpload(models.Model):
+    """
+    A seller's uploaded inventory feed, staged between preview and
+    confirm. The session only carries its id; the file stays in
+    storage and the preview (first rows + whole-file summary) in
+    `preview`.
+    """
+
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("imported", "Imported"),
+    ]
+
+    MODE_CHOICES = [
+        ("append", "Add as new listings"),
+        ("sync", "Sync by SKU (update, add, archive missing)"),
+    ]
+
+    seller = models.ForeignKey(
+        Seller,
+        on_delete=models.CASCADE,
+        related_name="inventory_uploads",
+    )
+
+    # Prices and SKUs: private storage, not the public /media/ tree
+    file = models.FileField(upload_to="inventory_uploads/%Y/%m/", storage=private_storage)
+    original_name = models.CharField(max_length=255, blank=True)
+
+    preview = models.JSONField(default=dict, blank=True)
+
+    mode = models.CharField(
+        max_length=10,
+        choices=MODE_CHOICES,
+        default="append",
+    )
+
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default="pending",
+    )
+
+    created_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    imported_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.original_name or self.file.name} — {self.seller.display_name}"
+
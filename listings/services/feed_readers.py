@@ -0,0 +1,248 @@
+"""
+Seller feed decoding: turns an uploaded file (binary, seekable) into
+rows keyed by our column names, in one streaming pass.
+
+Handles what sellers actually send:
+
+- gzip (.csv.gz) and zip archives (first CSV / TSV / TXT member)
+- comma, tab, semicolon or pipe delimited text (AbeBooks / Amazon
+  exports are tab delimited)
+- UTF-8 with or without BOM, UTF-16 (BOM or BOM-less), and legacy
+  Windows-1252 / Latin-1 exports
+- marketplace column names ("ISBN", "product-id", "sku", "qty", ...)
+
+Only the first SNIFF_BYTES of the decompressed stream are held to
+detect the encoding and dialect; the rest is decoded as it is read.
+"""
+
+import codecs
+import csv
+import gzip
+import io
+import re
+import zipfile
+
+
+# Decompressed bytes inspected for encoding / dialect detection.
+SNIFF_BYTES = 64 * 1024
+
+DELIMITERS = ",\t;|"
+
+FEED_EXTENSIONS = (".csv", ".tsv", ".txt", ".tab")
+
+# Our column -> accepted header spellings, compared after
+# header_key() (lowercase, no spaces / dashes / underscores), most
+# specific first: when a file has several, the earliest alias here
+# wins, wherever its column is.
+HEADER_ALIASES = {
+    "isbn10": ["isbn10"],
+    "isbn13": ["isbn13", "isbn", "ean", "productid", "asin"],
+    "seller_sku": ["sellersku", "sku", "merchantsku", "vendorsku"],
+    "price": ["price", "listprice", "askingprice", "yourprice"],
+    "quantity": ["quantity", "qty", "quantityavailable", "stock"],
+    "condition": ["condition", "itemcondition", "bookcondition"],
+    "format": ["format", "binding"],
+}
+
+# alias -> (column, priority)
+_ALIAS_LOOKUP = {
+    alias: (column, priority)
+    for column, aliases in HEADER_ALIASES.items()
+    for priority, alias in enumerate(aliases)
+}
+
+_BOMS = (
+    # UTF-32 first: its LE BOM starts with the UTF-16 LE one
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+class FeedError(ValueError):
+    """The upload isn't a feed we can read (empty, no usable zip member, ...)."""
+
+
+def header_key(value):
+    return re.sub(r"[\s_\-]+", "", (value or "").strip().lower())
+
+
+def canonical_headers(headers):
+    """
+    Map each header to our column name. Of several headers claiming a
+    column, the one with the highest priority alias wins (the first in
+    the file on a tie); unknown and losing headers are kept as-is so
+    the raw row still shows them.
+    """
+    headers = [(header or "").strip() for header in headers]
+
+    best = {}
+    for i, header in enumerate(headers):
+        match = _ALIAS_LOOKUP.get(header_key(header))
+        if match:
+            column, priority = match
+            if column not in best or priority < best[column][0]:
+                best[column] = (priority, i)
+
+    winners = {i: column for column, (_, i) in best.items()}
+    return [winners.get(i, header) for i, header in enumerate(headers)]
+
+
+# =========================
+# BYTES
+# =========================
+
+class _Prefixed(io.RawIOBase):
+    """A stream whose first bytes were already read: replays them, then continues."""
+
+    def __init__(self, head, stream):
+        self.head = memoryview(head)
+        self.stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.head:
+            n = min(len(buffer), len(self.head))
+            buffer[:n] = self.head[:n]
+            self.head = self.head[n:]
+            return n
+        data = self.stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def _zip_member(archive):
+    members = [
+        info for info in archive.infolist()
+        if not info.is_dir() and not info.filename.startswith("__MACOSX/")
+    ]
+    for info in members:
+        if info.filename.lower().endswith(FEED_EXTENSIONS):
+            return info
+    if members:
+        return members[0]
+    raise FeedError("The zip archive contains no files")
+
+
+def decompress(file):
+    """Binary stream of the feed, unwrapping gzip / zip by magic bytes."""
+    file.seek(0)
+    magic = file.read(4)
+    file.seek(0)
+
+    if magic[:2] == b"\x1f\x8b":
+        return gzip.GzipFile(fileobj=file, mode="rb"), "gzip"
+    if magic == b"PK\x03\x04":
+        try:
+            archive = zipfile.ZipFile(file)
+        except zipfile.BadZipFile as e:
+            raise FeedError(f"Unreadable zip archive: {e}")
+        return archive.open(_zip_member(archive)), "zip"
+    return file, ""
+
+
+# =========================
+# TEXT
+# =========================
+
+def detect_encoding(sample):
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding
+
+    # BOM-less UTF-16: ASCII text has a zero in every other byte
+    head = sample[:4096]
+    if len(head) >= 4:
+        if head[1::2].count(0) > len(head) // 4 and not head[0::2].count(0):
+            return "utf-16-le"
+        if head[0::2].count(0) > len(head) // 4 and not head[1::2].count(0):
+            return "utf-16-be"
+
+    try:
+        # Not final: the sample may end inside a multi-byte character
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+
+    try:
+        sample.decode("cp1252")
+        return "cp1252"
+    except UnicodeDecodeError:
+        return "latin-1"
+
+
+def detect_dialect(text):
+    try:
+        return csv.Sniffer().sniff(text, delimiters=DELIMITERS)
+    except csv.Error:
+        pass
+
+    # Single-column files and samples the sniffer can't decide on:
+    # go by the header line
+    header = text.split("\n", 1)[0]
+    delimiter = max(DELIMITERS, key=header.count)
+    if not header.count(delimiter):
+        delimiter = ","
+    return type("feed", (csv.excel,), {"delimiter": delimiter})
+
+
+class FeedReader:
+    """
+    Iterates the rows of a seller feed as dicts keyed by
+    canonical_headers(). Use as a context manager so decompressors
+    are closed; the underlying upload is left open.
+
+        with upload.file.open("rb") as f, FeedReader(f) as reader:
+            for row in reader:
+                ...
+    """
+
+    def __init__(self, file):
+        raw, self.compression = decompress(file)
+        self._raw = raw if raw is not file else None
+
+        sample = raw.read(SNIFF_BYTES)
+        if not sample.strip():
+            raise FeedError("The file is empty")
+
+        self.encoding = detect_encoding(sample)
+
+        stream = io.BufferedReader(_Prefixed(sample, raw))
+        self.text = io.TextIOWrapper(
+            stream, encoding=self.encoding, errors="replace", newline="",
+        )
+
+        # Dialect from the sample only, without a second pass
+        decoder = codecs.getincrementaldecoder(self.encoding)(errors="replace")
+        sample_text = decoder.decode(sample, final=False)
+        if sample_text.startswith("\ufeff"):
+            sample_text = sample_text[1:]
+        # The last line of the sample is usually cut short
+        lines = sample_text.splitlines()
+        if len(lines) > 2 and len(sample) == SNIFF_BYTES:
+            lines = lines[:-1]
+        self.dialect = detect_dialect("\n".join(lines))
+
+        header = next(csv.reader(self.text, self.dialect), None) or []
+        self.source_headers = [h.strip() for h in header]
+        self.fieldnames = canonical_headers(self.source_headers)
+
+    def __iter__(self):
+        return csv.DictReader(self.text, self.fieldnames, dialect=self.dialect)
+
+    def close(self):
+        # Closes the replay wrapper, not the upload underneath it
+        self.text.close()
+        if self._raw is not None:
+            self._raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,9 +1,13 @@
-import csv
-from io import TextIOWrapper
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 
-from catalog.models import Book
-from listings.models import Listing
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from catalog.isbn import normalize_identifier
+from catalog.models import BookIdentifier
+from listings.models import InventoryUpload, Listing
+from listings.services.feed_readers import FeedError, FeedReader
+from search.ranking import update_search_ranks
 
 
 # ============================================================
@@ -43,21 +47,56 @@ def normalize_format(value):
 # BOOK MATCHING (NO SIDE EFFECTS)
 # ============================================================
 
-def match_book_from_row(row):
-    isbn10 = (row.get("isbn10") or "").strip()
-    isbn13 = (row.get("isbn13") or "").strip()
+# Rows resolved per identifier query. Keeps the IN (...) list well
+# under backend parameter limits (SQLite: 32766) with two ISBN columns.
+CHUNK_SIZE = 2000
+
+# Rows shown on the preview page.
+PREVIEW_ROWS = 10
+
+
+def chunked(iterable, size=CHUNK_SIZE):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def row_identifiers(row):
+    # Either column may hold either form, hyphenated or not
+    return [
+        normalize_identifier(row.get(column))
+        for column in ("isbn10", "isbn13")
+        if (row.get(column) or "").strip()
+    ]
+
 
-    if isbn10:
-        book = Book.objects.filter(isbn10=isbn10).first()
-        if book:
-            return book
+def match_books(rows):
+    """
+    Books for a chunk of CSV rows (None where unmatched), resolved with
+    a single query against the identifier index.
+    """
+    values_per_row = [row_identifiers(row) for row in rows]
+    values = {v for values in values_per_row for v in values}
+    if not values:
+        return [None] * len(rows)
+
+    matches = {
+        ident.value: ident.book
+        for ident in BookIdentifier.objects.select_related("book").filter(value__in=values)
+    }
+    return [
+        next((matches[v] for v in row_values if v in matches), None)
+        for row_values in values_per_row
+    ]
 
-    if isbn13:
-        book = Book.objects.filter(isbn13=isbn13).first()
-        if book:
-            return book
 
-    return None
+def match_book_from_row(row):
+    return match_books([row])[0]
 
 
 # ============================================================
@@ -66,102 +105,386 @@ def match_book_from_row(row):
 
 def analyze_inventory_csv(file, seller):
     """
-    Reads CSV and prepares a preview.
+    Reads the feed (CSV / TSV, optionally gzip or zip, any common
+    encoding; see feed_readers) and prepares a preview.
     NO database writes.
     NO model instances stored in session.
-    """
-
-    wrapper = TextIOWrapper(file, encoding="utf-8")
-    reader = csv.DictReader(wrapper)
-
-    headers = reader.fieldnames or []
-
-    preview_rows = []
-    matched_books = 0
-    missing_books = 0
 
-    for idx, row in enumerate(reader, start=1):
-        if idx > 10:  # preview first 10 rows only
-            break
-
-        book = match_book_from_row(row)
+    Every row is matched (CHUNK_SIZE rows per query) so the summary
+    covers the whole file; only the first PREVIEW_ROWS are kept.
+    """
 
-        if book:
-            matched_books += 1
-        else:
-            missing_books += 1
-
-        preview_rows.append({
-            "row": idx,
-            "raw": row,  # raw CSV row (dict of strings)
-            "book_id": book.id if book else None,
-            "book_title": book.title if book else None,
-            "book_author": book.author if book else None,
-            "isbn10": row.get("isbn10", ""),
-            "isbn13": row.get("isbn13", ""),
-        })
+    with FeedReader(file) as reader:
+        headers = reader.fieldnames
+
+        preview_rows = []
+        total_rows = 0
+        matched_books = 0
+        missing_books = 0
+
+        for chunk in chunked(enumerate(reader, start=1)):
+            books = match_books([row for _, row in chunk])
+
+            for (idx, row), book in zip(chunk, books):
+                total_rows += 1
+                if book:
+                    matched_books += 1
+                else:
+                    missing_books += 1
+
+                if idx > PREVIEW_ROWS:
+                    continue
+
+                preview_rows.append({
+                    "row": idx,
+                    "raw": row,  # raw CSV row (dict of strings)
+                    "book_id": book.id if book else None,
+                    "book_title": book.title if book else None,
+                    "book_author": book.author if book else None,
+                    "isbn10": row.get("isbn10", ""),
+                    "isbn13": row.get("isbn13", ""),
+                })
 
     return {
         "headers": headers,
+        "source_headers": reader.source_headers,
+        "format": {
+            "compression": reader.compression,
+            "encoding": reader.encoding,
+            "delimiter": "tab" if reader.dialect.delimiter == "\t" else reader.dialect.delimiter,
+        },
         "rows": preview_rows,
         "summary": {
             "sample_size": len(preview_rows),
+            "total_rows": total_rows,
             "matched_books": matched_books,
             "missing_books": missing_books,
         },
     }
 
 
+# ============================================================
+# STAGED UPLOADS
+# ============================================================
+
+def stage_inventory_upload(file, seller, mode="append"):
+    """
+    Store the uploaded feed as an InventoryUpload and analyze it.
+    Any earlier unconfirmed upload of this seller is discarded.
+    `mode` ("append" / "sync") decides what confirming it does.
+    """
+    for stale in InventoryUpload.objects.filter(seller=seller, status="pending"):
+        discard_inventory_upload(stale)
+
+    upload = InventoryUpload.objects.create(
+        seller=seller,
+        file=file,
+        original_name=getattr(file, "name", "")[:255],
+        mode=mode,
+    )
+
+    try:
+        with upload.file.open("rb") as f:
+            upload.preview = analyze_inventory_csv(f, seller)
+    except FeedError:
+        discard_inventory_upload(upload)
+        raise
+    upload.save(update_fields=["preview"])
+
+    return upload
+
+
+def discard_inventory_upload(upload):
+    upload.file.delete(save=False)
+    upload.delete()
+
+
 # ============================================================
 # PHASE 2 — IMPORT INVENTORY (DB WRITES)
 # ============================================================
 
-def import_inventory_csv(preview, seller):
+# Per-row errors kept for the results page; the rest are only counted.
+MAX_REPORTED_ERRORS = 500
+
+PRICE_STEP = Decimal("0.01")
+MAX_PRICE = Decimal("99999999.99")  # Listing.price: max_digits=10, decimal_places=2
+
+
+class RowError(ValueError):
+    pass
+
+
+def parse_price(value):
+    try:
+        price = Decimal((value or "").strip().lstrip("$"))
+    except InvalidOperation:
+        raise RowError(f"Invalid price: {value!r}")
+    if not price.is_finite() or price <= 0:
+        raise RowError(f"Invalid price: {value!r}")
+    price = price.quantize(PRICE_STEP, rounding=ROUND_HALF_UP)
+    if price > MAX_PRICE:
+        raise RowError(f"Price too large: {value!r}")
+    return price
+
+
+def parse_quantity(value):
+    value = (value or "").strip()
+    if not value:
+        return 1
+    try:
+        quantity = int(value)
+    except ValueError:
+        raise RowError(f"Invalid quantity: {value!r}")
+    if quantity < 0:
+        raise RowError(f"Invalid quantity: {value!r}")
+    return quantity
+
+
+def build_listing(row, book, seller):
+    return Listing(
+        seller=seller,
+        book=book,
+        seller_sku=(row.get("seller_sku") or "").strip(),
+        price=parse_price(row.get("price")),
+        condition=normalize_condition(row.get("condition")),
+        format=normalize_format(row.get("format")),
+        quantity=parse_quantity(row.get("quantity")),
+        status="draft",
+        created_from="csv",
+    )
+
+
+class ImportResults(dict):
     """
-    Creates listings from a confirmed preview.
+    Counters + the first MAX_REPORTED_ERRORS row errors. A dict so it
+    renders in templates and serializes like before.
     """
 
-    results = {
-        "created": [],
-        "errors": [],
-    }
+    def __init__(self, **counters):
+        super().__init__(created=0, error_count=0, errors=[], **counters)
 
-    for item in preview["rows"]:
-        row = item["raw"]
-        book_id = item.get("book_id")
+    def add_error(self, idx, error, row):
+        self["error_count"] += 1
+        if len(self["errors"]) < MAX_REPORTED_ERRORS:
+            self["errors"].append({"row": idx, "error": error, "data": row})
 
-        book = None
-        if book_id:
-            book = Book.objects.filter(id=book_id).first()
 
-        if not book:
-            results["errors"].append({
-                "row": item["row"],
-                "error": "Book not found",
-                "data": row,
-            })
-            continue
+def iter_listing_chunks(upload, seller, results, feed_skus=None):
+    """
+    Stream a staged upload CHUNK_SIZE rows at a time, yielding lists
+    of (row number, row, unsaved Listing) for the rows that matched a book
+    and validated. One identifier query per chunk; failures go to
+    `results`.
+
+    If `feed_skus` is given, the seller_sku of every row is added to
+    it, including rows that fail.
+    """
+    with upload.file.open("rb") as f, FeedReader(f) as reader:
+        for chunk in chunked(enumerate(reader, start=1)):
+            books = match_books([row for _, row in chunk])
+            listings = []
+
+            for (idx, row), book in zip(chunk, books):
+                if feed_skus is not None:
+                    sku = (row.get("seller_sku") or "").strip()
+                    if sku:
+                        feed_skus.add(sku)
+                if not book:
+                    results.add_error(idx, "Book not found", row)
+                    continue
+                try:
+                    listings.append((idx, row, build_listing(row, book, seller)))
+                except RowError as e:
+                    results.add_error(idx, str(e), row)
+
+            yield listings
+
+
+def finish_upload(upload, results):
+    # The feed itself is no longer needed; keep the outcome
+    upload.file.delete(save=False)
+    upload.status = "imported"
+    upload.created_count = results["created"]
+    upload.error_count = results["error_count"]
+    upload.imported_at = timezone.now()
+    upload.save()
+
+
+def create_listings(chunk, results, conflict_error):
+    """
+    bulk_create the Listings of (row number, row, Listing) triples in
+    one transaction; returns how many were created.
 
+    The SKU check before it can race another upload for the same
+    seller. If the unique SKU constraint trips, the chunk is saved row
+    by row instead and the rows that collide are reported with
+    `conflict_error` (formatted with the sku).
+    """
+    listings = [listing for _, _, listing in chunk]
+    try:
+        with transaction.atomic():
+            Listing.objects.bulk_create(listings, batch_size=500)
+        return len(listings)
+    except IntegrityError:
+        pass
+
+    created = 0
+    for idx, row, listing in chunk:
+        # Undo what the rolled-back bulk_create set
+        listing.pk = None
+        listing._state.adding = True
         try:
-            listing = Listing.objects.create(
-                seller=seller,
-                book=book,
-                seller_sku=(row.get("seller_sku") or "").strip(),
-                price=Decimal(row.get("price")),
-                condition=normalize_condition(row.get("condition")),
-                format=normalize_format(row.get("format")),
-                quantity=int(row.get("quantity", 1)),
-                status="draft",
-                created_from="csv",
-            )
-
-            results["created"].append(listing)
-
-        except Exception as e:
-            results["errors"].append({
-                "row": item["row"],
-                "error": str(e),
-                "data": row,
-            })
+            with transaction.atomic():
+                listing.save()
+        except IntegrityError:
+            results.add_error(idx, conflict_error.format(sku=listing.seller_sku), row)
+        else:
+            created += 1
+    return created
 
+
+def import_inventory_csv(upload, seller):
+    """
+    Creates draft listings from every row of a staged InventoryUpload.
+
+    Streams the file CHUNK_SIZE rows at a time: one identifier query
+    per chunk, then one bulk_create inside a per-chunk transaction.
+    Row problems (unknown book, bad price / quantity, SKU already
+    listed) are collected and the rest of the file still imports.
+    Memory use does not grow with file size.
+    """
+    if upload.mode == "sync":
+        return sync_inventory_csv(upload, seller)
+
+    results = ImportResults()
+
+    for chunk in iter_listing_chunks(upload, seller, results):
+        # seller_sku is unique per seller among live listings
+        skus = {listing.seller_sku for _, _, listing in chunk if listing.seller_sku}
+        taken = set(
+            Listing.objects.live()
+            .filter(seller=seller, seller_sku__in=skus)
+            .values_list("seller_sku", flat=True)
+        )
+
+        new = []
+        for idx, row, listing in chunk:
+            if listing.seller_sku in taken:
+                results.add_error(idx, f"SKU {listing.seller_sku} already listed (use sync)", row)
+                continue
+            if listing.seller_sku:
+                taken.add(listing.seller_sku)
+            new.append((idx, row, listing))
+
+        results["created"] += create_listings(new, results, "SKU {sku} already listed (use sync)")
+
+    finish_upload(upload, results)
+    return results
+
+
+# ============================================================
+# PHASE 2 (SYNC) — DELTA SYNC BY SELLER_SKU
+# ============================================================
+
+# Fields a feed row controls on an existing listing.
+SYNC_FIELDS = ["book", "price", "quantity", "condition", "format"]
+
+
+def sync_inventory_csv(upload, seller):
+    """
+    Make the seller's live listings match the feed, keyed by
+    seller_sku:
+
+    - SKUs not listed yet are created (as drafts)
+    - listed SKUs whose book / price / quantity / condition / format
+      differ are updated; identical ones are not written at all
+    - draft and active SKUs missing from the feed are archived; a SKU
+      whose row is in the feed but fails (bad price, unknown book)
+      leaves its listing as it is
+    - sold listings are left alone; a feed row for a sold SKU is an
+      error
+
+    Book.search_rank (which counts public listings) is recomputed
+    once at the end for the books whose listings were updated or
+    archived; new listings are drafts and don't count yet.
+
+    Existing listings are loaded once as (sku -> values); the feed is
+    then streamed in chunks, each applied with bulk_create /
+    bulk_update in its own transaction.
+    """
+    results = ImportResults(updated=0, unchanged=0, archived=0)
+
+    listed = Listing.objects.live().filter(seller=seller).exclude(seller_sku="")
+    # Sold listings are a record of the sale: the feed doesn't change
+    # or archive them, and can't reuse their SKU while they're live
+    sold = set(listed.filter(status="sold").values_list("seller_sku", flat=True))
+    existing = {
+        listing.seller_sku: listing
+        for listing in listed.exclude(status="sold")
+        .only("id", "seller_sku", "status", *[
+            "book_id" if f == "book" else f for f in SYNC_FIELDS
+        ])
+    }
+    seen = set()
+    feed_skus = set()
+    touched_books = set()
+
+    for chunk in iter_listing_chunks(upload, seller, results, feed_skus):
+        to_create = []
+        to_update = []
+
+        for idx, row, listing in chunk:
+            sku = listing.seller_sku
+            if not sku:
+                results.add_error(idx, "Missing seller_sku (required for sync)", row)
+                continue
+            if sku in seen:
+                results.add_error(idx, f"Duplicate SKU {sku} in file", row)
+                continue
+            seen.add(sku)
+            if sku in sold:
+                results.add_error(idx, f"SKU {sku} is on a sold listing", row)
+                continue
+
+            current = existing.get(sku)
+            if current is None:
+                to_create.append((idx, row, listing))
+                continue
+
+            previous_book_id = current.book_id
+            changed = False
+            for field in SYNC_FIELDS:
+                attname = "book_id" if field == "book" else field
+                value = getattr(listing, attname)
+                if getattr(current, attname) != value:
+                    setattr(current, attname, value)
+                    changed = True
+
+            if changed:
+                to_update.append(current)
+                touched_books.update((previous_book_id, current.book_id))
+            else:
+                results["unchanged"] += 1
+
+        results["created"] += create_listings(
+            to_create, results, "SKU {sku} was listed by another upload meanwhile",
+        )
+        with transaction.atomic():
+            Listing.objects.bulk_update(to_update, SYNC_FIELDS, batch_size=500)
+        results["updated"] += len(to_update)
+
+    missing = [
+        listing for sku, listing in existing.items()
+        if sku not in feed_skus and listing.status in ("draft", "active")
+    ]
+    for batch in chunked(missing):
+        with transaction.atomic():
+            results["archived"] += Listing.objects.filter(
+                id__in=[listing.id for listing in batch]
+            ).update(status="archived")
+        touched_books.update(listing.book_id for listing in batch if listing.status == "active")
+
+    update_search_ranks(touched_books)
+
+    finish_upload(upload, results)
     return results
@@ -0,0 +1,158 @@
+import base64
+import json
+
+from django.db.models import Q
+
+
+# ============================================================
+# KEYSET (CURSOR) PAGINATION
+# ============================================================
+#
+# Pages are "the next N rows after this sort key", not OFFSET n:
+# every page is a range scan on the sort index starting at the
+# cursor, however deep. The last column of each sort is the primary
+# key so the order is total and rows never repeat or go missing
+# between pages.
+
+# ?sort= value -> (label, order_by fields)
+SORTS = {
+    "price": ("Price: low to high", ("price", "id")),
+    "-price": ("Price: high to low", ("-price", "-id")),
+    "newest": ("Newest first", ("-created_at", "-id")),
+    # Needs a relevance annotation (search.backends.search_queryset)
+    "relevance": ("Best match", ("-relevance", "-id")),
+}
+
+DEFAULT_SORT = "price"
+
+PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def page_size_from(value, default=PAGE_SIZE):
+    """?per_page= clamped to 1..MAX_PAGE_SIZE; junk -> default."""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def _key_value(value):
+    # isoformat keeps microseconds; a truncated timestamp would skip
+    # or repeat rows created in the same millisecond
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if isinstance(value, (int, float)):
+        return value
+    return str(value)
+
+
+def encode_cursor(sort, direction, values):
+    payload = json.dumps([sort, direction, [_key_value(v) for v in values]])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """cursor -> (sort, direction, values). InvalidCursor if tampered / stale."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        sort, direction, values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise InvalidCursor(token)
+
+    if sort not in SORTS or direction not in ("next", "prev"):
+        raise InvalidCursor(token)
+    if not isinstance(values, list) or len(values) != len(SORTS[sort][1]):
+        raise InvalidCursor(token)
+    return sort, direction, values
+
+
+def keyset_after(order, values):
+    """
+    Q for rows strictly after `values` in `order`:
+    (a > x) OR (a = x AND b > y) OR ..., with > flipped for "-field".
+    The leading column also gets a plain >= so backends that don't
+    rewrite the OR still start an index range at the cursor.
+    """
+    fields = [(f.lstrip("-"), f.startswith("-")) for f in order]
+
+    condition = Q()
+    for i, (name, desc) in enumerate(fields):
+        equal = {prev: value for (prev, _), value in zip(fields[:i], values)}
+        condition |= Q(**equal, **{f"{name}__{'lt' if desc else 'gt'}": values[i]})
+
+    lead, desc = fields[0]
+    return Q(**{f"{lead}__{'lte' if desc else 'gte'}": values[0]}) & condition
+
+
+def reverse_order(order):
+    return [f[1:] if f.startswith("-") else f"-{f}" for f in order]
+
+
+def paginate_keyset(queryset, sort=DEFAULT_SORT, cursor=None, page_size=PAGE_SIZE):
+    """
+    One page of `queryset` in SORTS[sort] order, starting after
+    (or, for a "prev" cursor, ending before) the cursor. Fetches
+    page_size + 1 rows to know whether another page exists; never
+    counts.
+
+    A cursor for a different sort, or one that doesn't decode, starts
+    from the first page.
+    """
+    if sort not in SORTS:
+        sort = DEFAULT_SORT
+    order = SORTS[sort][1]
+    fields = [f.lstrip("-") for f in order]
+
+    direction, values = "next", None
+    if cursor:
+        try:
+            cursor_sort, direction, values = decode_cursor(cursor)
+        except InvalidCursor:
+            direction, values = "next", None
+        else:
+            if cursor_sort != sort:
+                direction, values = "next", None
+
+    if direction == "prev":
+        rows = list(
+            queryset
+            .filter(keyset_after(reverse_order(order), values))
+            .order_by(*reverse_order(order))[:page_size + 1]
+        )
+        has_more = len(rows) > page_size
+        items = rows[:page_size][::-1]
+        has_prev, has_next = has_more, True
+    else:
+        if values is not None:
+            queryset = queryset.filter(keyset_after(order, values))
+        rows = list(queryset.order_by(*order)[:page_size + 1])
+        items = rows[:page_size]
+        has_prev, has_next = values is not None, len(rows) > page_size
+
+    def key(obj):
+        return [getattr(obj, f) for f in fields]
+
+    return KeysetPage(
+        items,
+        next_cursor=encode_cursor(sort, "next", key(items[-1])) if items and has_next else None,
+        prev_cursor=encode_cursor(sort, "prev", key(items[0])) if items and has_prev else None,
+    )
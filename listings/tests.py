@@ -1,3 +1,235 @@
-from django.test import TestCase
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from accounts.models import Seller
+from catalog.models import Book
+from listings.models import InventoryUpload, Listing
+from listings.services.feed_readers import canonical_headers
+from listings.services.inventory_import import import_inventory_csv
+from listings.services.pagination import SORTS, paginate_keyset
+from search.backends import SQLiteBackend, search_queryset
+
+
+class CanonicalHeadersTests(SimpleTestCase):
+
+    def test_amazon_listing_id_is_not_the_sku(self):
+        headers = canonical_headers(
+            ["item-name", "listing-id", "seller-sku", "price", "quantity", "product-id"]
+        )
+        self.assertEqual(
+            headers,
+            ["item-name", "listing-id", "seller_sku", "price", "quantity", "isbn13"],
+        )
+
+    def test_more_specific_alias_wins_over_column_order(self):
+        self.assertEqual(canonical_headers(["ISBN", "ISBN13"]), ["ISBN", "isbn13"])
+
+
+class SyncInventoryTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user("seller", password="pw")
+        self.seller = Seller.objects.create(user=user, display_name="Seller")
+        self.book_a = Book.objects.create(isbn13="9780306406157", title="A")
+        self.book_b = Book.objects.create(isbn13="9780140449136", title="B")
+        self.book_a.sync_identifiers()
+        self.book_b.sync_identifiers()
+
+    def listing(self, book, sku, price="5.00"):
+        return Listing.objects.create(
+            seller=self.seller, book=book, seller_sku=sku,
+            price=Decimal(price), condition="good", status="active",
+        )
+
+    def sync(self, csv, mode="sync"):
+        upload = InventoryUpload(seller=self.seller, mode=mode, original_name="feed.csv")
+        upload.file.save("feed.csv", ContentFile(csv.encode()), save=False)
+        upload.save()
+        return import_inventory_csv(upload, self.seller)
+
+    def test_missing_sku_is_archived(self):
+        a = self.listing(self.book_a, "A")
+        b = self.listing(self.book_b, "B")
+
+        results = self.sync("isbn13,seller_sku,price\n9780306406157,A,5.00\n")
+
+        self.assertEqual(results["archived"], 1)
+        a.refresh_from_db()
+        b.refresh_from_db()
+        self.assertEqual(a.status, "active")
+        self.assertEqual(b.status, "archived")
+
+    def test_invalid_row_does_not_archive_its_listing(self):
+        self.listing(self.book_a, "A")
+        b = self.listing(self.book_b, "B", price="6.00")
+
+        results = self.sync(
+            "isbn13,seller_sku,price\n"
+            "9780306406157,A,5.00\n"
+            "9780140449136,B,6.0O\n"
+        )
+
+        self.assertEqual(results["archived"], 0)
+        self.assertEqual(results["error_count"], 1)
+        b.refresh_from_db()
+        self.assertEqual(b.status, "active")
+        self.assertEqual(b.price, Decimal("6.00"))
+
+    def test_unknown_book_row_does_not_archive_its_listing(self):
+        b = self.listing(self.book_b, "B")
+
+        results = self.sync("isbn13,seller_sku,price\n9780000000002,B,6.00\n")
+
+        self.assertEqual(results["archived"], 0)
+        b.refresh_from_db()
+        self.assertEqual(b.status, "active")
+        self.assertEqual(b.book, self.book_b)
+
+    def test_sold_listing_is_not_updated_or_archived(self):
+        a = self.listing(self.book_a, "A")
+        Listing.objects.filter(pk=a.pk).update(status="sold")
+        b = self.listing(self.book_b, "B")
+        Listing.objects.filter(pk=b.pk).update(status="sold")
+
+        results = self.sync("isbn13,seller_sku,price\n9780306406157,A,9.00\n")
+
+        self.assertEqual((results["updated"], results["archived"], results["created"]), (0, 0, 0))
+        self.assertEqual(results["errors"][0]["error"], "SKU A is on a sold listing")
+        a.refresh_from_db()
+        b.refresh_from_db()
+        self.assertEqual((a.status, a.price), ("sold", Decimal("5.00")))
+        self.assertEqual(b.status, "sold")
+
+    def test_append_reports_sku_listed_concurrently(self):
+        self.listing(self.book_a, "A")
+        csv = "isbn13,seller_sku,price\n9780306406157,A,5.00\n9780140449136,B,6.00\n"
+
+        # As if another upload listed "A" after this one checked the SKUs
+        with mock.patch.object(Listing.objects, "live", return_value=Listing.objects.none()):
+            results = self.sync(csv, mode="append")
+
+        self.assertEqual(results["created"], 1)
+        self.assertEqual(results["errors"][0]["error"], "SKU A already listed (use sync)")
+        self.assertEqual(Listing.objects.filter(seller_sku="B").count(), 1)
+
+
+class PublicListingsSearchTests(TestCase):
+
+    def setUp(self):
+        # The dev trigram index lives in the process; start from this
+        # test's catalog
+        SQLiteBackend._fuzzy.clear()
+        user = User.objects.create_user("seller", password="pw")
+        seller = Seller.objects.create(user=user, display_name="Seller")
+        for isbn13, title, author in [
+            ("9780141439518", "Pride and Prejudice", "Jane Austen"),
+            ("9780141439662", "Sense and Sensibility", "Jane Austen"),
+            ("9780064410151", "The Pinhoe Egg", "Diana Wynne Jones"),
+        ]:
+            book = Book.objects.create(isbn13=isbn13, title=title, author=author)
+            Listing.objects.create(
+                seller=seller, book=book, price=Decimal("5.00"),
+                condition="good", status="active",
+            )
+
+    def search(self, query):
+        return self.client.get(reverse("public_listings"), {"q": query})
+
+    def titles(self, response):
+        return [listing.book.title for listing in response.context["listings"]]
+
+    def test_misspelling_falls_back_to_close_matches(self):
+        response = self.search("pinhoo egg")
+
+        self.assertTrue(response.context["fuzzy"])
+        self.assertEqual(response.context["suggestion"], "pinhoe egg")
+        self.assertEqual(self.titles(response), ["The Pinhoe Egg"])
+
+    def test_exclusion_only_query_has_no_fuzzy_fallback(self):
+        response = self.search("-austen")
+
+        self.assertFalse(response.context["fuzzy"])
+        self.assertIsNone(response.context["suggestion"])
+        self.assertEqual(self.titles(response), [])
+
+    def test_fallback_ignores_excluded_terms(self):
+        response = self.search("pinhoo -austen")
+
+        self.assertTrue(response.context["fuzzy"])
+        self.assertEqual(self.titles(response), ["The Pinhoe Egg"])
+
+
+class KeysetPaginationTests(TestCase):
+
+    PRICES = ["5.00", "5.00", "7.50", "3.00", "7.50", "5.00", "9.00"]
+
+    def setUp(self):
+        user = User.objects.create_user("seller", password="pw")
+        seller = Seller.objects.create(user=user, display_name="Seller")
+        for i, price in enumerate(self.PRICES):
+            # "garden" once, twice, ... so relevance differs but repeats
+            book = Book.objects.create(
+                isbn13=f"97800000000{i:02d}",
+                title=f"Book {i}",
+                description="garden " * (i % 3 + 1),
+            )
+            Listing.objects.create(
+                seller=seller, book=book, price=Decimal(price),
+                condition="good", status="active",
+            )
+
+    def queryset(self, sort):
+        listings = Listing.objects.filter(status="active")
+        if sort == "relevance":
+            listings = search_queryset(listings, "garden", book_field="book_id")
+        return listings
+
+    def walk(self, sort, page_size=3):
+        """Every page forward, then back again along the prev cursors."""
+        listings = self.queryset(sort)
+
+        forward = []
+        cursor = None
+        while True:
+            page = paginate_keyset(listings, sort=sort, cursor=cursor, page_size=page_size)
+            forward.append([listing.id for listing in page])
+            if not page.next_cursor:
+                break
+            cursor = page.next_cursor
+
+        backward = [forward[-1]]
+        while page.prev_cursor:
+            page = paginate_keyset(listings, sort=sort, cursor=page.prev_cursor, page_size=page_size)
+            backward.append([listing.id for listing in page])
+
+        return forward, backward[::-1]
+
+    def test_pages_cover_every_row_once_in_sort_order(self):
+        for sort, (_, order) in SORTS.items():
+            with self.subTest(sort=sort):
+                expected = list(self.queryset(sort).order_by(*order).values_list("id", flat=True))
+
+                forward, backward = self.walk(sort)
+
+                self.assertEqual([i for page in forward for i in page], expected)
+                self.assertEqual(len(forward), 3)
+                self.assertEqual(backward, forward)
+
+    def test_prev_link_returns_to_previous_page(self):
+        url = reverse("public_listings")
+        first = self.client.get(url, {"sort": "-price", "per_page": 3})
+        self.assertIsNone(first.context["prev_url"])
+
+        second = self.client.get(url + first.context["next_url"])
+        self.assertEqual(second.context["sort"], "-price")
+
+        back = self.client.get(url + second.context["prev_url"])
+        self.assertEqual(
+            [listing.id for listing in back.context["listings"]],
+            [listing.id for listing in first.context["listings"]],
+        )
@@ -1,12 +1,24 @@
-from django.db.models import Q
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect, get_object_or_404
 
-from .models import Listing
+from .models import InventoryUpload, Listing
 from accounts.models import Seller
+from catalog.isbn import identifier_query
+from catalog.models import BookIdentifier
+from search.backends import fuzzy_queryset, get_backend, positive_terms, search_queryset
 from accounts.utils import seller_required
 
-from .services.inventory_import import (analyze_inventory_csv,import_inventory_csv)
+from .services.feed_readers import FeedError
+from .services.pagination import (
+    DEFAULT_SORT,
+    SORTS,
+    page_size_from,
+    paginate_keyset,
+)
+from .services.inventory_import import (
+    import_inventory_csv,
+    stage_inventory_upload,
+)
 from accounts.utils import seller_required
 
 
@@ -28,13 +40,33 @@ def public_listings(request):
         .filter(status="active", quantity__gt=0)
     )
 
-    if query:
-        listings = listings.filter(
-            Q(book__title__icontains=query)
-            | Q(book__author__icontains=query)
-            | Q(book__isbn10__icontains=query)
-            | Q(book__isbn13__icontains=query)
-        )
+    ranked = False
+    fuzzy = False
+    suggestion = None
+    identifier = identifier_query(query)
+    if identifier:
+        # A pasted ISBN / ASIN is one exact lookup on the identifier
+        # index, and names at most one book: go straight to it
+        book = BookIdentifier.objects.resolve(identifier)
+        if book:
+            return redirect("book_detail", identifier=book.isbn13 or identifier)
+        listings = listings.none()
+    elif query:
+        # Full-text over title / author / publisher / description
+        matches = search_queryset(listings, query, book_field="book_id")
+        terms = positive_terms(query)
+        if not terms or matches.exists():
+            listings = matches
+        else:
+            # Nothing for the words as typed: offer a respelling and
+            # show titles / authors close to the wanted terms (trigram
+            # similarity). A query of exclusions alone ("-austen") has
+            # no wanted terms and gets no fallback.
+            close_to = " ".join(terms)
+            suggestion = get_backend().did_you_mean(close_to)
+            listings = fuzzy_queryset(listings, close_to, book_field="book_id")
+            fuzzy = True
+        ranked = True
 
     if format_filter:
         listings = listings.filter(book__format=format_filter)
@@ -57,12 +89,51 @@ def public_listings(request):
     elif special == "most-wanted":
         listings = listings.filter(book__want_to_read_count__gte=100)
 
+    sort = request.GET.get("sort") or ("relevance" if ranked else DEFAULT_SORT)
+    if sort == "relevance" and not ranked:
+        sort = DEFAULT_SORT
+    page = paginate_keyset(
+        listings,
+        sort=sort,
+        cursor=request.GET.get("cursor"),
+        page_size=page_size_from(request.GET.get("per_page")),
+    )
+
+    # Prev / next links keep every filter and only swap the cursor
+    def page_url(cursor):
+        params = request.GET.copy()
+        params["cursor"] = cursor
+        return f"?{params.urlencode()}"
+
+    suggestion_url = None
+    if suggestion:
+        params = request.GET.copy()
+        params["q"] = suggestion
+        params.pop("cursor", None)
+        suggestion_url = f"?{params.urlencode()}"
+
     return render(
         request,
         "listings/public_listings.html",
         {
-            "listings": listings,
+            "listings": page,
             "query": query,
+            "fuzzy": fuzzy,
+            "suggestion": suggestion,
+            "suggestion_url": suggestion_url,
+            "sort": sort if sort in SORTS else DEFAULT_SORT,
+            "sort_choices": [
+                (key, label) for key, (label, _) in SORTS.items()
+                if key != "relevance" or ranked
+            ],
+            # Kept across a new search / sort; the cursor is not
+            "filters": [
+                (name, request.GET[name])
+                for name in ("format", "language", "era", "special", "per_page")
+                if request.GET.get(name)
+            ],
+            "next_url": page_url(page.next_cursor) if page.next_cursor else None,
+            "prev_url": page_url(page.prev_cursor) if page.prev_cursor else None,
         },
     )
 
@@ -78,19 +149,24 @@ def upload_inventory(request):
     if not seller:
         return render(request, "listings/not_a_seller.html")
 
-    context = {}
+    context = {"mode_choices": InventoryUpload.MODE_CHOICES}
 
     if request.method == "POST" and request.FILES.get("file"):
-        preview = analyze_inventory_csv(
-            request.FILES["file"],
-            seller,
-        )
+        mode = request.POST.get("mode", "append")
+        if mode not in dict(InventoryUpload.MODE_CHOICES):
+            mode = "append"
 
-        # Store preview in session (JSON-safe)
-        request.session["inventory_preview"] = preview
+        try:
+            upload = stage_inventory_upload(request.FILES["file"], seller, mode)
+        except FeedError as e:
+            context["error"] = str(e)
+        else:
+            # Only the id goes in the session; the preview lives on the upload
+            request.session["inventory_upload_id"] = upload.id
 
-        context["preview"] = preview
-        context["awaiting_confirmation"] = True
+            context["preview"] = upload.preview
+            context["mode"] = upload.get_mode_display()
+            context["awaiting_confirmation"] = True
 
     return render(
         request,
@@ -110,21 +186,22 @@ def confirm_inventory(request):
     if not seller:
         return redirect("upload_inventory")
 
-    preview = request.session.get("inventory_preview")
-    if not preview:
+    upload = InventoryUpload.objects.filter(
+        id=request.session.get("inventory_upload_id"),
+        seller=seller,
+        status="pending",
+    ).first()
+    if not upload:
         return redirect("upload_inventory")
 
     if request.method == "POST":
         results = import_inventory_csv(
-            preview,
+            upload,
             seller,
         )
 
         # Clean up session
-        try:
-            del request.session["inventory_preview"]
-        except KeyError:
-            pass
+        request.session.pop("inventory_upload_id", None)
 
         return render(
             request,
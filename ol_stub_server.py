@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+
+"""
+Local stand-in for openlibrary.org, for tests and benchmarks.
+
+Serves api/books, search.json, /works/*.json and /b/id/* covers from a
+recorded corpus, with configurable latency and failure injection:
+
+    ol_stub_server.py record --isbns isbns.csv --corpus bench/corpus
+    ol_stub_server.py serve --corpus bench/corpus --port 8089 \
+        --latency-ms 250 --jitter-ms 150 --error-rate 0.02 --html-error-rate 0.02
+
+Point the pipelines at it with:
+
+    EOB_OPENLIBRARY_URL=http://127.0.0.1:8089 EOB_HTTP_CACHE=off ...
+
+Corpus layout:
+
+    books/<isbn>.json      Books API record (jscmd=data), one per ISBN
+    search/<isbn>.json     search.json doc for q=isbn:<isbn>
+    works/<OLxxxW>.json    Works API record
+    covers/<id>.jpg        cover image (L size)
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+
+# =========================
+# CONFIG
+# =========================
+
+REAL_OPENLIBRARY = "https://openlibrary.org"
+REAL_COVERS = "https://covers.openlibrary.org"
+
+RECORD_SLEEP = 1.0
+
+HTML_ERROR_PAGE = b"""<!DOCTYPE html>
+<html><head><title>Open Library is temporarily unavailable</title></head>
+<body><h1>Open Library is temporarily unavailable</h1>
+<p>Please try again in a few minutes.</p></body></html>
+"""
+
+# What covers.openlibrary.org serves for an unknown id without
+# ?default=false: a 1x1 transparent GIF.
+PLACEHOLDER_GIF = (
+    b"GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04"
+    b"\x01\x00\x00\x00\x00,\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;"
+)
+
+
+# =========================
+# CORPUS
+# =========================
+
+class Corpus:
+    """
+    Recorded Open Library responses, loaded into memory.
+
+    `synthetic_hit_rate` > 0 makes unknown ISBNs resolve to generated
+    records (deterministic per ISBN), so benchmarks can run on ISBN
+    lists far larger than the recorded corpus.
+    """
+
+    def __init__(self, path, synthetic_hit_rate=0.0):
+        self.path = path
+        self.synthetic_hit_rate = synthetic_hit_rate
+        self.books = self._load("books")
+        self.search = self._load("search")
+        self.works = self._load("works")
+
+    def _load(self, kind):
+        folder = os.path.join(self.path, kind)
+        data = {}
+        if not os.path.isdir(folder):
+            return data
+        for name in os.listdir(folder):
+            if name.endswith(".json"):
+                with open(os.path.join(folder, name), encoding="utf-8") as f:
+                    data[name[:-5]] = json.load(f)
+        return data
+
+    def _synthetic(self, isbn):
+        digest = hashlib.sha1(isbn.encode()).hexdigest()
+        n = int(digest[:8], 16)
+        if (n % 1000) >= self.synthetic_hit_rate * 1000:
+            return None
+        return n
+
+    def book(self, isbn):
+        if isbn in self.books:
+            return self.books[isbn]
+        n = self._synthetic(isbn)
+        if n is None:
+            return None
+        return {
+            "key": f"/books/OL{n % 100_000_000}M",
+            "title": f"Synthetic Book {isbn}",
+            "authors": [{"name": f"Author {n % 5000}"}],
+            "publishers": [{"name": f"Publisher {n % 300}"}],
+            "publish_date": str(1900 + n % 125),
+            "number_of_pages": 100 + n % 700,
+            "subjects": [{"name": f"Subject {n % 40}"}],
+            "languages": [{"key": "/languages/eng"}],
+            "identifiers": {"isbn_13": [isbn]},
+            "cover": {
+                "large": f"{REAL_COVERS}/b/id/{n % 10_000_000}-L.jpg",
+                "medium": f"{REAL_COVERS}/b/id/{n % 10_000_000}-M.jpg",
+            },
+        }
+
+    def search_doc(self, isbn):
+        if isbn in self.search:
+            return self.search[isbn]
+        n = self._synthetic(isbn)
+        if n is None:
+            return None
+        return {
+            "key": f"/works/OL{n % 1_000_000}W",
+            "title": f"Synthetic Book {isbn}",
+            "want_to_read_count": n % 500,
+            "already_read_count": n % 200,
+            "currently_reading_count": n % 50,
+            "ratings_average": round(1 + (n % 400) / 100, 2),
+            "isbn": [isbn],
+        }
+
+    def work(self, key):
+        if key in self.works:
+            return self.works[key]
+        if self.synthetic_hit_rate > 0:
+            return {"key": f"/works/{key}", "description": f"Synthetic work {key}."}
+        return None
+
+    def find(self, text, limit):
+        """Loose title/author match for free-text search.json queries."""
+        words = [w for w in text.lower().split() if w]
+        found = []
+        for doc in self.search.values():
+            haystack = " ".join(
+                [doc.get("title", "")] + list(doc.get("author_name", []))
+            ).lower()
+            if all(w in haystack for w in words):
+                found.append(doc)
+                if len(found) >= limit:
+                    break
+        return found
+
+
+# =========================
+# HTTP SERVER
+# =========================
+
+class StubHandler(BaseHTTPRequestHandler):
+    server_version = "OLStub/1.0"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        server = self.server
+        server.count_request()
+        parts = urlsplit(self.path)
+        query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+
+        delay = server.latency + random.uniform(0, server.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        roll = random.random()
+        if roll < server.error_rate:
+            return self.send(503, b"Service Unavailable", "text/plain")
+        if roll < server.error_rate + server.html_error_rate:
+            return self.send(200, HTML_ERROR_PAGE, "text/html; charset=utf-8")
+
+        path = parts.path
+        if path == "/api/books":
+            return self.books(query)
+        if path == "/search.json":
+            return self.search(query)
+        if path.startswith("/works/") and path.endswith(".json"):
+            return self.work(path[len("/works/"):-len(".json")])
+        if path.startswith("/b/id/"):
+            return self.cover(path[len("/b/id/"):], query)
+
+        self.send(404, b"Not Found", "text/plain")
+
+    # ---- endpoints ----
+
+    def books(self, query):
+        payload = {}
+        for bibkey in query.get("bibkeys", "").split(","):
+            bibkey = bibkey.strip()
+            if not bibkey.startswith("ISBN:"):
+                continue
+            record = self.server.corpus.book(bibkey[5:])
+            if record:
+                payload[bibkey] = record
+        self.send_json(payload)
+
+    def search(self, query):
+        q = query.get("q", "")
+        limit = int(query.get("limit", 100))
+
+        if q.startswith("isbn:"):
+            doc = self.server.corpus.search_doc(q[5:])
+            docs = [doc] if doc else []
+        else:
+            docs = self.server.corpus.find(q, limit)
+
+        fields = [f for f in query.get("fields", "").split(",") if f]
+        if fields:
+            docs = [{k: v for k, v in d.items() if k in fields} for d in docs]
+
+        self.send_json({"numFound": len(docs), "start": 0, "docs": docs[:limit]})
+
+    def work(self, key):
+        record = self.server.corpus.work(key)
+        if record is None:
+            return self.send(404, b'{"error": "notfound"}', "application/json")
+        self.send_json(record)
+
+    def cover(self, name, query):
+        cover_id = name.split("-")[0]
+        path = os.path.join(self.server.corpus.path, "covers", f"{cover_id}.jpg")
+
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                return self.send(200, f.read(), "image/jpeg")
+
+        if query.get("default") == "false":
+            return self.send(404, b"Not Found", "text/plain")
+        self.send(200, PLACEHOLDER_GIF, "image/gif")
+
+    # ---- helpers ----
+
+    def send_json(self, data):
+        body = json.dumps(data).replace(REAL_COVERS, self.server.base_url)
+        self.send(200, body.encode(), "application/json")
+
+    def send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        corpus,
+        host="127.0.0.1",
+        port=0,
+        latency_ms=0,
+        jitter_ms=0,
+        error_rate=0.0,
+        html_error_rate=0.0,
+        verbose=False,
+    ):
+        super().__init__((host, port), StubHandler)
+        self.corpus = corpus
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.html_error_rate = html_error_rate
+        self.verbose = verbose
+        self.base_url = f"http://{host}:{self.server_address[1]}"
+
+        self.requests_served = 0
+        self._count_lock = threading.Lock()
+
+    def count_request(self):
+        with self._count_lock:
+            self.requests_served += 1
+
+
+def start_stub_server(corpus, **options):
+    """
+    Start a StubServer on a background thread and return it.
+    Its address is server.base_url; call server.shutdown() when done.
+    """
+    server = StubServer(corpus, **options)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+# =========================
+# RECORDING
+# =========================
+
+def read_isbns(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = csv.reader(f)
+        next(rows, None)  # header
+        return [row[0].strip() for row in rows if row and row[0].strip()]
+
+
+def save_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+def record(isbns, corpus_path, covers=True):
+    """
+    Fetch real Open Library responses for `isbns` into a corpus
+    directory. Slow and polite on purpose; already recorded ISBNs are
+    skipped, so it can be resumed.
+    """
+    for isbn in isbns:
+        book_path = os.path.join(corpus_path, "books", f"{isbn}.json")
+        if os.path.exists(book_path):
+            continue
+
+        print(f"→ {isbn}")
+
+        r = requests.get(
+            f"{REAL_OPENLIBRARY}/api/books",
+            params={"bibkeys": f"ISBN:{isbn}", "format": "json", "jscmd": "data"},
+            timeout=30,
+        )
+        record = r.json().get(f"ISBN:{isbn}") if r.text.startswith("{") else None
+        if not record:
+            print("   no data")
+            time.sleep(RECORD_SLEEP)
+            continue
+        save_json(book_path, record)
+
+        r = requests.get(
+            f"{REAL_OPENLIBRARY}/search.json",
+            params={"q": f"isbn:{isbn}", "limit": 1},
+            timeout=30,
+        )
+        docs = r.json().get("docs", []) if r.text.startswith("{") else []
+        if docs:
+            save_json(os.path.join(corpus_path, "search", f"{isbn}.json"), docs[0])
+
+            work_key = docs[0].get("key", "")
+            work_id = work_key.split("/")[-1]
+            work_path = os.path.join(corpus_path, "works", f"{work_id}.json")
+            if work_id and not os.path.exists(work_path):
+                r = requests.get(f"{REAL_OPENLIBRARY}{work_key}.json", timeout=30)
+                if r.status_code == 200:
+                    save_json(work_path, r.json())
+
+        cover_url = (record.get("cover") or {}).get("large")
+        if covers and cover_url:
+            cover_id = cover_url.rsplit("/", 1)[-1].split("-")[0]
+            r = requests.get(cover_url, params={"default": "false"}, timeout=30)
+            if r.status_code == 200:
+                path = os.path.join(corpus_path, "covers", f"{cover_id}.jpg")
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "wb") as f:
+                    f.write(r.content)
+
+        time.sleep(RECORD_SLEEP)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Local Open Library stand-in")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve = sub.add_parser("serve", help="Serve a recorded corpus")
+    serve.add_argument("--corpus", required=True)
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8089)
+    serve.add_argument("--latency-ms", type=float, default=0)
+    serve.add_argument("--jitter-ms", type=float, default=0)
+    serve.add_argument("--error-rate", type=float, default=0.0,
+                       help="Fraction of requests answered with HTTP 503")
+    serve.add_argument("--html-error-rate", type=float, default=0.0,
+                       help="Fraction answered with a 200 HTML error page")
+    serve.add_argument("--synthetic-hit-rate", type=float, default=0.0,
+                       help="Fraction of unknown ISBNs given generated records")
+    serve.add_argument("--verbose", action="store_true")
+
+    rec = sub.add_parser("record", help="Record real responses into a corpus")
+    rec.add_argument("--isbns", required=True, help="CSV with ISBNs in the first column")
+    rec.add_argument("--corpus", required=True)
+    rec.add_argument("--no-covers", action="store_true")
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if args.command == "record":
+        record(read_isbns(args.isbns), args.corpus, covers=not args.no_covers)
+    else:
+        server = StubServer(
+            Corpus(args.corpus, args.synthetic_hit_rate),
+            host=args.host,
+            port=args.port,
+            latency_ms=args.latency_ms,
+            jitter_ms=args.jitter_ms,
+            error_rate=args.error_rate,
+            html_error_rate=args.html_error_rate,
+            verbose=args.verbose,
+        )
+        print(f"Serving {args.corpus} on {server.base_url}")
+        server.serve_forever()
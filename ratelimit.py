@@ -0,0 +1,52 @@
+import asyncio
+import threading
+import time
+
+
+# =========================
+# TOKEN BUCKET
+# =========================
+
+class TokenBucket:
+    """
+    Global requests-per-second limiter shared by threads and coroutines.
+
+    Each acquire() reserves the next free slot, so callers are spaced
+    1/rate seconds apart no matter how many are waiting. `burst` tokens
+    may be spent back to back after an idle period. rate <= 0 disables
+    limiting.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(burst))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        if self.rate <= 0:
+            return 0.0
+
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity,
+                self.tokens + (now - self.updated) * self.rate,
+            )
+            self.updated = now
+
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def acquire(self):
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
@@ -0,0 +1,436 @@
+"""
+Typeahead completions for book titles and authors, served from memory.
+
+The index is a sorted NumPy array of normalized keys (the title /
+author from each word start: "one hundred years", "hundred years",
+"years" ...), each pointing at an entry with a weight:
+
+    want_to_read_count + 1, plus AVAILABLE_BOOST if the book has an
+    active, in-stock listing (authors: their best book)
+
+A prefix is a searchsorted range of the key array; the heaviest
+entries in it are the completions. Prefixes of up to SHORT_PREFIX
+characters, whose ranges are the largest, have their top entries
+precomputed. A lookup never touches the database.
+
+Lifecycle (per worker process):
+
+- start() loads the snapshot written by `manage.py
+  build_autocomplete` (or builds from the DB if there is none), then
+  a background thread refreshes every REFRESH_SECONDS.
+- A refresh re-reads books whose `updated_at` moved or whose
+  availability flipped into a small overlay that shadows their base
+  entries. Past OVERLAY_MAX books it rebuilds the base instead.
+- Deleted books linger until the next rebuild / snapshot.
+"""
+
+import bisect
+import heapq
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from catalog.models import Book
+from listings.models import Listing
+
+from .text import normalize
+
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_PATH = os.environ.get(
+    "EOB_AUTOCOMPLETE_SNAPSHOT",
+    os.path.join(settings.BASE_DIR, ".autocomplete", "index.npz"),
+)
+
+REFRESH_SECONDS = 60
+
+# Keys are truncated to KEY_LEN bytes; words past MAX_WORD_STARTS of
+# a title don't start keys.
+KEY_LEN = 24
+MAX_WORD_STARTS = 6
+
+SHORT_PREFIX = 3
+SHORT_TOP = 32
+
+AVAILABLE_BOOST = 1_000_000
+
+OVERLAY_MAX = 2000
+
+TITLE, AUTHOR = 0, 1
+KINDS = {TITLE: "title", AUTHOR: "author"}
+
+def text_keys(text):
+    """Normalized key bytes from each word start."""
+    words = normalize(text).split()
+    return [
+        " ".join(words[i:]).encode()[:KEY_LEN]
+        for i in range(min(len(words), MAX_WORD_STARTS))
+    ]
+
+
+def book_weight(want_to_read_count, available):
+    return (want_to_read_count or 0) + 1 + (AVAILABLE_BOOST if available else 0)
+
+
+# =========================
+# DB READS
+# =========================
+
+def available_book_ids():
+    return set(
+        Listing.objects.filter(status="active", quantity__gt=0)
+        .values_list("book_id", flat=True)
+        .distinct()
+    )
+
+
+def book_entries(books, available):
+    """
+    (kind, label, ref, weight, book_id, keys) for Book value rows
+    (id, title, author, isbn13, isbn10, want_to_read_count). `ref` is
+    the book_detail identifier for titles, the author for authors.
+    """
+    for book_id, title, author, isbn13, isbn10, want in books:
+        weight = book_weight(want, book_id in available)
+        ref = isbn13 or isbn10
+        if title and ref:
+            yield TITLE, title, ref, weight, book_id, text_keys(title)
+        if author:
+            yield AUTHOR, author, author, weight, book_id, text_keys(author)
+
+
+def _book_rows(queryset):
+    return queryset.values_list(
+        "id", "title", "author", "isbn13", "isbn10", "want_to_read_count",
+    )
+
+
+# =========================
+# BASE INDEX (NUMPY)
+# =========================
+
+class BaseIndex:
+    """Immutable arrays; see the module docstring."""
+
+    def __init__(self, keys, key_entry, weights, books, blob, offsets,
+                 short_keys, short_top, available, built_at):
+        self.keys = keys                # (K,) S{KEY_LEN}, sorted
+        self.key_entry = key_entry      # (K,) entry of each key
+        self.weights = weights          # (E,) int64
+        self.books = books              # (E,) book id, 0 for authors
+        self.blob = blob                # UTF-8 "kind\tlabel\tref" of all entries
+        self.offsets = offsets          # (E + 1,) into blob
+        self.short_keys = short_keys    # (P,) sorted prefixes <= SHORT_PREFIX
+        self.short_top = short_top      # (P, SHORT_TOP) entries, -1 padded
+        self.available = available      # book ids weighted as available
+        self.built_at = built_at        # epoch seconds the DB was read at
+
+    def __len__(self):
+        return len(self.weights)
+
+    def entry(self, i):
+        kind, label, ref = self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode().split("\t")
+        return int(kind), label, ref
+
+    def top(self, key, n):
+        """Up to n heaviest entry ids under prefix `key` (bytes), heaviest first."""
+        if len(key) <= SHORT_PREFIX:
+            i = np.searchsorted(self.short_keys, key)
+            if i < len(self.short_keys) and self.short_keys[i] == key:
+                top = self.short_top[i]
+                return [int(e) for e in top[top >= 0][:n]]
+            return []
+
+        lo = np.searchsorted(self.keys, key, "left")
+        hi = np.searchsorted(self.keys, key + b"\xff", "left")
+        if lo >= hi:
+            return []
+        return _heaviest(self.key_entry[lo:hi], self.weights, n)
+
+    # ---- build ----
+
+    @classmethod
+    def from_entries(cls, entries, available, built_at):
+        """entries: book_entries() tuples built with the `available` set."""
+        weights, books, offsets, chunks, keys, key_entry = [], [], [0], [], [], []
+        authors = {}  # normalized author -> entry id (one entry per author)
+        size = 0
+
+        for kind, label, ref, weight, book_id, entry_keys in entries:
+            if kind == AUTHOR:
+                name = normalize(label)
+                if name in authors:
+                    i = authors[name]
+                    weights[i] = max(weights[i], weight)
+                    continue
+                authors[name] = len(weights)
+                book_id = 0
+
+            i = len(weights)
+            weights.append(weight)
+            books.append(book_id)
+            chunk = "\t".join([str(kind), _field(label), _field(ref)]).encode()
+            chunks.append(chunk)
+            size += len(chunk)
+            offsets.append(size)
+            keys.extend(entry_keys)
+            key_entry.extend([i] * len(entry_keys))
+
+        keys = np.array(keys, dtype=f"S{KEY_LEN}")
+        key_entry = np.array(key_entry, dtype=np.int32)
+        order = np.argsort(keys, kind="stable")
+        keys, key_entry = keys[order], key_entry[order]
+        weights = np.array(weights, dtype=np.int64)
+
+        short_keys, short_top = _short_prefixes(keys, key_entry, weights)
+
+        return cls(
+            keys=keys,
+            key_entry=key_entry,
+            weights=weights,
+            books=np.array(books, dtype=np.int64),
+            blob=np.frombuffer(b"".join(chunks), dtype=np.uint8),
+            offsets=np.array(offsets, dtype=np.int64),
+            short_keys=short_keys,
+            short_top=short_top,
+            available=np.array(sorted(available), dtype=np.int64),
+            built_at=built_at,
+        )
+
+    @classmethod
+    def from_db(cls, batch_size=5000):
+        built_at = time.time()
+        available = available_book_ids()
+        books = _book_rows(Book.objects.order_by()).iterator(chunk_size=batch_size)
+        return cls.from_entries(book_entries(books, available), available, built_at)
+
+    # ---- snapshot ----
+
+    FIELDS = ("keys", "key_entry", "weights", "books", "blob", "offsets",
+              "short_keys", "short_top", "available")
+
+    def save(self, path=SNAPSHOT_PATH):
+        """Write atomically: workers may be loading the previous one."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".npz")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f,
+                    built_at=np.array(self.built_at),
+                    **{name: getattr(self, name) for name in self.FIELDS},
+                )
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    @classmethod
+    def load(cls, path=SNAPSHOT_PATH):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                built_at=float(data["built_at"]),
+                **{name: data[name] for name in cls.FIELDS},
+            )
+
+
+def _field(value):
+    return " ".join(value.split())
+
+
+def _heaviest(entry_ids, weights, n):
+    """Distinct entries of `entry_ids` with the largest weights, heaviest first."""
+    # An entry can sit under one prefix several times ("the theory"),
+    # so over-select before de-duplicating
+    want = n * 2
+    if len(entry_ids) > want:
+        part = np.argpartition(-weights[entry_ids], want)[:want]
+        entry_ids = entry_ids[part]
+    order = np.argsort(-weights[entry_ids], kind="stable")
+
+    result = []
+    for e in entry_ids[order]:
+        e = int(e)
+        if e not in result:
+            result.append(e)
+            if len(result) == n:
+                break
+    return result
+
+
+def _short_prefixes(keys, key_entry, weights):
+    """Top SHORT_TOP entries of every existing prefix of 1..SHORT_PREFIX bytes."""
+    prefixes, tops = [], []
+
+    for length in range(1, SHORT_PREFIX + 1):
+        cut = keys.astype(f"S{length}")
+        if not len(cut):
+            break
+        starts = np.concatenate(([0], np.flatnonzero(cut[1:] != cut[:-1]) + 1))
+        ends = np.append(starts[1:], len(cut))
+
+        for lo, hi in zip(starts, ends):
+            prefix = cut[lo]
+            if len(prefix) < length:
+                continue  # a shorter key; its prefix is counted at that length
+            top = _heaviest(key_entry[lo:hi], weights, SHORT_TOP)
+            prefixes.append(prefix)
+            tops.append(top + [-1] * (SHORT_TOP - len(top)))
+
+    short_keys = np.array(prefixes, dtype=f"S{SHORT_PREFIX}")
+    short_top = np.array(tops, dtype=np.int32).reshape(len(prefixes), SHORT_TOP)
+    order = np.argsort(short_keys, kind="stable")
+    return short_keys[order], short_top[order]
+
+
+# =========================
+# OVERLAY + LOOKUP
+# =========================
+
+class Overlay:
+    """Entries of books changed since the base was built; shadows their base entries."""
+
+    def __init__(self, entries=(), book_ids=()):
+        self.book_ids = set(book_ids)   # books whose base title entries are stale
+        self.entries = []               # (kind, label, ref, weight)
+        self.keys = []                  # sorted (key, entry)
+
+        for kind, label, ref, weight, _, entry_keys in entries:
+            self.keys.extend((key, len(self.entries)) for key in entry_keys)
+            self.entries.append((kind, label, ref, weight))
+        self.keys.sort()
+
+    def top(self, key, n):
+        lo = bisect.bisect_left(self.keys, (key,))
+        hi = bisect.bisect_left(self.keys, (key + b"\xff",))
+        ids = {i for _, i in self.keys[lo:hi]}
+        return heapq.nlargest(n, (self.entries[i] for i in ids), key=lambda e: e[3])
+
+
+class AutocompleteIndex:
+
+    def __init__(self, base, overlay=None, available=None):
+        self.base = base
+        self.overlay = overlay or Overlay()
+        # Books currently weighted as available
+        self.available = set(base.available.tolist()) if available is None else available
+        # Book changes from this time (epoch seconds) on are not folded in yet
+        self.checked_at = base.built_at
+
+    def complete(self, query, limit=8):
+        """[{"kind", "label", "ref"}] for the typed prefix, best first."""
+        key = normalize(query).encode()[:KEY_LEN]
+        if not key:
+            return []
+
+        base, overlay = self.base, self.overlay
+        # Over-fetch when shadowed entries may have to be skipped
+        n = limit * 2 if overlay.book_ids else limit
+        candidates = [
+            (int(base.weights[i]),) + base.entry(i)
+            for i in base.top(key, n)
+            if int(base.books[i]) not in overlay.book_ids
+        ]
+        candidates += [
+            (weight, kind, label, ref)
+            for kind, label, ref, weight in overlay.top(key, limit)
+        ]
+        candidates.sort(key=lambda c: -c[0])
+
+        results, seen = [], set()
+        for _, kind, label, ref in candidates:
+            if (kind, label) in seen:
+                continue
+            seen.add((kind, label))
+            results.append({"kind": KINDS[kind], "label": label, "ref": ref})
+            if len(results) == limit:
+                break
+        return results
+
+    def refresh(self):
+        """
+        Fold DB changes since the last refresh into a new overlay (or a
+        rebuilt base); returns the index to use from now on.
+        """
+        started = time.time()
+        available = available_book_ids()
+
+        changed = set(
+            Book.objects.filter(
+                updated_at__gte=datetime.fromtimestamp(self.checked_at, timezone.utc),
+            ).values_list("id", flat=True)
+        )
+        changed |= available ^ self.available
+
+        book_ids = self.overlay.book_ids | changed
+        if len(book_ids) > OVERLAY_MAX:
+            return AutocompleteIndex(BaseIndex.from_db())
+
+        if not changed:
+            index = AutocompleteIndex(self.base, self.overlay, available)
+        else:
+            entries = book_entries(_book_rows(Book.objects.filter(id__in=book_ids)), available)
+            index = AutocompleteIndex(self.base, Overlay(entries, book_ids), available)
+        index.checked_at = started
+        return index
+
+
+# =========================
+# PROCESS-WIDE INSTANCE
+# =========================
+
+_index = None
+_lock = threading.Lock()
+_refresher_pid = None
+
+
+def load_index():
+    """The snapshot if there is one (caught up with the DB), else a fresh build."""
+    if os.path.exists(SNAPSHOT_PATH):
+        try:
+            index = AutocompleteIndex(BaseIndex.load(SNAPSHOT_PATH))
+        except (OSError, ValueError, KeyError):
+            logger.exception("Unreadable autocomplete snapshot %s; rebuilding", SNAPSHOT_PATH)
+        else:
+            return index.refresh()
+    return AutocompleteIndex(BaseIndex.from_db())
+
+
+def _refresh_forever():
+    global _index
+    while True:
+        time.sleep(REFRESH_SECONDS)
+        try:
+            _index = _index.refresh()
+        except Exception:
+            logger.exception("Autocomplete refresh failed")
+        finally:
+            close_old_connections()
+
+
+def start():
+    """Load the index and start the refresher (idempotent, fork-safe)."""
+    global _index, _refresher_pid
+    with _lock:
+        if _index is None:
+            _index = load_index()
+        if _refresher_pid != os.getpid():
+            # Threads don't survive a fork (gunicorn --preload)
+            threading.Thread(target=_refresh_forever, name="autocomplete-refresh", daemon=True).start()
+            _refresher_pid = os.getpid()
+    return _index
+
+
+def get_index():
+    if _index is None or _refresher_pid != os.getpid():
+        return start()
+    return _index
@@ -0,0 +1,454 @@
+"""
+Full-text search over the catalog.
+
+One shadow table per database, keyed by book id:
+
+- PostgreSQL: search_bookdocument(book_id, document tsvector) with a
+  GIN index. Documents are weighted title (A), author (B), publisher
+  (C), description (D), built with the `eob_search` text search
+  configuration (english stemming + unaccent, so "Garcia Marquez"
+  finds "García Márquez"). Queries go through websearch_to_tsquery:
+  "quoted phrases", -exclusions and OR work as on web search engines.
+
+- SQLite (dev): search_bookfts, an FTS5 table with the same four
+  columns (porter stemming, diacritics removed). User queries are
+  translated to the same websearch subset by fts5_query().
+
+Typo tolerance, for queries the full-text index finds nothing for:
+fuzzy_books() matches titles / authors by trigram word similarity
+and did_you_mean() respells unknown words from the catalog's
+vocabulary. PostgreSQL uses pg_trgm GIN indexes on catalog_book and
+on search_word (the vocabulary); SQLite keeps a pure-Python trigram
+index (search.trigrams) in memory, loaded once per process and
+updated book by book as books are (re)indexed.
+
+Both are maintained by search.signals on Book save / delete and by
+`manage.py reindex_search` for bulk writes that bypass save()
+(bulk_create, bulk_update, queryset .update(), raw SQL).
+"""
+
+import re
+
+from django.db import connection as default_connection
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.expressions import RawSQL
+
+from .text import words
+from .trigrams import CatalogTrigrams
+
+
+# Book fields the documents are built from; saving any of them
+# re-indexes the book.
+SEARCH_FIELDS = ("title", "author", "publisher", "description")
+
+# Books per index statement in bulk (re)indexing.
+INDEX_BATCH_SIZE = 2000
+
+# Minimum trigram word similarity of a query to a title / author for
+# a fuzzy match, and of a misspelled word to its correction.
+FUZZY_THRESHOLD = 0.5
+SUGGEST_THRESHOLD = 0.4
+
+# Books considered per fuzzy search.
+FUZZY_LIMIT = 200
+
+
+class SearchBackend:
+    """Interface; get_backend() picks the implementation for a connection."""
+
+    def __init__(self, connection=default_connection):
+        self.connection = connection
+
+    def index_books(self, book_ids):
+        """(Re)build the documents of these books from catalog_book."""
+        raise NotImplementedError
+
+    def remove_books(self, book_ids):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def matches(self, query):
+        """Subquery of matching book ids, for `book_id__in=`."""
+        raise NotImplementedError
+
+    def rank(self, query, book_column):
+        """
+        Relevance of the book whose id is in `book_column` (a quoted
+        "table"."column" of the outer query); higher is better.
+        """
+        raise NotImplementedError
+
+    def rebuild_vocabulary(self):
+        """Recount the did-you-mean vocabulary from the whole catalog."""
+
+    def fuzzy_books(self, query, limit=FUZZY_LIMIT):
+        """[(book_id, similarity)] for titles / authors close to `query`, best first."""
+        raise NotImplementedError
+
+    def known_words(self, tokens):
+        """The subset of (normalized) `tokens` in the vocabulary."""
+        raise NotImplementedError
+
+    def closest_word(self, token):
+        raise NotImplementedError
+
+    def did_you_mean(self, query):
+        """
+        `query` (normalized) with each unknown word replaced by the
+        closest vocabulary word, or None when nothing would change.
+        """
+        tokens = words(query)
+        known = self.known_words(tokens)
+
+        corrected = []
+        for token in tokens:
+            if token not in known and len(token) >= 3 and not token.isdigit():
+                token = self.closest_word(token) or token
+            corrected.append(token)
+
+        return " ".join(corrected) if corrected != tokens else None
+
+    def _execute(self, sql, params=None):
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.rowcount
+
+    def _batches(self, book_ids):
+        book_ids = list(book_ids)
+        for i in range(0, len(book_ids), INDEX_BATCH_SIZE):
+            yield book_ids[i:i + INDEX_BATCH_SIZE]
+
+
+# =========================
+# POSTGRESQL
+# =========================
+
+class PostgresBackend(SearchBackend):
+
+    DOCUMENT_SQL = """
+        setweight(to_tsvector('eob_search', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('eob_search', coalesce(author, '')), 'B')
+        || setweight(to_tsvector('eob_search', coalesce(publisher, '')), 'C')
+        || setweight(to_tsvector('eob_search', coalesce(description, '')), 'D')
+    """
+
+    # Normalized words of a catalog_book row, as search.text.words() splits them
+    WORDS_SQL = """
+        regexp_split_to_table(
+            lower(unaccent(coalesce(title, '') || ' ' || coalesce(author, ''))),
+            '[^a-z0-9]+'
+        )
+    """
+
+    def rebuild_vocabulary(self):
+        self._execute("TRUNCATE search_word")
+        self._execute(f"""
+            INSERT INTO search_word (word, frequency)
+            SELECT word, count(*)
+            FROM catalog_book, {self.WORDS_SQL} AS word
+            WHERE length(word) >= 2
+            GROUP BY word
+        """)
+
+    def index_books(self, book_ids):
+        total = 0
+        for batch in self._batches(book_ids):
+            total += self._execute(f"""
+                INSERT INTO search_bookdocument (book_id, document)
+                SELECT id, {self.DOCUMENT_SQL}
+                FROM catalog_book
+                WHERE id = ANY(%s)
+                ON CONFLICT (book_id) DO UPDATE SET document = EXCLUDED.document
+            """, [batch])
+            # New words only; rebuild_vocabulary() recounts
+            self._execute(f"""
+                INSERT INTO search_word (word, frequency)
+                SELECT word, count(*)
+                FROM catalog_book, {self.WORDS_SQL} AS word
+                WHERE id = ANY(%s) AND length(word) >= 2
+                GROUP BY word
+                ON CONFLICT (word) DO NOTHING
+            """, [batch])
+        return total
+
+    def remove_books(self, book_ids):
+        return self._execute(
+            "DELETE FROM search_bookdocument WHERE book_id = ANY(%s)", [list(book_ids)],
+        )
+
+    def clear(self):
+        self._execute("TRUNCATE search_bookdocument")
+
+    def matches(self, query):
+        return RawSQL(
+            "SELECT book_id FROM search_bookdocument"
+            " WHERE document @@ websearch_to_tsquery('eob_search', %s)",
+            [query],
+        )
+
+    def rank(self, query, book_column):
+        return RawSQL(
+            "SELECT ts_rank_cd(document, websearch_to_tsquery('eob_search', %s))"
+            f" FROM search_bookdocument WHERE book_id = {book_column}",
+            [query],
+            output_field=FloatField(),
+        )
+
+    def _fetchall(self, sql, params=None):
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def fuzzy_books(self, query, limit=FUZZY_LIMIT):
+        # <% is word similarity above pg_trgm.word_similarity_threshold,
+        # answered from the GIN trigram indexes
+        self._fetchall(
+            "SELECT set_config('pg_trgm.word_similarity_threshold', %s, false)",
+            [str(FUZZY_THRESHOLD)],
+        )
+        return self._fetchall("""
+            SELECT id, greatest(word_similarity(%s, title), word_similarity(%s, author)) AS score
+            FROM catalog_book
+            WHERE %s <%% title OR %s <%% author
+            ORDER BY score DESC, id
+            LIMIT %s
+        """, [query, query, query, query, limit])
+
+    def known_words(self, tokens):
+        rows = self._fetchall("SELECT word FROM search_word WHERE word = ANY(%s)", [list(tokens)])
+        return {word for word, in rows}
+
+    def closest_word(self, token):
+        self._fetchall(
+            "SELECT set_config('pg_trgm.similarity_threshold', %s, false)",
+            [str(SUGGEST_THRESHOLD)],
+        )
+        rows = self._fetchall("""
+            SELECT word FROM search_word
+            WHERE word %% %s
+            ORDER BY similarity(word, %s) DESC, frequency DESC
+            LIMIT 1
+        """, [token, token])
+        return rows[0][0] if rows else None
+
+
+# =========================
+# SQLITE (FTS5)
+# =========================
+
+# websearch-style tokens: optional "-", then a "quoted phrase" or a word
+_QUERY_TOKEN_RE = re.compile(r'(-?)"([^"]*)"?|(-?)(\S+)')
+
+
+def positive_terms(text):
+    """
+    The words and phrases of a websearch-style query that must match:
+    everything but -exclusions and OR. Typo tolerance works on these
+    only; a query of exclusions alone has nothing to be close to.
+    """
+    terms = []
+    for match in _QUERY_TOKEN_RE.finditer(text or ""):
+        if match.group(1) or match.group(3):
+            continue
+        term = match.group(2) if match.group(2) is not None else match.group(4)
+        if match.group(4) and term.upper() == "OR":
+            continue
+        if any(c.isalnum() for c in term):
+            terms.append(term)
+    return terms
+
+
+def fts5_query(text):
+    """
+    websearch_to_tsquery-like syntax -> FTS5 MATCH expression:
+    words are ANDed, "..." is a phrase, OR is OR, -word excludes.
+    Every term is quoted, so user input can't produce an FTS5 syntax
+    error. Returns "" when nothing searchable is left.
+    """
+    expression = ""
+    pending_or = False
+
+    for match in _QUERY_TOKEN_RE.finditer(text or ""):
+        negated = bool(match.group(1) or match.group(3))
+        term = match.group(2) if match.group(2) is not None else match.group(4)
+
+        if match.group(4) and term.upper() == "OR" and not negated:
+            pending_or = bool(expression)
+            continue
+        if not any(c.isalnum() for c in term):
+            continue
+
+        quoted = '"' + term.replace('"', '""') + '"'
+        if negated:
+            # FTS5's NOT is binary: a leading exclusion has nothing to
+            # subtract from
+            if expression:
+                expression = f"({expression}) NOT {quoted}"
+        elif not expression:
+            expression = quoted
+        else:
+            expression = f"{expression} {'OR' if pending_or else 'AND'} {quoted}"
+        pending_or = False
+
+    return expression
+
+
+class SQLiteBackend(SearchBackend):
+
+    def index_books(self, book_ids):
+        book_ids = list(book_ids)
+        self._update_fuzzy(book_ids)
+        total = 0
+        for batch in self._batches(book_ids):
+            placeholders = ", ".join(["%s"] * len(batch))
+            self._execute(f"DELETE FROM search_bookfts WHERE rowid IN ({placeholders})", batch)
+            total += self._execute(f"""
+                INSERT INTO search_bookfts (rowid, title, author, publisher, description)
+                SELECT id, title, author, publisher, coalesce(description, '')
+                FROM catalog_book
+                WHERE id IN ({placeholders})
+            """, batch)
+        return total
+
+    def remove_books(self, book_ids):
+        book_ids = list(book_ids)
+        self._update_fuzzy(book_ids, remove=True)
+        total = 0
+        for batch in self._batches(book_ids):
+            placeholders = ", ".join(["%s"] * len(batch))
+            total += self._execute(
+                f"DELETE FROM search_bookfts WHERE rowid IN ({placeholders})", batch,
+            )
+        return total
+
+    def clear(self):
+        self._execute("DELETE FROM search_bookfts")
+        SQLiteBackend._fuzzy.pop(self.connection.settings_dict["NAME"], None)
+
+    def matches(self, query):
+        expression = fts5_query(query)
+        if not expression:
+            return RawSQL("SELECT rowid FROM search_bookfts WHERE 0", [])
+        return RawSQL(
+            "SELECT rowid FROM search_bookfts WHERE search_bookfts MATCH %s",
+            [expression],
+        )
+
+    # Database name -> CatalogTrigrams, per process. Loaded from
+    # catalog_book on first use, then kept current by index_books() /
+    # remove_books() (the Book signals, reindex_search) instead of
+    # re-reading the table.
+    _fuzzy = {}
+
+    def _fuzzy_index(self):
+        key = self.connection.settings_dict["NAME"]
+        index = SQLiteBackend._fuzzy.get(key)
+        if index is None:
+            index = CatalogTrigrams()
+            with self.connection.cursor() as cursor:
+                cursor.execute("SELECT id, title, author FROM catalog_book")
+                for book_id, title, author in cursor.fetchall():
+                    index.set(book_id, f"{title or ''} {author or ''}")
+            SQLiteBackend._fuzzy[key] = index
+        return index
+
+    def _update_fuzzy(self, book_ids, remove=False):
+        """Apply a Book write to the in-memory index, if loaded."""
+        index = SQLiteBackend._fuzzy.get(self.connection.settings_dict["NAME"])
+        if index is None:
+            return
+        for batch in self._batches(book_ids):
+            for book_id in batch:
+                index.discard(book_id)
+            if remove:
+                continue
+            placeholders = ", ".join(["%s"] * len(batch))
+            with self.connection.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT id, title, author FROM catalog_book WHERE id IN ({placeholders})",
+                    batch,
+                )
+                for book_id, title, author in cursor.fetchall():
+                    index.set(book_id, f"{title or ''} {author or ''}")
+
+    def fuzzy_books(self, query, limit=FUZZY_LIMIT):
+        return self._fuzzy_index().books.match(query, FUZZY_THRESHOLD, limit)
+
+    def known_words(self, tokens):
+        vocabulary = self._fuzzy_index().vocabulary
+        return {token for token in tokens if token in vocabulary}
+
+    def closest_word(self, token):
+        return self._fuzzy_index().vocabulary.closest(token, SUGGEST_THRESHOLD)
+
+    def rank(self, query, book_column):
+        # bm25() is lower-is-better; column weights mirror A/B/C/D
+        return RawSQL(
+            "SELECT -bm25(search_bookfts, 10.0, 5.0, 2.0, 1.0) FROM search_bookfts"
+            f" WHERE search_bookfts MATCH %s AND rowid = {book_column}",
+            [fts5_query(query) or '""'],
+            output_field=FloatField(),
+        )
+
+
+BACKENDS = {
+    "postgresql": PostgresBackend,
+    "sqlite": SQLiteBackend,
+}
+
+
+def get_backend(connection=default_connection):
+    try:
+        return BACKENDS[connection.vendor](connection)
+    except KeyError:
+        raise NotImplementedError(f"No search backend for {connection.vendor}")
+
+
+def _popularity(book_field):
+    """Path to Book.search_rank from a queryset's `book_field`."""
+    if book_field == "id":
+        return F("search_rank")
+    return F(f"{book_field.removesuffix('_id')}__search_rank")
+
+
+def search_queryset(queryset, query, book_field="id"):
+    """
+    Restrict `queryset` (Books, or anything with a book FK named
+    `book_field`, e.g. Listings with "book_id") to full-text matches
+    of `query`, annotated with `relevance` (higher = better): text
+    rank x Book.search_rank. Every match is kept; ordering by
+    relevance and keyset pagination bound what is read.
+    """
+    backend = get_backend(default_connection)
+    column = queryset.model._meta.get_field(
+        book_field[:-3] if book_field.endswith("_id") else book_field
+    ).column
+    qn = default_connection.ops.quote_name
+    book_column = f"{qn(queryset.model._meta.db_table)}.{qn(column)}"
+
+    return queryset.filter(**{f"{book_field}__in": backend.matches(query)}).annotate(
+        relevance=backend.rank(query, book_column) * _popularity(book_field),
+    )
+
+
+def fuzzy_queryset(queryset, query, book_field="id"):
+    """
+    Like search_queryset(), for books whose title / author is within
+    FUZZY_THRESHOLD trigram similarity of `query` (typos, word order,
+    partial titles); relevance is similarity x Book.search_rank.
+    """
+    matches = get_backend(default_connection).fuzzy_books(query)
+    if not matches:
+        # Still annotated, so ordering by relevance works on the empty result
+        return queryset.none().annotate(relevance=Value(0.0, output_field=FloatField()))
+
+    similarity = Case(
+        *[When(**{book_field: book_id}, then=Value(float(score))) for book_id, score in matches],
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+    return queryset.filter(**{f"{book_field}__in": [book_id for book_id, _ in matches]}).annotate(
+        relevance=similarity * _popularity(book_field),
+    )
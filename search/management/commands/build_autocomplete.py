@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from search.autocomplete import SNAPSHOT_PATH, BaseIndex
+
+
+class Command(BaseCommand):
+    help = "Build the autocomplete prefix index from the catalog and write the snapshot workers load"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default=SNAPSHOT_PATH)
+
+    def handle(self, *args, **options):
+        started = time.time()
+        index = BaseIndex.from_db()
+        index.save(options["output"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {len(index)} entries / {len(index.keys)} keys to {options['output']}"
+            f" in {time.time() - started:.1f}s"
+        ))
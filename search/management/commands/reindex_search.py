@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from catalog.models import Book
+from search.backends import get_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search documents from the Book table"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Empty the index first (drops documents of books deleted outside the ORM)",
+        )
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        batch_size = options["batch_size"]
+
+        if options["clear"]:
+            backend.clear()
+
+        ids = Book.objects.order_by("id").values_list("id", flat=True)
+        last_id = 0
+        total = 0
+
+        while True:
+            chunk = list(ids.filter(id__gt=last_id)[:batch_size])
+            if not chunk:
+                break
+            last_id = chunk[-1]
+
+            backend.index_books(chunk)
+
+            total += len(chunk)
+            self.stdout.write(f"  {total} books")
+
+        # Word counts for did-you-mean; incremental indexing only adds words
+        backend.rebuild_vocabulary()
+
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} books"))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from catalog.models import Book
+from search.ranking import RANK_BATCH_SIZE, update_search_ranks
+
+
+class Command(BaseCommand):
+    help = "Recompute Book.search_rank (popularity for search ordering) for every book"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=RANK_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+
+        ids = Book.objects.order_by("id").values_list("id", flat=True)
+        last_id = 0
+        total = 0
+        changed = 0
+
+        while True:
+            chunk = list(ids.filter(id__gt=last_id)[:batch_size])
+            if not chunk:
+                break
+            last_id = chunk[-1]
+
+            changed += update_search_ranks(chunk)
+
+            total += len(chunk)
+            self.stdout.write(f"  {total} books")
+
+        self.stdout.write(self.style.SUCCESS(f"Ranked {total} books, {changed} changed"))
@@ -0,0 +1,92 @@
+from django.db import migrations
+
+
+# Frozen copy of the schema and document SQL as of this migration
+# (search.backends builds the same documents); migrations don't import
+# live app code.
+
+POSTGRES_INSTALL = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'eob_search') THEN
+            CREATE TEXT SEARCH CONFIGURATION eob_search (COPY = english);
+            ALTER TEXT SEARCH CONFIGURATION eob_search
+                ALTER MAPPING FOR hword, hword_part, word
+                WITH unaccent, english_stem;
+        END IF;
+    END
+    $$
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS search_bookdocument (
+        book_id bigint PRIMARY KEY
+            REFERENCES catalog_book (id) ON DELETE CASCADE
+            DEFERRABLE INITIALLY DEFERRED,
+        document tsvector NOT NULL
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS search_bookdocument_document_gin
+    ON search_bookdocument USING gin (document)
+    """,
+    """
+    INSERT INTO search_bookdocument (book_id, document)
+    SELECT id,
+        setweight(to_tsvector('eob_search', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('eob_search', coalesce(author, '')), 'B')
+        || setweight(to_tsvector('eob_search', coalesce(publisher, '')), 'C')
+        || setweight(to_tsvector('eob_search', coalesce(description, '')), 'D')
+    FROM catalog_book
+    ON CONFLICT (book_id) DO UPDATE SET document = EXCLUDED.document
+    """,
+]
+
+POSTGRES_UNINSTALL = [
+    "DROP TABLE IF EXISTS search_bookdocument",
+    "DROP TEXT SEARCH CONFIGURATION IF EXISTS eob_search",
+]
+
+SQLITE_INSTALL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_bookfts USING fts5(
+        title, author, publisher, description,
+        tokenize = 'porter unicode61 remove_diacritics 2'
+    )
+    """,
+    "DELETE FROM search_bookfts",
+    """
+    INSERT INTO search_bookfts (rowid, title, author, publisher, description)
+    SELECT id, title, author, publisher, coalesce(description, '')
+    FROM catalog_book
+    """,
+]
+
+SQLITE_UNINSTALL = [
+    "DROP TABLE IF EXISTS search_bookfts",
+]
+
+INSTALL = {"postgresql": POSTGRES_INSTALL, "sqlite": SQLITE_INSTALL}
+UNINSTALL = {"postgresql": POSTGRES_UNINSTALL, "sqlite": SQLITE_UNINSTALL}
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        if vendor not in statements:
+            raise NotImplementedError(f"No search backend for {vendor}")
+        for sql in statements[vendor]:
+            schema_editor.execute(sql)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0010_bookidentifier'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(INSTALL), run(UNINSTALL)),
+    ]
@@ -0,0 +1,71 @@
+from django.db import migrations
+
+
+# Frozen copy of the trigram schema and vocabulary SQL as of this
+# migration; migrations don't import live app code. SQLite keeps its
+# trigram index in memory (search.trigrams) and needs nothing here.
+
+POSTGRES_INSTALL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    CREATE INDEX IF NOT EXISTS search_book_title_trgm
+    ON catalog_book USING gin (title gin_trgm_ops)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS search_book_author_trgm
+    ON catalog_book USING gin (author gin_trgm_ops)
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS search_word (
+        word text PRIMARY KEY,
+        frequency integer NOT NULL
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS search_word_trgm
+    ON search_word USING gin (word gin_trgm_ops)
+    """,
+    "TRUNCATE search_word",
+    """
+    INSERT INTO search_word (word, frequency)
+    SELECT word, count(*)
+    FROM catalog_book,
+        regexp_split_to_table(
+            lower(unaccent(coalesce(title, '') || ' ' || coalesce(author, ''))),
+            '[^a-z0-9]+'
+        ) AS word
+    WHERE length(word) >= 2
+    GROUP BY word
+    """,
+]
+
+POSTGRES_UNINSTALL = [
+    "DROP TABLE IF EXISTS search_word",
+    "DROP INDEX IF EXISTS search_book_title_trgm",
+    "DROP INDEX IF EXISTS search_book_author_trgm",
+]
+
+INSTALL = {"postgresql": POSTGRES_INSTALL, "sqlite": []}
+UNINSTALL = {"postgresql": POSTGRES_UNINSTALL, "sqlite": []}
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        if vendor not in statements:
+            raise NotImplementedError(f"No search backend for {vendor}")
+        for sql in statements[vendor]:
+            schema_editor.execute(sql)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0001_search_index'),
+        ('catalog', '0011_book_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(INSTALL), run(UNINSTALL)),
+    ]
@@ -0,0 +1,88 @@
+import math
+
+from django.db import migrations
+from django.db.models import Count
+
+
+# Frozen copy of search.ranking.popularity() as of this migration;
+# migrations don't import live app code. Later formula changes are
+# applied with `manage.py update_search_ranks`.
+
+WANT_TO_READ_WEIGHT = 0.5
+ALREADY_READ_WEIGHT = 0.5
+RATING_WEIGHT = 1.0
+COVER_BONUS = 0.5
+LISTING_WEIGHT = 1.0
+
+RATING_PRIOR = 3.5
+RATING_PRIOR_READS = 20
+
+BATCH_SIZE = 2000
+
+
+def popularity(want_to_read, already_read, rating_avg, has_cover, active_listings):
+    want_to_read = max(want_to_read or 0, 0)
+    already_read = max(already_read or 0, 0)
+
+    score = 1.0
+    score += WANT_TO_READ_WEIGHT * math.log1p(want_to_read)
+    score += ALREADY_READ_WEIGHT * math.log1p(already_read)
+
+    if rating_avg is not None:
+        rating = (
+            (rating_avg * already_read + RATING_PRIOR * RATING_PRIOR_READS)
+            / (already_read + RATING_PRIOR_READS)
+        )
+        score += RATING_WEIGHT * min(max((rating - 3.0) / 2.0, 0.0), 1.0)
+
+    if has_cover:
+        score += COVER_BONUS
+    score += LISTING_WEIGHT * math.log1p(active_listings)
+
+    return round(score, 4)
+
+
+def backfill(apps, schema_editor):
+    Book = apps.get_model("catalog", "Book")
+    Listing = apps.get_model("listings", "Listing")
+
+    book_ids = list(Book.objects.order_by("id").values_list("id", flat=True))
+    for i in range(0, len(book_ids), BATCH_SIZE):
+        batch = book_ids[i:i + BATCH_SIZE]
+
+        listing_counts = dict(
+            Listing.objects
+            .filter(book_id__in=batch, status="active", quantity__gt=0)
+            .order_by()
+            .values("book_id")
+            .annotate(n=Count("id"))
+            .values_list("book_id", "n")
+        )
+
+        books = list(
+            Book.objects.filter(id__in=batch).only(
+                "id", "want_to_read_count", "already_read_count", "rating_avg", "cover_image",
+            )
+        )
+        for book in books:
+            book.search_rank = popularity(
+                book.want_to_read_count,
+                book.already_read_count,
+                book.rating_avg,
+                bool(book.cover_image),
+                listing_counts.get(book.id, 0),
+            )
+        Book.objects.bulk_update(books, ["search_rank"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0002_trigram_indexes'),
+        ('catalog', '0012_book_search_rank'),
+        ('listings', '0008_listing_public_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
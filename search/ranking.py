@@ -0,0 +1,112 @@
+"""
+Book.search_rank: a precomputed popularity multiplier for ordering
+search results. Relevance is text rank x search_rank (see
+search.backends.search_queryset), so among books that match a query
+about as well, the ones readers want and sellers stock come first.
+
+search_rank is 1.0 for a book nobody has heard of, plus:
+
+- log-scaled Open Library want-to-read and already-read counts
+- the average rating, shrunk towards RATING_PRIOR while few people
+  have read the book, so a single 5-star rating doesn't win
+- a bonus for having a cover image
+- log-scaled count of public (active, in stock) listings
+
+It is stored, not computed per query, and kept current by
+search.signals (Book / Listing save and delete), by the bulk writers
+(inventory sync, download_covers, the listing admin) and by
+`manage.py update_search_ranks` for everything else.
+"""
+
+import math
+
+from django.db.models import Count
+
+from catalog.models import Book
+from listings.models import Listing
+
+
+WANT_TO_READ_WEIGHT = 0.5
+ALREADY_READ_WEIGHT = 0.5
+RATING_WEIGHT = 1.0
+COVER_BONUS = 0.5
+LISTING_WEIGHT = 1.0
+
+# Ratings count for as many as this many readers at RATING_PRIOR.
+RATING_PRIOR = 3.5
+RATING_PRIOR_READS = 20
+
+# Book fields search_rank is computed from; saving any of them
+# recomputes it.
+RANK_FIELDS = ("want_to_read_count", "already_read_count", "rating_avg", "cover_image")
+
+# Listing fields that change a book's public listing count.
+LISTING_RANK_FIELDS = ("book", "status", "quantity")
+
+RANK_BATCH_SIZE = 2000
+
+
+def popularity(want_to_read, already_read, rating_avg, has_cover, active_listings):
+    want_to_read = max(want_to_read or 0, 0)
+    already_read = max(already_read or 0, 0)
+
+    score = 1.0
+    score += WANT_TO_READ_WEIGHT * math.log1p(want_to_read)
+    score += ALREADY_READ_WEIGHT * math.log1p(already_read)
+
+    if rating_avg is not None:
+        rating = (
+            (rating_avg * already_read + RATING_PRIOR * RATING_PRIOR_READS)
+            / (already_read + RATING_PRIOR_READS)
+        )
+        # 3 stars and below add nothing, 5 stars adds RATING_WEIGHT
+        score += RATING_WEIGHT * min(max((rating - 3.0) / 2.0, 0.0), 1.0)
+
+    if has_cover:
+        score += COVER_BONUS
+    score += LISTING_WEIGHT * math.log1p(active_listings)
+
+    # Rounded so an unchanged book compares equal and isn't rewritten
+    return round(score, 4)
+
+
+def update_search_ranks(book_ids):
+    """
+    Recompute search_rank for these books in batches: one query for
+    the book fields, one grouped count of public listings, and a
+    bulk_update of the books whose rank changed. Returns that count.
+    """
+    book_ids = sorted({book_id for book_id in book_ids if book_id is not None})
+    changed = 0
+
+    for i in range(0, len(book_ids), RANK_BATCH_SIZE):
+        batch = book_ids[i:i + RANK_BATCH_SIZE]
+
+        listing_counts = dict(
+            Listing.objects
+            .filter(book_id__in=batch, status="active", quantity__gt=0)
+            .order_by()
+            .values("book_id")
+            .annotate(n=Count("id"))
+            .values_list("book_id", "n")
+        )
+
+        stale = []
+        for book in Book.objects.filter(id__in=batch).only("id", "search_rank", *RANK_FIELDS):
+            rank = popularity(
+                book.want_to_read_count,
+                book.already_read_count,
+                book.rating_avg,
+                bool(book.cover_image),
+                listing_counts.get(book.id, 0),
+            )
+            if rank != book.search_rank:
+                book.search_rank = rank
+                stale.append(book)
+
+        # bulk_update leaves updated_at alone: a rank change is not an
+        # edit autocomplete or anyone else polling updated_at cares about
+        Book.objects.bulk_update(stale, ["search_rank"])
+        changed += len(stale)
+
+    return changed
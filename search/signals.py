@@ -0,0 +1,45 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from catalog.models import Book
+from listings.models import Listing
+
+from .backends import SEARCH_FIELDS, get_backend
+from .ranking import LISTING_RANK_FIELDS, RANK_FIELDS, update_search_ranks
+
+
+@receiver(post_save, sender=Book)
+def index_book(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and not set(update_fields) & set(SEARCH_FIELDS):
+        return
+    get_backend().index_books([instance.pk])
+
+
+@receiver(post_delete, sender=Book)
+def unindex_book(sender, instance, **kwargs):
+    get_backend().remove_books([instance.pk])
+
+
+@receiver(post_save, sender=Book)
+def rank_book(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and not set(update_fields) & set(RANK_FIELDS):
+        return
+    update_search_ranks([instance.pk])
+
+
+@receiver(post_save, sender=Listing)
+def rank_listing_book(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and not set(update_fields) & set(LISTING_RANK_FIELDS):
+        return
+    update_search_ranks([instance.book_id])
+
+
+@receiver(post_delete, sender=Listing)
+def unrank_listing_book(sender, instance, **kwargs):
+    update_search_ranks([instance.book_id])
@@ -1,3 +1,94 @@
-from django.test import TestCase
+import os
+import tempfile
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from search.autocomplete import (
+    SHORT_PREFIX,
+    AutocompleteIndex,
+    BaseIndex,
+    Overlay,
+    book_entries,
+)
+
+
+BOOKS = [
+    # id, title, author, isbn13, isbn10, want_to_read_count
+    (1, "One Hundred Years of Solitude", "Gabriel García Márquez", "9780060883287", None, 900),
+    (2, "Love in the Time of Cholera", "Gabriel García Márquez", "9780307389732", None, 400),
+    (3, "The Years", "Virginia Woolf", "9780156997010", None, 50),
+    (4, "Orlando", "Virginia Woolf", "9780156701600", None, 300),
+    (5, "One Day", "David Nicholls", "9780307474711", None, 600),
+    (6, "Onions in the Stew", "Betty MacDonald", "9780060000000", None, 5),
+]
+
+
+class AutocompleteIndexTests(SimpleTestCase):
+
+    def index(self, available=frozenset()):
+        base = BaseIndex.from_entries(book_entries(BOOKS, available), available, built_at=0)
+        return AutocompleteIndex(base)
+
+    def labels(self, index, query, limit=8):
+        return [(c["kind"], c["label"]) for c in index.complete(query, limit)]
+
+    def test_long_prefix_is_a_range_of_the_key_array(self):
+        self.assertGreater(len("one hundred"), SHORT_PREFIX)
+
+        self.assertEqual(
+            self.labels(self.index(), "One Hund"),
+            [("title", "One Hundred Years of Solitude")],
+        )
+
+    def test_short_prefix_uses_precomputed_top_entries(self):
+        self.assertEqual(
+            self.labels(self.index(), "on"),
+            [
+                ("title", "One Hundred Years of Solitude"),
+                ("title", "One Day"),
+                ("title", "Onions in the Stew"),
+            ],
+        )
+
+    def test_matches_from_any_word_start(self):
+        self.assertEqual(
+            self.labels(self.index(), "years"),
+            [("title", "One Hundred Years of Solitude"), ("title", "The Years")],
+        )
+
+    def test_one_entry_per_author(self):
+        results = self.labels(self.index(), "gabriel garcia")
+
+        self.assertEqual(results, [("author", "Gabriel García Márquez")])
+
+    def test_available_books_rank_first(self):
+        self.assertEqual(
+            self.labels(self.index(available={6}), "on", limit=2),
+            [("title", "Onions in the Stew"), ("title", "One Hundred Years of Solitude")],
+        )
+
+    def test_unknown_and_empty_prefixes(self):
+        index = self.index()
+
+        self.assertEqual(index.complete("zz"), [])
+        self.assertEqual(index.complete("zzzzzz"), [])
+        self.assertEqual(index.complete("  "), [])
+
+    def test_overlay_shadows_changed_books(self):
+        index = self.index()
+        renamed = [(3, "The Waves", "Virginia Woolf", "9780156997010", None, 50)]
+        index = AutocompleteIndex(index.base, Overlay(book_entries(renamed, set()), {3}))
+
+        self.assertEqual(self.labels(index, "the y"), [])
+        self.assertEqual(self.labels(index, "the wav"), [("title", "The Waves")])
+
+    def test_snapshot_round_trip(self):
+        base = self.index().base
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "index.npz")
+            base.save(path)
+            loaded = AutocompleteIndex(BaseIndex.load(path))
+
+        for query in ("on", "years", "virginia w"):
+            with self.subTest(query=query):
+                self.assertEqual(self.labels(loaded, query), self.labels(self.index(), query))
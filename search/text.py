@@ -0,0 +1,18 @@
+"""Text normalization shared by the in-process search indexes (no Django imports)."""
+
+import re
+import unicodedata
+
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize(text):
+    """'García Márquez: Cien años' -> 'garcia marquez cien anos'."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = text.encode("ascii", "ignore").decode().lower()
+    return " ".join(_WORD_RE.findall(text))
+
+
+def words(text):
+    return normalize(text).split()
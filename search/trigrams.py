@@ -0,0 +1,128 @@
+"""
+Pure-Python trigram matching: the fallback for databases without
+pg_trgm (SQLite in dev). Trigrams follow pg_trgm: every normalized
+word is padded with two spaces in front and one behind, so
+"egg" -> {"  e", " eg", "egg", "gg "}.
+"""
+
+import heapq
+from collections import Counter
+
+from .text import words
+
+
+def trigrams(text):
+    grams = set()
+    for word in words(text):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(a, b):
+    """pg_trgm similarity(): shared trigrams / all trigrams of both."""
+    ta, tb = trigrams(a), trigrams(b)
+    if not ta or not tb:
+        return 0.0
+    return len(ta & tb) / len(ta | tb)
+
+
+class TrigramIndex:
+    """
+    Trigram -> ids of the documents containing it. match() scores a
+    document by the share of the query's trigrams it contains, a
+    stand-in for pg_trgm's word_similarity(query, document).
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.docs = {}
+
+    def add(self, doc_id, text):
+        """Index `text` under `doc_id`, replacing what it had."""
+        self.remove(doc_id)
+        grams = trigrams(text)
+        self.docs[doc_id] = grams
+        for gram in grams:
+            self.postings.setdefault(gram, set()).add(doc_id)
+
+    def remove(self, doc_id):
+        for gram in self.docs.pop(doc_id, ()):
+            posting = self.postings[gram]
+            posting.discard(doc_id)
+            if not posting:
+                del self.postings[gram]
+
+    def match(self, text, threshold, limit):
+        """[(doc_id, score)] with score >= threshold, best first."""
+        grams = trigrams(text)
+        if not grams:
+            return []
+
+        hits = Counter()
+        for gram in grams:
+            hits.update(self.postings.get(gram, ()))
+
+        needed = threshold * len(grams)
+        return heapq.nlargest(
+            limit,
+            ((doc_id, n / len(grams)) for doc_id, n in hits.items() if n >= needed),
+            key=lambda match: match[1],
+        )
+
+
+class Vocabulary:
+    """Word frequencies plus a trigram index over the distinct words."""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.index = TrigramIndex()
+
+    def add_text(self, text):
+        for word in words(text):
+            if word not in self.counts:
+                self.index.add(word, word)
+            self.counts[word] += 1
+
+    def remove_text(self, text):
+        for word in words(text):
+            if word not in self.counts:
+                continue
+            self.counts[word] -= 1
+            if self.counts[word] <= 0:
+                del self.counts[word]
+                self.index.remove(word)
+
+    def __contains__(self, word):
+        return word in self.counts
+
+    def closest(self, word, threshold):
+        """The most similar known word (ties: most frequent), or None."""
+        candidates = [w for w, _ in self.index.match(word, threshold / 2, 50)]
+        scored = [(similarity(word, w), self.counts[w], w) for w in candidates]
+        scored = [s for s in scored if s[0] >= threshold]
+        return max(scored)[2] if scored else None
+
+
+class CatalogTrigrams:
+    """
+    A TrigramIndex of book texts plus their Vocabulary, updated book by
+    book (set / discard) rather than rebuilt.
+    """
+
+    def __init__(self):
+        self.books = TrigramIndex()
+        self.vocabulary = Vocabulary()
+        self.texts = {}
+
+    def set(self, book_id, text):
+        self.discard(book_id)
+        self.texts[book_id] = text
+        self.books.add(book_id, text)
+        self.vocabulary.add_text(text)
+
+    def discard(self, book_id):
+        text = self.texts.pop(book_id, None)
+        if text is not None:
+            self.books.remove(book_id)
+            self.vocabulary.remove_text(text)
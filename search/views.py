@@ -1,3 +1,50 @@
-from django.shortcuts import render
+from urllib.parse import urlencode
 
-# Create your views here.
+from django.http import JsonResponse
+from django.shortcuts import redirect
+from django.urls import reverse
+from django.views.decorators.http import require_GET
+
+from .autocomplete import get_index
+
+
+AUTOCOMPLETE_LIMIT = 8
+AUTOCOMPLETE_MAX_LIMIT = 20
+
+
+@require_GET
+def search(request):
+    # The header search bar posts here; results live on the listings page
+    url = reverse("public_listings")
+    if request.GET:
+        url = f"{url}?{request.GET.urlencode()}"
+    return redirect(url)
+
+
+@require_GET
+def autocomplete(request):
+    """
+    Title / author completions for the search box, from the in-memory
+    index (no database access):
+
+        GET /search/autocomplete/?q=hundr
+        {"query": "hundr", "results": [{"kind": "title", "label": ..., "url": ...}]}
+    """
+    query = request.GET.get("q", "")[:100]
+    try:
+        limit = min(max(int(request.GET.get("limit", AUTOCOMPLETE_LIMIT)), 1), AUTOCOMPLETE_MAX_LIMIT)
+    except ValueError:
+        limit = AUTOCOMPLETE_LIMIT
+
+    listings_url = reverse("public_listings")
+    results = []
+    for match in get_index().complete(query, limit):
+        if match["kind"] == "title":
+            url = reverse("book_detail", args=[match["ref"]])
+        else:
+            url = f"{listings_url}?{urlencode({'q': match['ref']})}"
+        results.append({"kind": match["kind"], "label": match["label"], "url": url})
+
+    response = JsonResponse({"query": query, "results": results})
+    response["Cache-Control"] = "public, max-age=60"
+    return response
@@ -1,6 +1,7 @@
-import requests
 import time
 
+from http_cache import cached_get
+
 # =========================
 # CONFIG
 # =========================
@@ -36,11 +37,13 @@ def fetch_loc_mods_by_isbn(isbn: str) -> str:
         "maximumRecords": 1,
     }
 
-    r = requests.get(
+    r = cached_get(
         LOC_SRU,
         params=params,
+        source="loc",
         headers=HEADERS,
         timeout=TIMEOUT,
+        cacheable=lambda resp: b"<mods:mods" in resp.content,
     )
     r.raise_for_status()
     return r.text